@@ -1,11 +1,27 @@
 from flask import Flask
 import datetime
+import multiprocessing
+import os
 
 # Create Flask application.
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///memory'
 app.permanent_session_lifetime = datetime.timedelta(minutes = 10)
 
+# The slicing backend: 'apscheduler' for a job per haiku, 'wheel' for one
+# driver that fires every due haiku in a batch, or 'green' for a greenlet per
+# haiku (needs gevent).
+app.config['SCHEDULER_BACKEND'] = os.environ.get(
+        'EH_SCHEDULER_BACKEND', 'apscheduler')
+
+# Worker processes for the slicing routine. 0 runs it in the scheduler's
+# threads; by default there is one per core.
+app.config['SLICING_PROCESSES'] = int(os.environ.get(
+        'EH_SLICING_PROCESSES', multiprocessing.cpu_count()))
+
+# Split the haiku between several slicing processes with database leases.
+app.config['SHARDED_SLICING'] = os.environ.get('EH_SHARDED_SLICING') == '1'
+
 # Import and set the session key.
 import key
 app.secret_key = key.secret
@@ -14,10 +30,46 @@ app.secret_key = key.secret
 from flaskext.sqlalchemy import SQLAlchemy
 db = SQLAlchemy(app)
 
-# Run the scheduler.
-from eh.helpers.scheduler import HaikuScheduler
-sched = HaikuScheduler()
-sched.start()
+# Give SQLite the SQL functions the models use.
+import eh.helpers.sqlfunctions
+
+# Create the scheduler. It is only started in the process that runs the
+# slicers; see runScheduler().
+from eh.helpers.scheduler import createScheduler
+sched = createScheduler(app.config['SCHEDULER_BACKEND'])
 
 # Import application assets.
 from eh.views import admin
+
+
+def createApp(config=None):
+
+    '''
+    Configure the application for a web worker. No thread is started: the
+    tables are loaded by preload() in wsgi.py, or on the first lookup in
+    each worker, after any fork.
+    '''
+
+    if config: app.config.update(config)
+
+    return app
+
+
+def runScheduler(config=None):
+
+    '''
+    Configure the application for the slicing process and start the
+    scheduler. Exactly one process should run the slicers.
+    '''
+
+    createApp(config)
+
+    # Slice in worker processes.
+    if app.config['SLICING_PROCESSES']:
+        from eh.helpers.pool import SlicingPool
+        sched.pool = SlicingPool(app.config['SLICING_PROCESSES'],
+                sched.metrics).start()
+
+    sched.start()
+
+    return sched
@@ -0,0 +1,109 @@
+'''
+Benchmark slicing a round with 100k allocations to 1k words: the vectorized
+engine against a Python loop over the ORM rows. The first slice folds every
+allocation into its word; later ones only fold the new ones, and reads
+apply the rest of the decay. Runs on a throwaway SQLite database.
+
+    python -m eh.benchmarks.decay
+'''
+
+from eh import app, db
+from eh.models import User, Haiku, Word, Round, Allocation
+from eh.helpers import decay, slicer
+import random
+import math
+import time
+
+
+def populate(allocations, words):
+
+    ''' Create a haiku with an open round. Get its id. '''
+
+    user = User.createAdministrator('username', 'password')
+    haiku = Haiku.createHaiku(user.id, 'bench', 1000, 1, 5, 100, 30, 1000)
+    round = Round.createRound(haiku.id)
+
+    for i in xrange(words):
+        word = Word()
+        word.haiku_id = haiku.id
+        word.round_id = round.id
+        db.session.add(word)
+
+    db.session.commit()
+
+    ids = [w.id for w in Word.query.all()]
+    now = time.time()
+
+    db.session.execute(Allocation.__table__.insert(), [{
+        'haiku_id': haiku.id,
+        'round_id': round.id,
+        'word_id': random.choice(ids),
+        'user_id': user.id,
+        'amount': random.uniform(1, 100),
+        'allocated_at': now - random.uniform(0, 600)}
+        for i in xrange(allocations)])
+
+    db.session.commit()
+    return haiku.id
+
+
+def loop(id, now):
+
+    ''' The baseline: decay and total ORM rows one at a time. '''
+
+    lifetime = Haiku.query.get(id).decay_mean_lifetime
+    scores = {}
+
+    for allocation in Allocation.query.filter_by(haiku_id=id):
+        value = allocation.amount * math.exp(
+                -(now - allocation.allocated_at) / lifetime)
+        scores[allocation.word_id] = scores.get(allocation.word_id, 0) + value
+
+    return scores
+
+
+def timed(func, *args):
+
+    ''' Get the result of func(*args), and the milliseconds it took. '''
+
+    start = time.time()
+    result = func(*args)
+    return result, (time.time() - start) * 1000
+
+
+def run(allocations=100000, words=1000):
+
+    ''' Time each stage of a slice. '''
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.create_all()
+
+    id = populate(allocations, words)
+    lifetimes = {id: Haiku.query.get(id).decay_mean_lifetime}
+    now = time.time()
+
+    print 'allocations: %d to %d words' % (allocations, words)
+    print
+
+    columns, load = timed(decay.loadAllocations, [id])
+    (keys, scores), score = timed(decay.scoreWords, columns, lifetimes, now)
+    baseline, python = timed(loop, id, now)
+    db.session.remove()
+    result, first = timed(slicer.slice, id)
+    result, again = timed(slicer.slice, id)
+    values, read = timed(Word.getValues, id)
+
+    # Same answer both ways.
+    error = max(abs(baseline[k] - s) for k, s in zip(keys, scores))
+
+    print '%-28s %10.1f ms' % ('load columns', load)
+    print '%-28s %10.1f ms' % ('decay and bincount', score)
+    print '%-28s %10.1f ms' % ('first slice, folding all', first)
+    print '%-28s %10.1f ms' % ('next slice, nothing new', again)
+    print '%-28s %10.1f ms' % ('read decayed values', read)
+    print '%-28s %10.1f ms' % ('python loop over ORM rows', python)
+    print '%-28s %10.2g' % ('max difference', error)
+
+
+if __name__ == '__main__':
+    run()
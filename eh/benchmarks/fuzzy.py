@@ -0,0 +1,82 @@
+'''
+Benchmark the symmetric-delete index against a brute-force Levenshtein scan
+of the dictionary.
+
+    python -m eh.benchmarks.fuzzy
+'''
+
+from eh.lib import syllabary, fuzzy
+import random
+import time
+
+
+def misspell(word, edits, rand):
+
+    ''' Apply random insertions, deletions, and substitutions to a word. '''
+
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+    for i in range(edits):
+        at = rand.randrange(len(word) + 1)
+        op = rand.choice(('insert', 'delete', 'substitute'))
+        if op == 'insert':
+            word = word[:at] + rand.choice(letters) + word[at:]
+        elif op == 'delete' and len(word) > 1 and at < len(word):
+            word = word[:at] + word[at+1:]
+        elif at < len(word):
+            word = word[:at] + rand.choice(letters) + word[at+1:]
+
+    return word
+
+
+def bruteForce(words, word, limit):
+
+    ''' Scan every word for the nearest within limit. '''
+
+    best, matches = limit + 1, []
+
+    for other in words:
+        d = fuzzy.distance(word, other, limit)
+        if d < best: best, matches = d, [other]
+        elif d == best: matches.append(other)
+
+    return sorted(matches) if best <= limit else []
+
+
+def timeQueries(f, queries):
+
+    ''' Get the mean time per query, in milliseconds. '''
+
+    start = time.time()
+    for q in queries: f(q)
+    return (time.time() - start) / len(queries) * 1000
+
+
+def run(queries=1000, scans=20, seed=0):
+
+    ''' Time both approaches on random misspellings of dictionary words. '''
+
+    table = syllabary.load()
+    index = fuzzy.load(table=table)
+    words = list(table)
+
+    rand = random.Random(seed)
+    sample = [misspell(w, rand.choice((1, 2)), rand)
+            for w in rand.sample(words, queries)]
+
+    # Check that both agree.
+    for q in sample[:scans]:
+        expected = bruteForce(words, q, 2)
+        assert [w for w, d, c in index.match(q)] == expected, q
+
+    indexed = timeQueries(index.match, sample)
+    scanned = timeQueries(lambda q: bruteForce(words, q, 2), sample[:scans])
+
+    print 'words:        %d' % len(words)
+    print 'index:        %.3f ms/query (%d queries)' % (indexed, queries)
+    print 'brute force:  %.3f ms/query (%d queries)' % (scanned, scans)
+    print 'speedup:      %.0fx' % (scanned / indexed)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,77 @@
+'''
+Measure the private memory each forked worker needs for syllable lookups,
+with the shared, memory-mapped table versus a per-process copy of the
+dictionary.
+
+    python -m eh.benchmarks.memory
+'''
+
+from eh.lib import syllabary
+import random
+import os
+
+
+def private():
+
+    ''' Get this process's private (unshared) memory, in MB. '''
+
+    total = 0
+    with open('/proc/self/smaps') as f:
+        for line in f:
+            if line.startswith(('Private_Clean', 'Private_Dirty')):
+                total += int(line.split()[1])
+
+    return total / 1024.0
+
+
+def workers(n, work):
+
+    ''' Fork n workers that run work(), and get their private memory. '''
+
+    results = []
+
+    for i in range(n):
+
+        read, write = os.pipe()
+        pid = os.fork()
+
+        if pid == 0:
+            os.close(read)
+            before = private()
+            work()
+            os.write(write, '%f' % (private() - before))
+            os._exit(0)
+
+        os.close(write)
+        results.append(float(os.read(read, 64)))
+        os.close(read)
+        os.waitpid(pid, 0)
+
+    return results
+
+
+def run(n=4, lookups=100000, seed=0):
+
+    ''' Compare the per-worker cost of the two approaches. '''
+
+    # Load the shared table in the parent, before forking.
+    table = syllabary.load()
+    words = random.Random(seed).sample(list(table), lookups)
+
+    def mappedWork():
+        for w in words: table.get(w)
+
+    def dictWork():
+        from eh.lib.syllables import syllables
+        for w in words: syllables.get(w)
+
+    shared = workers(n, mappedWork)
+    copied = workers(n, dictWork)
+
+    print 'workers:            %d' % n
+    print 'mapped table:       %.1f MB private per worker' % (sum(shared) / n)
+    print 'dictionary copy:    %.1f MB private per worker' % (sum(copied) / n)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,99 @@
+'''
+Benchmark tick latency with and without phase offsets: 5k haiku on a 10s
+interval, each slice costing a millisecond of CPU. Latency is the time from
+when a slice was due to when it started; the wheel may start slices up to
+its resolution early, which shows as negative latency.
+
+    python -m eh.benchmarks.phase
+'''
+
+from eh.helpers.scheduler import createScheduler
+from eh.helpers import phase
+from collections import namedtuple
+import threading
+import logging
+import time
+
+
+# The haiku fields the schedulers read.
+Record = namedtuple('Record', 'id slicing_interval')
+
+
+def busy(seconds):
+
+    ''' Hold the CPU for some seconds, like a slice. '''
+
+    end = time.time() + seconds
+    while time.time() < end: pass
+
+
+def percentile(values, p):
+
+    ''' Get the pth percentile of values. '''
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+def measure(backend, phased, haiku, interval, duration, cost):
+
+    ''' Get the latencies of the slices run in duration seconds. '''
+
+    offsets = {}
+    latencies = []
+    lock = threading.Lock()
+
+    def slicer(*ids):
+        for id in ids:
+            lag = (time.time() - offsets[id] + interval / 2.0) % interval \
+                    - interval / 2.0
+            with lock: latencies.append(lag)
+            busy(cost)
+
+    sched = createScheduler(backend, phased=phased)
+
+    # The offset of each haiku's slices into the interval.
+    for i in xrange(haiku):
+        record = Record(i + 1, interval)
+        if phased: offsets[record.id] = phase.phase(record.id, interval)
+        else: offsets[record.id] = time.time() % interval
+        sched.createSlicer(record, slicer)
+
+    sched.start()
+    time.sleep(duration)
+    sched.shutdown()
+
+    return latencies
+
+
+def run(haiku=5000, interval=10, duration=30, cost=0.001):
+
+    ''' Compare lockstep and phased slicing on each backend. '''
+
+    # APScheduler logs every missed run.
+    logging.disable(logging.WARNING)
+
+    print 'haiku:     %d, every %ds for %ds, %.1f ms per slice' % (
+            haiku, interval, duration, cost * 1000)
+    print
+
+    print '%-12s %-9s %8s %10s %10s %10s' % (
+            'backend', 'phases', 'slices', 'p50 ms', 'p99 ms', 'max ms')
+
+    for backend in ('apscheduler', 'wheel'):
+        for phased in (False, True):
+
+            latencies = measure(backend, phased, haiku, interval, duration,
+                    cost)
+
+            print '%-12s %-9s %8d %10.1f %10.1f %10.1f' % (
+                    backend,
+                    'phased' if phased else 'lockstep',
+                    len(latencies),
+                    percentile(latencies, 50) * 1000,
+                    percentile(latencies, 99) * 1000,
+                    max(latencies) * 1000)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,90 @@
+'''
+Benchmark the slicing backends: an APScheduler job per haiku, the batching
+wheel driver, and a greenlet per haiku, with 10k haiku slicing every second.
+
+    python -m eh.benchmarks.scheduler
+'''
+
+from eh.helpers.scheduler import createScheduler
+from eh.helpers import green
+from collections import namedtuple
+import threading
+import resource
+import logging
+import time
+
+
+# The haiku fields the schedulers read.
+Record = namedtuple('Record', 'id slicing_interval')
+
+
+def cpu():
+
+    ''' Get the CPU time used by this process, in seconds. '''
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(backend, haiku, interval, duration):
+
+    '''
+    Slice haiku records for duration seconds. Get the seconds to create the
+    slicers, the slices completed, the calls into the slicer, and the CPU
+    seconds used while running.
+    '''
+
+    counts = {'slices': 0, 'calls': 0}
+    lock = threading.Lock()
+
+    # APScheduler calls in from its thread pool.
+    def slicer(*ids):
+        with lock:
+            counts['slices'] += len(ids)
+            counts['calls'] += 1
+
+    sched = createScheduler(backend)
+    sched.start()
+
+    start = time.time()
+    for i in xrange(haiku):
+        sched.createSlicer(Record(i + 1, interval), slicer)
+    created = time.time() - start
+
+    before = cpu()
+    time.sleep(duration)
+    used = cpu() - before
+
+    sched.shutdown()
+
+    return created, counts['slices'], counts['calls'], used
+
+
+def run(haiku=10000, interval=1, duration=10):
+
+    ''' Run each backend in turn. '''
+
+    # APScheduler logs every missed run.
+    logging.disable(logging.WARNING)
+
+    expected = haiku * duration / interval
+
+    print 'haiku:     %d, every %ds for %ds' % (haiku, interval, duration)
+    print 'expected:  %d slices' % expected
+    print
+
+    print '%-12s %10s %10s %10s %10s' % (
+            'backend', 'create s', 'slices', 'calls', 'cpu s')
+
+    backends = ['apscheduler', 'wheel']
+    if green.gevent: backends.append('green')
+
+    for backend in backends:
+        created, slices, calls, used = measure(
+                backend, haiku, interval, duration)
+        print '%-12s %10.2f %10d %10d %10.2f' % (
+                backend, created, slices, calls, used)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,167 @@
+'''
+Benchmark the first slice of a round three ways: loading and mutating ORM
+objects, which flushes one UPDATE per row; the vectorized slice(), which
+folds with one executemany per table; and bulkSlice(), which folds with
+two set-based statements. Each runs on its own copy of the same
+allocations, in a throwaway SQLite database.
+
+createAllocation() folds each allocation as it is written, so in steady
+state a slice has next to nothing to fold. The allocations here are
+inserted in bulk, unfolded, as an import or a seeded round would be: the
+workload the slicing paths remain for, since folding such a batch one
+allocation at a time would cost a word UPDATE per row.
+
+    python -m eh.benchmarks.sqlslice [allocations ...]
+'''
+
+from eh import app, db
+from eh.models import User, Haiku, Word, Round, Allocation
+from eh.helpers import slicer, decay
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import datetime as dt
+import random
+import time
+import sys
+
+
+# SQL statements issued, for counting.
+statements = []
+
+def recordStatement(conn, cursor, statement, parameters, context, many):
+    statements.append(statement)
+
+event.listen(Engine, 'before_cursor_execute', recordStatement)
+
+
+def populate(allocations, words, now):
+
+    '''
+    Create a haiku with an open round, allocated to in the ten minutes
+    before now, with raw inserts that leave the allocations unfolded. Get
+    its id.
+    '''
+
+    user = User.createAdministrator('username', 'password')
+    haiku = Haiku.createHaiku(user.id, 'bench', 1000, 1, 5, 100, 30, 1000)
+    round = Round.createRound(haiku.id)
+
+    db.session.execute(Word.__table__.insert(), [{
+        'haiku_id': haiku.id,
+        'round_id': round.id,
+        'value': 0.0}
+        for i in xrange(words)])
+
+    ids = [id for id, in db.session.query(Word.id)]
+
+    db.session.execute(Allocation.__table__.insert(), [{
+        'haiku_id': haiku.id,
+        'round_id': round.id,
+        'word_id': random.choice(ids),
+        'user_id': user.id,
+        'amount': random.uniform(1, 100),
+        'allocated_at': now - random.uniform(0, 600),
+        'folded': False}
+        for i in xrange(allocations)])
+
+    db.session.commit()
+    return haiku.id
+
+
+def ormSlice(id):
+
+    '''
+    The baseline: fold the pending allocations through the unit of work,
+    mutating each Word and Allocation object, decayed as slice() does.
+    '''
+
+    now = time.time()
+    haiku = Haiku.query.get(id)
+    lifetime = haiku.decay_mean_lifetime
+    words = dict((w.id, w) for w in Word.query.filter_by(haiku_id=id))
+
+    rounds = db.session.query(Round.id).filter(Round.haiku_id == id) \
+            .filter(Round.ended_on == None)
+    pending = Allocation.query.filter(Allocation.haiku_id == id) \
+            .filter(Allocation.folded == False) \
+            .filter(Allocation.round_id.in_(rounds))
+
+    for allocation in pending:
+
+        word = words[allocation.word_id]
+        value = word.getValue(lifetime, now) or 0.0
+        word.value = value + float(decay.decay(allocation.amount,
+                allocation.allocated_at, now, lifetime))
+        word.value_at = now
+        allocation.folded = True
+
+    haiku.sliced_on = dt.datetime.fromtimestamp(now)
+    db.session.commit()
+
+
+def measure(func, allocations, words, now, reading):
+
+    '''
+    Slice a fresh copy of the data, made at now, with func. Get the
+    milliseconds, the statements issued, and the words' values decayed to
+    reading.
+    '''
+
+    db.drop_all()
+    db.create_all()
+
+    random.seed(0)
+    id = populate(allocations, words, now)
+    db.session.remove()
+
+    del statements[:]
+    start = time.time()
+    func(id)
+    elapsed = (time.time() - start) * 1000
+    count = len(statements)
+
+    values = Word.getValues(id, reading)
+    db.session.remove()
+
+    return elapsed, count, values
+
+
+def run(sizes=(10000, 1000000), words=1000):
+
+    ''' Time each path at each size. '''
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+
+    paths = [
+        ('orm objects, unit of work', ormSlice),
+        ('vectorized slice()', slicer.slice),
+        ('set-based bulkSlice()', slicer.bulkSlice)]
+
+    for allocations in sizes:
+
+        print 'allocations: %d to %d words' % (allocations, words)
+        print
+
+        baseline = None
+        now = time.time()
+        reading = now + 3600
+
+        for name, func in paths:
+
+            elapsed, count, values = measure(func, allocations, words,
+                    now, reading)
+            baseline = baseline or values
+
+            # Same answer every way, relative to the baseline.
+            error = max(abs(baseline[k] - v) / abs(baseline[k])
+                    for k, v in values.items() if baseline[k])
+
+            print '%-28s %10.1f ms %9d statements %10.2g difference' % (
+                    name, elapsed, count, error)
+
+        print
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1: run([int(a) for a in sys.argv[1:]])
+    else: run()
@@ -0,0 +1,87 @@
+'''
+Clocks for the slicing backends and the slicing routine. The system clock
+reads real time. A VirtualClock stands still until it is advanced, so a test
+or benchmark can drive hours of slicing in seconds, and get the same result
+every time.
+'''
+
+import datetime as dt
+import time
+
+
+class Clock(object):
+
+    ''' Real time. '''
+
+    virtual = False
+
+
+    def time(self):
+
+        ''' Get the seconds since the epoch. '''
+
+        return time.time()
+
+
+    def now(self):
+
+        ''' Get the local datetime. '''
+
+        return dt.datetime.now()
+
+
+    def sleep(self, seconds):
+
+        ''' Wait for some seconds. '''
+
+        time.sleep(seconds)
+
+
+class VirtualClock(Clock):
+
+    '''
+    Simulated time. It only moves forward, when advanced or slept on; the
+    schedulers' advance() steps it from one due slice to the next.
+    '''
+
+    virtual = True
+
+
+    def __init__(self, start=None):
+
+        ''' Set the start time, in seconds; by default, the real time. '''
+
+        self.current = time.time() if start is None else float(start)
+
+
+    def time(self):
+        return self.current
+
+
+    def now(self):
+        return dt.datetime.fromtimestamp(self.current)
+
+
+    def sleep(self, seconds):
+
+        ''' Pass some seconds at once. '''
+
+        self.advance(seconds)
+
+
+    def advance(self, seconds):
+
+        ''' Move forward some seconds. '''
+
+        self.set(self.current + seconds)
+
+
+    def set(self, seconds):
+
+        ''' Move forward to a time, in seconds. Never moves back. '''
+
+        self.current = max(self.current, float(seconds))
+
+
+# The real clock, shared by default.
+SYSTEM = Clock()
@@ -0,0 +1,112 @@
+'''
+Vectorized decay of allocations. A haiku's live allocations are loaded into
+columnar NumPy arrays in one query, decayed with one exp() over the whole
+array, and summed per word with np.bincount, so slicing a round costs a few
+array passes rather than a Python loop over ORM rows.
+
+Decay is closed-form: a sum decayed to one time is rescaled to any other
+time by a single factor. So a word keeps its total as a (value, time) pair,
+and new allocations are folded into it rather than the sum recomputed.
+'''
+
+from eh import db
+from eh.models import Allocation, Round
+from collections import namedtuple
+import numpy as np
+
+
+# Columns of the live allocations, one array each.
+Allocations = namedtuple('Allocations', 'id haiku word user amount time')
+
+
+def emptyAllocations():
+
+    ''' Get columns with no rows. '''
+
+    ids = np.zeros(0, dtype=np.int64)
+    return Allocations(ids, ids, ids, ids, np.zeros(0), np.zeros(0))
+
+
+def loadAllocations(ids, folded=None):
+
+    '''
+    Load the allocations in the open rounds of the haiku with the passed
+    ids, in one query, as columns. Pass folded=False for only those not yet
+    folded into their words.
+    '''
+
+    if not ids: return emptyAllocations()
+
+    a = Allocation.__table__
+    r = Round.__table__
+
+    where = [a.c.round_id == r.c.id, r.c.ended_on == None,
+            r.c.haiku_id.in_(ids)]
+    if folded is not None: where.append(a.c.folded == folded)
+
+    query = db.select(
+            [a.c.id, a.c.haiku_id, a.c.word_id, a.c.user_id, a.c.amount,
+                a.c.allocated_at],
+            db.and_(*where))
+
+    # Plain tuples from the DB-API cursor; NumPy would probe each of
+    # SQLAlchemy's row proxies as a mapping.
+    result = db.session.execute(query)
+    rows = result.cursor.fetchall()
+    result.close()
+
+    if not rows: return emptyAllocations()
+
+    # One conversion in C, then split the columns.
+    table = np.array(rows, dtype=np.float64)
+
+    return Allocations(
+            table[:,0].astype(np.int64),
+            table[:,1].astype(np.int64),
+            table[:,2].astype(np.int64),
+            table[:,3].astype(np.int64),
+            table[:,4],
+            table[:,5])
+
+
+def decay(amounts, times, now, lifetimes):
+
+    '''
+    Get the value left of each amount at now, after exponential decay since
+    its time. lifetimes is the mean lifetime, per amount or for all.
+    '''
+
+    return amounts * np.exp(-np.maximum(now - times, 0) / lifetimes)
+
+
+def aggregate(keys, weights):
+
+    '''
+    Sum weights by key. Keys are compacted first, so ids of any size make a
+    small bincount. Returns the distinct keys and their sums.
+    '''
+
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=weights,
+            minlength=len(unique))
+
+
+def scoreWords(allocations, lifetimes, now):
+
+    '''
+    Get the decayed score of every word with a live allocation. lifetimes
+    maps haiku id to the mean lifetime. Returns word ids and scores.
+    '''
+
+    if not len(allocations.word):
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+    # Each allocation's lifetime, by way of its haiku.
+    haiku, index = np.unique(allocations.haiku, return_inverse=True)
+    lifetimes = np.array([lifetimes[h] for h in haiku], dtype=np.float64)
+
+    values = decay(allocations.amount, allocations.time, now,
+            lifetimes[index])
+
+    return aggregate(allocations.word, values)
+
@@ -0,0 +1,392 @@
+'''
+Greenlet slicing backend. Each running haiku is a lightweight greenlet that
+sleeps until its next slice, all on one gevent hub in a dedicated thread.
+The slicing routine runs in the hub's thread pool, so a greenlet waits on
+its database I/O without blocking the others, and stopping a haiku kills
+its greenlet at that point.
+
+Needs gevent. The rest of the process is not monkey-patched: other threads
+talk to the hub through a queue of commands and an async watcher.
+'''
+
+from eh.helpers.metrics import SchedulerMetrics
+from eh.helpers import phase
+from collections import deque
+import threading
+import logging
+import time
+
+try:
+    import gevent
+    import gevent.event
+except ImportError:
+    gevent = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class Slicer(object):
+
+    ''' The slicing loop for one haiku. '''
+
+
+    def __init__(self, id, interval, func, overdue=False, caughtUp=False):
+
+        '''
+        Set parameters. An overdue slicer runs straight away; one caught up
+        by a catch-up run starts an interval late.
+        '''
+
+        self.id = id
+        self.interval = interval
+        self.func = func
+        self.overdue = overdue
+        self.caughtUp = caughtUp
+        self.runs = 0
+        self.greenlet = None
+
+        # Set once the greenlet is dead.
+        self.stopped = threading.Event()
+
+
+class GreenScheduler(object):
+
+    '''
+    Run one greenlet per slicer. createSlicer() and deleteSlicer() can be
+    called from any thread; the hub applies them in order.
+    '''
+
+
+    def __init__(self, pool=None, phased=True, clock=None):
+
+        '''
+        Set up the command queue. With a SlicingPool, the greenlets hand the
+        slicing to the pool's processes instead of the hub's thread pool. If
+        phased, each haiku's slices are offset into its interval by its id.
+        The greenlets sleep on the gevent hub, so only real time will do.
+        '''
+
+        if gevent is None:
+            raise ImportError('The green scheduler backend needs gevent.')
+
+        if clock is not None and clock.virtual:
+            raise ValueError('The green scheduler backend needs a real clock.')
+
+        self.pool = pool
+        self.phased = phased
+        self.slicers = {}
+        self.commands = deque()
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.thread = None
+        self.hub = None
+        self.wakeup = None
+
+        # Lag, duration and misfires of the slicers.
+        self.metrics = SchedulerMetrics(lambda: len(self.slicers),
+                self.countQueued)
+
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+
+    def start(self):
+
+        ''' Start the hub thread, and the slicers created so far. '''
+
+        self.ready.clear()
+        self.thread = threading.Thread(target=self.run, name='GreenScheduler')
+        self.thread.daemon = True
+        self.thread.start()
+        self.ready.wait()
+
+
+    def shutdown(self, wait=True):
+
+        ''' Kill every slicing greenlet, and stop the hub. '''
+
+        if self.running:
+            self.send(('shutdown', None))
+            if wait: self.thread.join()
+
+        if self.pool: self.pool.close()
+
+
+    def getJobName(self, haiku):
+
+        ''' Construct the job name for a haiku record. '''
+
+        return 'haiku' + str(haiku.id)
+
+
+    def getJobByHaiku(self, haiku):
+
+        ''' Try to retrieve the slicer for a given haiku record. '''
+
+        return self.slicers.get(haiku.id, False)
+
+
+    def checkForSlicer(self, haiku):
+
+        ''' Check to see if there is a running slicer for a given haiku. '''
+
+        return haiku.id in self.slicers
+
+
+    def createSlicer(self, haiku, func, overdue=False):
+
+        ''' Start slicing for a poem. If overdue, slice straight away. '''
+
+        return self.addSlicer(haiku, func, overdue)
+
+
+    def createSlicers(self, haiku, func, overdue=(), batch=None):
+
+        '''
+        Start slicing for many poems. The overdue ones, by id, are caught up
+        together by catchUp(), and their own greenlets start an interval
+        late, so the catch-up stands in for the run they missed.
+        '''
+
+        caught = []
+
+        for h in haiku:
+
+            if h.id not in overdue: self.createSlicer(h, func)
+            elif self.addSlicer(h, func, caughtUp=True): caught.append(h)
+
+        self.catchUp(caught, func, batch)
+
+
+    def catchUp(self, haiku, func, batch=None):
+
+        '''
+        Slice poems once, straight away, with one call per batch ids, each
+        in a greenlet that slices like the others. Haiku stopped before
+        their batch runs are left out.
+        '''
+
+        # Run the routine in the pool.
+        if self.pool: func = self.pool.dispatch(func)
+
+        ids = [h.id for h in haiku]
+        batch = batch or len(ids)
+
+        for i in xrange(0, len(ids), batch):
+            self.send(('catchup', (func, ids[i:i + batch])))
+
+
+    def addSlicer(self, haiku, func, overdue=False, caughtUp=False):
+
+        ''' Add the slicer for a poem, unless there is one. '''
+
+        # Run the routine in the pool.
+        if self.pool: func = self.pool.dispatch(func)
+
+        with self.lock:
+
+            if haiku.id in self.slicers: return False
+
+            slicer = Slicer(haiku.id, haiku.slicing_interval, func, overdue,
+                    caughtUp)
+            self.slicers[haiku.id] = slicer
+
+        self.send(('start', slicer))
+        return slicer
+
+
+    def deleteSlicer(self, haiku, timeout=5):
+
+        ''' Stop slicing for a poem. '''
+
+        self.deleteSlicerById(haiku.id, timeout)
+
+
+    def deleteSlicerById(self, id, timeout=5):
+
+        '''
+        Stop slicing for a poem, by id. If the hub is running, wait up to
+        timeout seconds for the greenlet to die, and for any slice it is
+        running in the hub's thread pool to finish, so no slice starts or
+        commits after this returns.
+        '''
+
+        with self.lock:
+            slicer = self.slicers.pop(id, None)
+
+        if slicer is None: return
+
+        self.send(('stop', slicer))
+        if self.running: slicer.stopped.wait(timeout)
+
+        self.metrics.forget(id)
+
+
+    def getHaikuIds(self):
+
+        ''' Get the ids of the haiku that have slicers. '''
+
+        with self.lock:
+            return set(self.slicers)
+
+
+    def countQueued(self):
+
+        ''' Count the slices waiting for a pool worker. '''
+
+        return self.pool.countQueued() if self.pool else 0
+
+
+    def send(self, command):
+
+        '''
+        Queue a command for the hub, and wake it if it is running. The lock
+        keeps the hub from tearing down the watcher in between.
+        '''
+
+        self.commands.append(command)
+
+        with self.lock:
+            if self.wakeup is not None: self.wakeup.send()
+
+
+    def run(self):
+
+        ''' Hub thread: apply commands until shutdown, then clean up. '''
+
+        self.hub = gevent.get_hub()
+        self.done = gevent.event.Event()
+
+        self.wakeup = self.hub.loop.async_()
+        self.wakeup.start(self.drain)
+
+        # Apply the commands queued before the start.
+        self.drain()
+        self.ready.set()
+
+        self.done.wait()
+
+        # Cancel every loop.
+        greenlets = [s.greenlet for s in self.slicers.values() if s.greenlet]
+        gevent.killall(greenlets)
+
+        with self.lock:
+            self.wakeup.stop()
+            self.wakeup = None
+
+        self.hub.destroy(destroy_loop=True)
+        self.hub = None
+
+
+    def drain(self):
+
+        ''' In the hub: apply the queued commands, in order. '''
+
+        while self.commands:
+
+            action, slicer = self.commands.popleft()
+
+            # The routine and ids, for a catch-up.
+            if action == 'catchup':
+                gevent.spawn(self.catchUpBatch, *slicer)
+
+            elif action == 'start':
+                slicer.greenlet = gevent.spawn(self.loop, slicer)
+                slicer.greenlet.link(lambda g, s=slicer: s.stopped.set())
+
+            elif action == 'stop':
+                if slicer.greenlet: slicer.greenlet.kill(block=False)
+                else: slicer.stopped.set()
+
+            elif action == 'shutdown':
+                self.done.set()
+
+
+    def slice(self, slicer):
+
+        '''
+        In a greenlet: run the routine in the hub's thread pool, and wait for
+        it. A kill cannot stop the thread, so a greenlet killed mid-slice
+        waits for the slice to finish before it dies.
+        '''
+
+        task = self.hub.threadpool.spawn(slicer.func, slicer.id)
+
+        try: task.get()
+        except gevent.GreenletExit:
+            task.wait()
+            raise
+
+
+    def catchUpBatch(self, func, ids):
+
+        ''' In a greenlet: slice the ids still running, in one call. '''
+
+        with self.lock:
+            ids = [id for id in ids if id in self.slicers]
+
+        if not ids: return
+
+        # A pool only queues the ids, so it can be called in the hub.
+        try:
+            if self.pool: func(*ids)
+            else: self.hub.threadpool.spawn(func, *ids).get()
+
+        except Exception:
+            self.metrics.observeError(ids)
+            logger.exception('Catching up %d haiku failed', len(ids))
+
+
+    def loop(self, slicer):
+
+        '''
+        In a greenlet: slice every interval, on a fixed schedule. Slices
+        missed while a slow one ran are skipped rather than queued.
+        '''
+
+        now = time.time()
+        if self.phased: due = phase.firstDue(slicer.id, slicer.interval, now)
+        else: due = now + slicer.interval
+
+        # The last time on the schedule, which has passed.
+        if slicer.overdue: due -= slicer.interval
+
+        # After the run the catch-up stands in for.
+        if slicer.caughtUp: due += slicer.interval
+
+        while True:
+
+            gevent.sleep(max(0, due - time.time()))
+
+            started = time.time()
+            self.metrics.observeStart(slicer.id, max(0.0, started - due))
+            self.metrics.active.inc()
+
+            # A pool only queues the ids, so it can be called in the hub.
+            try:
+                if self.pool: slicer.func(slicer.id)
+                else: self.slice(slicer)
+
+            except gevent.GreenletExit: raise
+            except Exception:
+                self.metrics.observeError([slicer.id])
+                logger.exception('Slicing haiku %d failed', slicer.id)
+
+            finally:
+                self.metrics.active.dec()
+
+            if not self.pool:
+                self.metrics.observeDuration(time.time() - started,
+                        [slicer.id])
+
+            slicer.runs += 1
+
+            now = time.time()
+            due += slicer.interval
+            if due <= now:
+                missed = int((now - due) // slicer.interval) + 1
+                self.metrics.observeMisfire(slicer.id, missed)
+                due += missed * slicer.interval
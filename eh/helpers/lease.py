@@ -0,0 +1,168 @@
+'''
+Sharded slicing across several scheduler processes. Haiku are split into
+SHARDS shards by id % SHARDS, and each node slices only the shards it holds
+leases on. Nodes heartbeat to renew their leases; the leases of a node that
+stops heartbeating expire and are claimed by the others.
+
+Times are UTC, so the nodes' clocks need to agree to well within DURATION.
+A node that fails to renew drops its shards at once, and each slice checks
+the lease in the database first, so a node that lost a shard never slices
+it beside the node that took it over.
+'''
+
+from eh import db
+from eh.models import Lease, Node
+import datetime as dt
+import socket
+import math
+import os
+
+
+# Number of shards. Fixed for the life of the database.
+SHARDS = 64
+
+# Seconds a lease lasts without a heartbeat.
+DURATION = 30
+
+
+def nodeName():
+
+    ''' Name this process, uniquely across hosts. '''
+
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+
+class Fenced(object):
+
+    '''
+    Callable that runs func(*ids) on only the ids in shards whose lease node
+    still holds, checked in the database at each call, in whichever process
+    makes it. Equal for the same func and node, so the wheel backend still
+    batches haiku that share a routine.
+    '''
+
+
+    def __init__(self, func, node, count):
+
+        ''' Set parameters. '''
+
+        self.func = func
+        self.node = node
+        self.count = count
+
+
+    def __call__(self, *ids):
+
+        held = Lease.getHeldShards(self.node, dt.datetime.utcnow())
+        owned = [id for id in ids if id % self.count in held]
+
+        if owned: return self.func(*owned)
+
+
+    def __eq__(self, other):
+        return isinstance(other, Fenced) and \
+                (self.func, self.node, self.count) == \
+                (other.func, other.node, other.count)
+
+
+    def __ne__(self, other):
+        return not self == other
+
+
+    def __hash__(self):
+        return hash((self.func, self.node, self.count))
+
+
+class LeaseManager(object):
+
+    ''' Hold and renew this node's share of the shard leases. '''
+
+
+    def __init__(self, node=None, shards=SHARDS, duration=DURATION):
+
+        ''' Set parameters. '''
+
+        self.node = node or nodeName()
+        self.count = shards
+        self.duration = dt.timedelta(seconds = duration)
+        self.shards = set()
+
+
+    def heartbeat(self, now=None):
+
+        '''
+        Renew this node's leases and rebalance: give back shards above a
+        fair share of the live nodes, and claim free or expired shards up to
+        it. Returns the set of shards held. If anything fails, the node
+        holds no shards until the next heartbeat that succeeds.
+        '''
+
+        now = now or dt.datetime.utcnow()
+
+        try: return self.rebalance(now)
+        except Exception:
+            db.session.rollback()
+            self.shards = set()
+            raise
+
+
+    def rebalance(self, now):
+
+        ''' Renew, give back and claim leases, for heartbeat(). '''
+
+        expires = now + self.duration
+
+        Lease.createLeases(self.count)
+
+        # Announce this node, keep what it holds.
+        Node.announceNode(self.node, expires)
+        Lease.renewLeases(self.node, now, expires)
+        db.session.commit()
+
+        leases = Lease.query.all()
+        fair = int(math.ceil(self.count / float(Node.countLiveNodes(now))))
+
+        held = sorted(l.shard for l in leases
+                if l.node == self.node and l.expires_on >= now)
+
+        # Give back the extras for the new nodes to claim.
+        if len(held) > fair:
+            Lease.releaseLeases(self.node, held[fair:])
+            held = held[:fair]
+
+        # Claim free or expired shards.
+        for lease in leases:
+            if len(held) >= fair: break
+            if lease.node is None or lease.expires_on < now:
+                if Lease.claimLease(lease.shard, self.node, now, expires):
+                    held.append(lease.shard)
+
+        db.session.commit()
+
+        self.shards = set(held)
+        return self.shards
+
+
+    def release(self):
+
+        ''' Give up every lease, so other nodes take over straight away. '''
+
+        Lease.releaseLeases(self.node)
+        Node.removeNode(self.node)
+        db.session.commit()
+
+        self.shards = set()
+
+
+    def owns(self, id):
+
+        ''' Check whether this node slices the haiku with a given id. '''
+
+        return id % self.count in self.shards
+
+
+    def fenced(self, func):
+
+        ''' Wrap func so that it only slices the shards this node holds. '''
+
+        return Fenced(func, self.node, self.count)
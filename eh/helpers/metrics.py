@@ -0,0 +1,467 @@
+'''
+In-process metrics: counters, gauges and histograms, optionally labelled,
+exposed in the Prometheus text format. The slicing processes publish their
+exposition, labelled by node, for the web workers to merge and serve.
+'''
+
+from collections import OrderedDict
+import threading
+import heapq
+
+
+def formatValue(value):
+
+    ''' Format a sample value. '''
+
+    if value == float('inf'): return '+Inf'
+    return repr(float(value))
+
+
+def formatLabels(key, extra=()):
+
+    ''' Format a label set as {name="value",...}. '''
+
+    pairs = list(key) + list(extra)
+    if not pairs: return ''
+
+    escape = lambda v: str(v).replace('\\', r'\\') \
+            .replace('"', r'\"').replace('\n', r'\n')
+
+    return '{%s}' % ','.join('%s="%s"' % (k, escape(v)) for k, v in pairs)
+
+
+class Metric(object):
+
+    ''' A named metric, with a series of values per label set. '''
+
+    kind = 'untyped'
+
+
+    def __init__(self, name, help):
+
+        ''' Set parameters. '''
+
+        self.name = name
+        self.help = help
+        self.series = {}
+        self.lock = threading.Lock()
+
+
+    def key(self, labels):
+
+        ''' Get the series key for a label set. '''
+
+        return tuple(sorted(labels.iteritems()))
+
+
+    def remove(self, **labels):
+
+        ''' Drop the series for a label set. '''
+
+        with self.lock:
+            self.series.pop(self.key(labels), None)
+
+
+    def samples(self):
+
+        ''' Get (suffix, labels, value) for each sample. '''
+
+        with self.lock:
+            return [('', key, value) for key, value in
+                    sorted(self.series.iteritems())]
+
+
+    def expose(self, labels=()):
+
+        '''
+        Format the metric in the text exposition format, adding labels, a
+        list of (name, value) pairs, to every sample.
+        '''
+
+        lines = [
+            '# HELP %s %s' % (self.name, self.help),
+            '# TYPE %s %s' % (self.name, self.kind)]
+
+        for suffix, key, value in self.samples():
+            lines.append('%s%s%s %s' % (self.name, suffix,
+                formatLabels(key, labels), formatValue(value)))
+
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+
+    ''' A count that only goes up. '''
+
+    kind = 'counter'
+
+
+    def inc(self, amount=1, **labels):
+
+        ''' Add to the count. '''
+
+        key = self.key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+
+    def get(self, **labels):
+
+        ''' Get the count. '''
+
+        return self.series.get(self.key(labels), 0)
+
+
+class Gauge(Metric):
+
+    ''' A value that goes up and down, or is read from a function. '''
+
+    kind = 'gauge'
+
+
+    def __init__(self, name, help, func=None):
+
+        ''' Set parameters. If func is passed, the value is func(). '''
+
+        super(Gauge, self).__init__(name, help)
+        self.func = func
+
+
+    def set(self, value, **labels):
+
+        ''' Set the value. '''
+
+        with self.lock:
+            self.series[self.key(labels)] = value
+
+
+    def inc(self, amount=1, **labels):
+
+        ''' Add to the value. '''
+
+        key = self.key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+
+    def dec(self, amount=1, **labels):
+
+        ''' Subtract from the value. '''
+
+        self.inc(-amount, **labels)
+
+
+    def get(self, **labels):
+
+        ''' Get the value. '''
+
+        if self.func: return self.func()
+        return self.series.get(self.key(labels), 0)
+
+
+    def samples(self):
+        if self.func: return [('', (), self.func())]
+        return super(Gauge, self).samples()
+
+
+class Histogram(Metric):
+
+    ''' Counts of observations in buckets, with their sum and count. '''
+
+    kind = 'histogram'
+
+
+    def __init__(self, name, help, buckets):
+
+        ''' Set the upper bounds of the buckets. '''
+
+        super(Histogram, self).__init__(name, help)
+        self.buckets = sorted(buckets) + [float('inf')]
+
+
+    def observe(self, value, **labels):
+
+        ''' Record an observation. '''
+
+        key = self.key(labels)
+
+        with self.lock:
+
+            counts, total = self.series.get(key,
+                    ([0] * len(self.buckets), 0.0))
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+
+            self.series[key] = (counts, total + value)
+
+
+    def get(self, **labels):
+
+        '''
+        Get the cumulative bucket counts, as (bound, count) pairs, the sum
+        and the count of the observations.
+        '''
+
+        counts, total = self.series.get(self.key(labels),
+                ([0] * len(self.buckets), 0.0))
+
+        cumulative, running = [], 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            cumulative.append((bound, running))
+
+        return {'buckets': cumulative, 'sum': total, 'count': running}
+
+
+    def samples(self):
+
+        with self.lock:
+            keys = sorted(self.series)
+
+        samples = []
+        for key in keys:
+            values = self.get(**dict(key))
+            for bound, count in values['buckets']:
+                samples.append(('_bucket',
+                    key + (('le', formatValue(bound)),), count))
+            samples.append(('_sum', key, values['sum']))
+            samples.append(('_count', key, values['count']))
+
+        return samples
+
+
+class Registry(object):
+
+    ''' A set of metrics, exposed together. '''
+
+
+    def __init__(self):
+
+        ''' Start empty. '''
+
+        self.metrics = OrderedDict()
+
+
+    def add(self, metric):
+
+        ''' Register a metric, or get the one already registered by name. '''
+
+        return self.metrics.setdefault(metric.name, metric)
+
+
+    def counter(self, name, help):
+        return self.add(Counter(name, help))
+
+
+    def gauge(self, name, help, func=None):
+        return self.add(Gauge(name, help, func))
+
+
+    def histogram(self, name, help, buckets):
+        return self.add(Histogram(name, help, buckets))
+
+
+    def get(self, name):
+
+        ''' Get a metric by name. '''
+
+        return self.metrics[name]
+
+
+    def expose(self, labels=()):
+
+        ''' Format every metric in the text exposition format. '''
+
+        return '\n'.join(m.expose(labels)
+                for m in self.metrics.values()) + '\n'
+
+
+def merge(texts):
+
+    '''
+    Merge expositions of the same metrics from several processes into one,
+    with each metric's HELP and TYPE once, followed by every process's
+    samples. The samples need labels that tell the processes apart.
+    '''
+
+    families = OrderedDict()
+    name = None
+
+    for text in texts:
+        for line in text.splitlines():
+
+            if line.startswith('# '):
+                name = line.split()[2]
+                family = families.setdefault(name, ([], []))
+                if len(family[0]) < 2: family[0].append(line)
+
+            elif line: families[name][1].append(line)
+
+    return ''.join('\n'.join(header + samples) + '\n'
+            for header, samples in families.values())
+
+
+# Bucket bounds, in seconds.
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+        1, 2.5)
+
+
+class HaikuStats(object):
+
+    ''' Running totals of one haiku's slices. '''
+
+
+    def __init__(self):
+
+        ''' Start at zero. '''
+
+        self.runs = 0
+        self.errors = 0
+        self.misfires = 0
+        self.lag = 0.0
+        self.lastLag = 0.0
+        self.maxLag = 0.0
+        self.calls = 0
+        self.duration = 0.0
+
+
+class SchedulerMetrics(Registry):
+
+    '''
+    The metrics of a slicing backend. Lag, runs, misfires and errors are
+    exposed in aggregate only, so the exposition stays the same size with
+    any number of haiku; each haiku's totals are kept in-process, for
+    getHaiku() and mostLagging(). The gauges read the backend.
+    '''
+
+
+    def __init__(self, slicers, queued=None):
+
+        '''
+        Register the metrics. slicers() counts the scheduled slicers, and
+        queued() the slices waiting to run.
+        '''
+
+        super(SchedulerMetrics, self).__init__()
+
+        self.lag = self.histogram('eh_slicer_lag_seconds',
+                'Time from when a slice was due to when it started.',
+                LAG_BUCKETS)
+
+        self.duration = self.histogram('eh_slicer_duration_seconds',
+                'Time spent in the slicing routine, per call.',
+                DURATION_BUCKETS)
+
+        self.runs = self.counter('eh_slicer_runs_total',
+                'Slices run.')
+
+        self.errors = self.counter('eh_slicer_errors_total',
+                'Slices that raised an error.')
+
+        self.misfires = self.counter('eh_slicer_misfires_total',
+                'Slices skipped because they were too late.')
+
+        self.slicers = self.gauge('eh_slicers',
+                'Haiku with a slicer.', slicers)
+
+        self.active = self.gauge('eh_slicer_active',
+                'Calls to the slicing routine in progress.')
+
+        self.queued = self.gauge('eh_slicer_queue_depth',
+                'Slices waiting to run.', queued or (lambda: 0))
+
+        # Per haiku, not exposed: id -> HaikuStats.
+        self.haiku = {}
+        self.lock = threading.Lock()
+
+
+    def stats(self, id):
+
+        ''' Get a haiku's totals, creating them. Call with the lock held. '''
+
+        stats = self.haiku.get(id)
+        if stats is None: stats = self.haiku[id] = HaikuStats()
+        return stats
+
+
+    def observeStart(self, id, lag):
+
+        ''' Record a slice starting lag seconds after it was due. '''
+
+        self.lag.observe(lag)
+        self.runs.inc()
+
+        with self.lock:
+            stats = self.stats(id)
+            stats.runs += 1
+            stats.lag += lag
+            stats.lastLag = lag
+            stats.maxLag = max(stats.maxLag, lag)
+
+
+    def observeDuration(self, duration, ids):
+
+        '''
+        Record a call to the slicing routine. It is only attributed to a
+        haiku if the call sliced just that one.
+        '''
+
+        self.duration.observe(duration)
+        if len(ids) != 1: return
+
+        with self.lock:
+            stats = self.stats(ids[0])
+            stats.calls += 1
+            stats.duration += duration
+
+
+    def observeError(self, ids):
+
+        ''' Record a failed call to the slicing routine. '''
+
+        self.errors.inc(len(ids))
+
+        with self.lock:
+            for id in ids: self.stats(id).errors += 1
+
+
+    def observeMisfire(self, id, count=1):
+
+        ''' Record slices skipped for a haiku. '''
+
+        self.misfires.inc(count)
+
+        with self.lock:
+            self.stats(id).misfires += count
+
+
+    def forget(self, id):
+
+        ''' Drop the totals of a haiku that stopped. '''
+
+        with self.lock:
+            self.haiku.pop(id, None)
+
+
+    def getHaiku(self, id):
+
+        ''' Get a haiku's totals, or None if it has not been sliced. '''
+
+        with self.lock:
+            return self.haiku.get(id)
+
+
+    def mostLagging(self, n=10):
+
+        '''
+        Get the n haiku whose last slice started latest, as (id, HaikuStats)
+        pairs, latest first.
+        '''
+
+        with self.lock:
+            return heapq.nlargest(n, self.haiku.items(),
+                    key=lambda item: item[1].lastLag)
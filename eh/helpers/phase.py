@@ -0,0 +1,24 @@
+'''
+Deterministic phase offsets for slicers. Haiku that share a slicing
+interval would otherwise all fire at the same moment; instead each fires at
+a fixed offset into the interval, derived from its id, so the load spreads
+evenly. The offsets are on the wall clock, so they are the same after a
+restart and on every node.
+'''
+
+# Knuth's multiplicative hash. Consecutive ids land far apart.
+MULTIPLIER = 2654435761
+
+
+def phase(id, interval):
+
+    ''' Get the offset of a haiku's slices into its interval, in seconds. '''
+
+    return (id * MULTIPLIER % 2**32) / float(2**32) * interval
+
+
+def firstDue(id, interval, now):
+
+    ''' Get the first time after now that is on a haiku's phase. '''
+
+    return now + interval - (now - phase(id, interval)) % interval
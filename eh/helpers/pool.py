@@ -0,0 +1,254 @@
+'''
+Process pool for the slicing routine. Slicing is CPU-bound, so the slicing
+process hands each batch of haiku ids to worker processes instead of running
+it on the scheduler's threads. Haiku are partitioned by id, so a haiku is
+always sliced by the same worker, and never by two at once. The workers
+time each call to the routine, and report back to the pool for its metrics.
+'''
+
+from eh import db
+import multiprocessing
+import threading
+import logging
+import signal
+import Queue
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# In a worker: the database session and pool inherited from the parent.
+inherited = None
+
+
+def partition(ids, size):
+
+    ''' Split ids into size lists, by id modulo size. '''
+
+    parts = [[] for i in xrange(size)]
+    for id in ids:
+        parts[id % size].append(id)
+
+    return parts
+
+
+def work(queue, reports=None):
+
+    '''
+    Worker loop: run (func, ids) tasks until a None arrives. With a reports
+    queue, put (ids, seconds, failed) on it for each task.
+    '''
+
+    # The parent shuts the workers down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Start on a fresh pool. The inherited connections are the parent's, so
+    # keep them referenced, never closed or rolled back from here.
+    global inherited
+    inherited = db.session.registry(), db.engine.pool
+    db.session.registry.clear()
+    db.engine.pool = db.engine.pool.recreate()
+
+    while True:
+
+        task = queue.get()
+        if task is None: return
+
+        func, ids = task
+        started = time.time()
+        failed = False
+
+        try: func(*ids)
+        except Exception:
+            failed = True
+            logger.exception('Slicing %d haiku failed', len(ids))
+
+        if reports is not None:
+            reports.put((ids, time.time() - started, failed))
+
+        db.session.remove()
+
+
+class Dispatch(object):
+
+    '''
+    Callable that hands func(*ids) to a pool. Equal for the same pool and
+    func, so the wheel backend still batches haiku that share a routine.
+    '''
+
+
+    def __init__(self, pool, func):
+
+        ''' Set parameters. '''
+
+        self.pool = pool
+        self.func = func
+
+
+    def __call__(self, *ids):
+        self.pool.submit(self.func, *ids)
+
+
+    def __eq__(self, other):
+        return isinstance(other, Dispatch) and \
+                (self.pool, self.func) == (other.pool, other.func)
+
+
+    def __ne__(self, other):
+        return not self == other
+
+
+    def __hash__(self):
+        return hash((id(self.pool), self.func))
+
+
+class SlicingPool(object):
+
+    '''
+    Fixed set of worker processes, one task queue each. The functions passed
+    to submit() must be picklable, which module-level functions are.
+    '''
+
+
+    def __init__(self, size=None, metrics=None):
+
+        '''
+        Set the number of workers; by default, one per core. With a
+        SchedulerMetrics, the workers report the duration and errors of
+        each call, and record() adds them to it.
+        '''
+
+        self.size = size or multiprocessing.cpu_count()
+        self.metrics = metrics
+        self.queues = []
+        self.reports = []
+        self.workers = []
+        self.lock = threading.Lock()
+
+
+    def spawn(self, i):
+
+        ''' Fork worker i, with its own queues. Get the queues and worker. '''
+
+        queue = multiprocessing.Queue()
+        reports = multiprocessing.Queue() if self.metrics else None
+
+        # Leave no idle connections for the worker to inherit.
+        db.engine.dispose()
+
+        worker = multiprocessing.Process(target=work, args=(queue, reports),
+                name='SlicingWorker-%d' % i)
+
+        worker.daemon = True
+        worker.start()
+
+        return queue, reports, worker
+
+
+    def start(self):
+
+        ''' Fork the workers. '''
+
+        for i in xrange(self.size):
+
+            queue, reports, worker = self.spawn(i)
+            self.queues.append(queue)
+            self.reports.append(reports)
+            self.workers.append(worker)
+
+        return self
+
+
+    def revive(self):
+
+        '''
+        Replace the workers that have died, so their partitions are sliced
+        again. The tasks queued for a dead worker are dropped; the next
+        slice of each of its haiku catches up on them. Returns the number
+        of workers replaced. The slicing process calls this every tick.
+        '''
+
+        revived = 0
+
+        with self.lock:
+
+            for i, worker in enumerate(self.workers):
+
+                if worker.is_alive(): continue
+
+                logger.warning('Slicing worker %d died with exit code %s, '
+                        'restarting it', i, worker.exitcode)
+
+                # Don't block the exit on tasks no one will read.
+                self.queues[i].cancel_join_thread()
+                self.queues[i].close()
+
+                self.queues[i], self.reports[i], self.workers[i] = \
+                        self.spawn(i)
+                revived += 1
+
+        return revived
+
+
+    def submit(self, func, *ids):
+
+        ''' Queue func(*ids) on the workers, partitioned by id. '''
+
+        with self.lock:
+            for queue, part in zip(self.queues, partition(ids, self.size)):
+                if part: queue.put((func, part))
+
+        self.record()
+
+
+    def record(self):
+
+        '''
+        Add the calls the workers have reported to the metrics. Called on
+        every submit(), and by the slicing process before it publishes its
+        metrics. Returns the number of calls added.
+        '''
+
+        if not self.metrics: return 0
+
+        count = 0
+
+        for reports in list(self.reports):
+            while True:
+
+                try: ids, duration, failed = reports.get_nowait()
+                except (Queue.Empty, IOError, EOFError): break
+
+                self.metrics.observeDuration(duration, ids)
+                if failed: self.metrics.observeError(ids)
+                count += 1
+
+        return count
+
+
+    def countQueued(self):
+
+        ''' Count the tasks waiting for the workers. '''
+
+        return sum(queue.qsize() for queue in self.queues)
+
+
+    def dispatch(self, func):
+
+        ''' Wrap func so that calling it submits to the pool. '''
+
+        return Dispatch(self, func)
+
+
+    def close(self):
+
+        ''' Let the workers finish their queues, then stop them. '''
+
+        for queue in self.queues:
+            queue.put(None)
+
+        for worker in self.workers:
+            worker.join()
+
+        self.record()
+        self.queues, self.reports, self.workers = [], [], []
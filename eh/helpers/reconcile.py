@@ -0,0 +1,136 @@
+'''
+Check the words' running values against their allocations. Allocations are
+folded into their word's value when they are written, so the standings are
+read without touching the allocations; this recomputes the values from the
+raw rows, to catch and repair any drift. A repair only applies to a word
+that still has the value it was checked with, so it never overwrites an
+allocation folded in meanwhile; such words are checked again.
+'''
+
+from eh import db
+from eh.models import Haiku, Word, Round
+from eh.helpers import decay
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Most haiku checked in one pass.
+BATCH = 500
+
+# Relative difference allowed for rounding.
+TOLERANCE = 1e-6
+
+# Seconds between reconciliations in the slicing process.
+INTERVAL = 300
+
+# Times a repair is retried on words that changed under it.
+RETRIES = 3
+
+
+def reconcileBatch(ids, now=None):
+
+    '''
+    Get the mismatched words of some haiku, as (word id, running, expected,
+    (value, value_at), time) tuples, with the row as it was read and the
+    time the values are compared at: now, or by default the time after the
+    rows are read.
+    '''
+
+    lifetimes = dict(db.session.query(Haiku.id, Haiku.decay_mean_lifetime)
+            .filter(Haiku.id.in_(ids)))
+
+    # Words before allocations: a fold in between then shows as a changed
+    # row on repair, rather than as a value that already has it.
+    rows = Word.query.filter(Word.haiku_id.in_(ids)).all()
+
+    # Only folded allocations are in the running values.
+    allocations = decay.loadAllocations(ids, folded=True)
+
+    # Everything folded so far is then in the past.
+    now = time.time() if now is None else now
+
+    # Values folded after now are not decayed back to it, but scored as if
+    # made at now; leave them for a later pass.
+    later = set(allocations.word[allocations.time > now].tolist())
+
+    words, scores = decay.scoreWords(allocations,
+            dict((h, l or float('inf')) for h, l in lifetimes.items()), now)
+
+    expected = dict(zip(words.tolist(), scores.tolist()))
+
+    rounds = set(id for id, in db.session.query(Round.id)
+            .filter(Round.haiku_id.in_(ids)).filter(Round.ended_on == None))
+
+    mismatches = []
+
+    for word in rows:
+
+        # Words of the open rounds.
+        if word.round_id not in rounds and word.id not in expected: continue
+        if word.id in later or (word.value_at or 0) > now: continue
+
+        running = word.getValue(lifetimes[word.haiku_id], now)
+        value = expected.get(word.id, 0.0)
+
+        if abs(running - value) > TOLERANCE * max(1.0, abs(value)):
+            mismatches.append((word.id, running, value,
+                (word.value, word.value_at), now))
+
+    return mismatches
+
+
+def repairBatch(mismatches, now=None):
+
+    '''
+    Reset mismatched running values to the expected ones, at the time they
+    were compared. A word whose row changed since it was read is checked
+    again, at now or the time then, up to RETRIES times. Get the number of
+    words left unrepaired.
+    '''
+
+    for attempt in xrange(RETRIES):
+
+        changed = Word.replaceValues([(id, observed, value, at)
+            for id, running, value, observed, at in mismatches])
+        db.session.commit()
+
+        if not changed: return 0
+
+        # Check the haiku of the changed words again.
+        ids = [id for id, in db.session.query(Word.haiku_id).distinct()
+                .filter(Word.id.in_(changed))]
+        mismatches = reconcileBatch(ids, now)
+
+    if mismatches:
+        logger.warning('%d word values kept changing; left for the next pass',
+                len(mismatches))
+
+    return len(mismatches)
+
+
+def reconcile(ids, now=None, repair=True):
+
+    '''
+    Recompute the value of every word in the open rounds of the haiku with
+    the passed ids, and compare it with the running value. Returns a list
+    of (word id, running, expected) for the words that differ. With repair,
+    their running values are reset to the expected ones. Values are
+    compared at now, or by default at the time each batch is read.
+    '''
+
+    ids = sorted(ids)
+    mismatches = []
+
+    for i in xrange(0, len(ids), BATCH):
+        mismatches.extend(reconcileBatch(ids[i:i + BATCH], now))
+
+    if mismatches:
+
+        logger.warning('%d word values drifted from their allocations',
+                len(mismatches))
+
+        if repair: repairBatch(mismatches, now)
+
+    return [m[:3] for m in mismatches]
@@ -2,9 +2,65 @@
 Extension of the APScheduler Scheduler class that manages the slicing jobs.
 '''
 
-import eh.models as models
-from apscheduler.scheduler import Scheduler
+from apscheduler.scheduler import Scheduler, SchedulerAlreadyRunningError
 from apscheduler.jobstores.ram_store import RAMJobStore
+from apscheduler.events import JobEvent, \
+        EVENT_JOBSTORE_JOB_ADDED, EVENT_JOBSTORE_JOB_REMOVED, \
+        EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED
+from eh.helpers.wheel import WheelScheduler
+from eh.helpers.green import GreenScheduler
+from eh.helpers.metrics import SchedulerMetrics
+from eh.helpers.clock import SYSTEM
+from eh.helpers import phase
+from collections import deque
+import datetime as dt
+import threading
+import logging
+import time
+import sys
+
+
+logger = logging.getLogger(__name__)
+
+
+def timestamp(datetime):
+
+    ''' Convert a local datetime to seconds since the epoch. '''
+
+    return time.mktime(datetime.timetuple()) + datetime.microsecond / 1e6
+
+
+class InlinePool(object):
+
+    '''
+    Stand-in for APScheduler's thread pool on a virtual clock. Submitted
+    runs wait in a queue until drained, in the calling thread.
+    '''
+
+
+    def __init__(self):
+
+        ''' Start empty. '''
+
+        self.queue = deque()
+
+
+    def submit(self, func, *args, **kwargs):
+        self.queue.append((func, args, kwargs))
+
+
+    def drain(self):
+
+        ''' Run the queued calls, in order. '''
+
+        while self.queue:
+            func, args, kwargs = self.queue.popleft()
+            func(*args, **kwargs)
+
+
+    def shutdown(self, wait=True):
+        if wait: self.drain()
+        else: self.queue.clear()
 
 
 class HaikuScheduler(Scheduler):
@@ -15,34 +71,230 @@ class HaikuScheduler(Scheduler):
     JOBSTORE = 'eh'
 
 
-    def __init__(self):
+    def __init__(self, pool=None, phased=True, clock=None):
+
+        '''
+        Add the jobstore and the job index. With a SlicingPool, the jobs hand
+        the slicing to the pool's processes instead of running it in the
+        scheduler's threads. If phased, each haiku's slices are offset into
+        its interval by its id, instead of counting from when it started.
+        On a VirtualClock, advance() runs the jobs, not a thread.
+        '''
 
-        ''' Add the jobstore. '''
+        self.clock = clock or SYSTEM
+        self.ticking = False
+
+        if self.clock.virtual:
+            super(HaikuScheduler, self).__init__(threadpool=InlinePool())
+        else: super(HaikuScheduler, self).__init__()
 
-        super(HaikuScheduler, self).__init__()
         self.add_jobstore(RAMJobStore(), HaikuScheduler.JOBSTORE)
+        self.pool = pool
+        self.phased = phased
 
+        # Index of job name -> job, kept in step with the jobstore.
+        self.jobs = {}
+        self.add_listener(self.indexJob,
+                EVENT_JOBSTORE_JOB_ADDED | EVENT_JOBSTORE_JOB_REMOVED)
 
-    def getJobName(self, haiku):
+        # Lag, duration and misfires of the slicing jobs.
+        self.local = threading.local()
+        self.metrics = SchedulerMetrics(lambda: len(self.jobs),
+                self.countQueued)
+        self.add_listener(self.recordRun,
+                EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED)
 
-        ''' Construct the job name for a haiku record. '''
 
-        # Get the record for the admin who created the haiku.
-        admin = models.User.query.get(haiku.created_by)
+    def indexJob(self, event):
 
-        return admin.username + str(haiku.id)
+        ''' Add or remove a job from the index as the jobstore changes. '''
 
+        if event.alias != HaikuScheduler.JOBSTORE: return
 
-    def getJobByHaiku(self, haiku):
+        if event.code == EVENT_JOBSTORE_JOB_ADDED:
+            self.jobs[event.job.name] = event.job
 
-        ''' Try to retrieve a job for a given haiku record. '''
+        # Unscheduled or finished. Leave a replacement with the same name.
+        elif self.jobs.get(event.job.name) is event.job:
+            del self.jobs[event.job.name]
+
+
+    @property
+    def running(self):
+        if self.clock.virtual: return self.ticking
+        return super(HaikuScheduler, self).running
+
+
+    def start(self):
+
+        '''
+        Start the scheduler thread. On a virtual clock, only schedule the
+        pending jobs.
+        '''
+
+        if not self.clock.virtual:
+            return super(HaikuScheduler, self).start()
+
+        if self.running: raise SchedulerAlreadyRunningError
+
+        if not 'default' in self._jobstores:
+            self.add_jobstore(RAMJobStore(), 'default', True)
+
+        for job, jobstore in self._pending_jobs:
+            self._real_add_job(job, jobstore, False)
+        del self._pending_jobs[:]
+
+        self._stopped = False
+        self.ticking = True
+
+
+    def _real_add_job(self, job, jobstore, wakeup):
+
+        ''' APScheduler finds the first run on the real clock; redo it. '''
+
+        super(HaikuScheduler, self)._real_add_job(job, jobstore, wakeup)
+        if self.clock.virtual: job.compute_next_run_time(self.clock.now())
+        if getattr(job, 'overdue', False): self.pullForward(job)
+
+
+    def pullForward(self, job):
+
+        '''
+        Move a job's next run back to the last one on its schedule, which has
+        passed, so it runs straight away and then keeps its phase.
+        '''
+
+        with self._jobstores_lock:
+            job.next_run_time -= job.trigger.interval
+
+        self._wakeup.set()
+
+
+    def advance(self, seconds):
+
+        '''
+        On a virtual clock: run every job due in the next seconds, in order,
+        stepping the clock to each wakeup.
+        '''
+
+        if not self.clock.virtual:
+            raise RuntimeError('Only a virtual clock can be advanced.')
+
+        end = self.clock.time() + seconds
+        wakeup = self._process_jobs(self.clock.now())
+        self._threadpool.drain()
+
+        while wakeup is not None and timestamp(wakeup) <= end:
+
+            self.clock.set(timestamp(wakeup))
+
+            # Not before the wakeup, so rounding never leaves the job unrun.
+            wakeup = self._process_jobs(max(wakeup, self.clock.now()))
+            self._threadpool.drain()
+
+        self.clock.set(end)
+
+
+    def _run_job(self, job, run_times):
+
+        ''' Note when the run started, for recordRun(). '''
+
+        self.local.started = self.clock.time()
+        self.metrics.active.inc()
+
+        try:
+            if self.clock.virtual: self.runVirtualJob(job, run_times)
+            else: super(HaikuScheduler, self)._run_job(job, run_times)
+
+        finally: self.metrics.active.dec()
+
+
+    def runVirtualJob(self, job, run_times):
+
+        '''
+        Run a job as APScheduler does, but judge misfires on the virtual
+        clock. Runs never overlap, so there are no instances to count.
+        '''
+
+        grace = dt.timedelta(seconds = job.misfire_grace_time)
+
+        for run_time in run_times:
+
+            if self.clock.now() - run_time > grace:
+                self._notify_listeners(JobEvent(EVENT_JOB_MISSED, job,
+                    run_time))
+                continue
+
+            try: retval = job.func(*job.args, **job.kwargs)
+            except Exception:
+                exc, tb = sys.exc_info()[1:]
+                self._notify_listeners(JobEvent(EVENT_JOB_ERROR, job,
+                    run_time, exception=exc, traceback=tb))
+                logger.exception('Job "%s" raised an exception', job)
+
+            else:
+                self._notify_listeners(JobEvent(EVENT_JOB_EXECUTED, job,
+                    run_time, retval=retval))
+
+            if job.coalesce: break
+
+
+    def recordRun(self, event):
 
-        name = self.getJobName(haiku)
+        '''
+        Record the lag and duration of a slicing job once it has run, or the
+        misfire if it was too late to run. Listeners run in the job's thread,
+        straight after the job.
+        '''
 
-        for job in self.get_jobs():
-            if job.name == name: return job
+        # Only the slicers.
+        job = event.job
+        if not job.args or self.jobs.get(job.name) is not job: return
 
-        return False
+        id = job.args[0]
+
+        if event.code == EVENT_JOB_MISSED:
+            self.metrics.observeMisfire(id)
+            return
+
+        started = self.local.started
+        self.metrics.observeStart(id,
+                started - timestamp(event.scheduled_run_time))
+
+        # With a pool, the job only queues the id; the workers time slices.
+        if not self.pool:
+            self.metrics.observeDuration(self.clock.time() - started, [id])
+
+        if event.code == EVENT_JOB_ERROR:
+            self.metrics.observeError([id])
+
+
+    def countQueued(self):
+
+        ''' Count the runs waiting for a thread, or for a pool worker. '''
+
+        if self.clock.virtual: queued = len(self._threadpool.queue)
+        else: queued = self._threadpool._queue.qsize()
+        if self.pool: queued += self.pool.countQueued()
+
+        return queued
+
+
+    def getJobName(self, haiku):
+
+        '''
+        Construct the job name for a haiku record. The name depends only on
+        the id, so building it never touches the database.
+        '''
+
+        return 'haiku' + str(haiku.id)
+
+
+    def getJobByHaiku(self, haiku):
+
+        ''' Try to retrieve a job for a given haiku record. '''
+
+        return self.jobs.get(self.getJobName(haiku), False)
 
 
     def checkForSlicer(self, haiku):
@@ -52,19 +304,116 @@ class HaikuScheduler(Scheduler):
         return True if self.getJobByHaiku(haiku) else False
 
 
-    def createSlicer(self, haiku, func):
+    def createSlicer(self, haiku, func, overdue=False):
+
+        '''
+        Start slicing for a poem. The job calls func(haiku.id). Runs that are
+        late or overlap a slow one are coalesced into one, since the slicer
+        catches up on the whole elapsed time. If overdue, the first run is
+        straight away, through the job like any other.
+        '''
+
+        return self.addSlicer(haiku, func, self.firstDue(haiku), overdue)
+
+
+    def createSlicers(self, haiku, func, overdue=(), batch=None):
+
+        '''
+        Start slicing for many poems. The overdue ones, by id, are caught up
+        together by catchUp(), and their own jobs start an interval later,
+        so the catch-up stands in for the run they missed and never runs
+        beside one.
+        '''
+
+        caught = []
+
+        for h in haiku:
+
+            if h.id not in overdue: self.createSlicer(h, func)
+            elif self.addSlicer(h, func,
+                    self.firstDue(h) + h.slicing_interval):
+                caught.append(h)
+
+        self.catchUp(caught, func, batch)
+
+
+    def catchUp(self, haiku, func, batch=None):
+
+        '''
+        Slice poems once, straight away, with one run of a one-off job per
+        batch ids, through the thread pool or the SlicingPool like the other
+        jobs. A run is skipped if it is later than the shortest interval of
+        its haiku, whose own jobs have sliced by then.
+        '''
+
+        if not haiku: return
+
+        # Run the routine in the pool.
+        if self.pool: func = self.pool.dispatch(func)
+
+        batch = batch or len(haiku)
+
+        for i in xrange(0, len(haiku), batch):
 
-        ''' Start slicing for a poem. '''
+            part = haiku[i:i + batch]
+            interval = min(h.slicing_interval for h in part)
+            start = dt.datetime.fromtimestamp(self.clock.time() + interval)
+
+            job = self.add_interval_job(
+                func = func,
+                args = [h.id for h in part],
+                seconds = interval,
+                start_date = start,
+                max_runs = 1,
+                misfire_grace_time = interval,
+                name = 'catchup')
+
+            # Due at once; pulled forward when the scheduler starts if not.
+            job.overdue = True
+            if self.running: self.pullForward(job)
+
+
+    def firstDue(self, haiku):
+
+        ''' Get the time of a new job's first run. '''
+
+        # Spread haiku with the same interval across it.
+        now = self.clock.time()
+        if self.phased:
+            return phase.firstDue(haiku.id, haiku.slicing_interval, now)
+        else: return now + haiku.slicing_interval
+
+
+    def addSlicer(self, haiku, func, due, overdue=False):
+
+        ''' Add the job for a poem, first due at due, unless there is one. '''
+
+        # Run the routine in the pool.
+        if self.pool: func = self.pool.dispatch(func)
+
+        start = dt.datetime.fromtimestamp(due)
 
         # If a slicer does not already exist, create one.
         if not self.checkForSlicer(haiku):
 
-            return self.add_interval_job(
+            job = self.add_interval_job(
                 func = func,
+                args = [haiku.id],
                 seconds = haiku.slicing_interval,
+                start_date = start,
+                coalesce = True,
+                max_instances = 1,
+                misfire_grace_time = haiku.slicing_interval,
                 name = self.getJobName(haiku),
                 jobstore = HaikuScheduler.JOBSTORE)
 
+            # A pending job is pulled forward when the scheduler starts.
+            if overdue:
+                job.overdue = True
+                if self.running: self.pullForward(job)
+
+            return job
+
         else: return False
 
 
@@ -72,9 +421,62 @@ class HaikuScheduler(Scheduler):
 
         ''' Stop slicing for a poem. '''
 
+        self.deleteSlicerById(haiku.id)
+
+
+    def deleteSlicerById(self, id):
+
+        ''' Stop slicing for a poem, by id. '''
+
         # Get the job.
-        slicer = self.getJobByHaiku(haiku)
+        slicer = self.jobs.get('haiku' + str(id))
 
         # Remove.
         if slicer:
             self.unschedule_job(slicer)
+
+        self.metrics.forget(id)
+
+
+    def shutdown(self, *args, **kwargs):
+
+        ''' Stop the scheduler, then the pool. '''
+
+        if self.clock.virtual:
+            self._stopped = True
+            self.ticking = False
+
+        else: super(HaikuScheduler, self).shutdown(*args, **kwargs)
+
+        if self.pool: self.pool.close()
+
+
+    def getHaikuIds(self):
+
+        ''' Get the ids of the haiku that have slicers. '''
+
+        return set(job.args[0] for job in self.jobs.values() if job.args)
+
+
+# Slicing backends, by name.
+BACKENDS = {
+    'apscheduler': HaikuScheduler,
+    'wheel': WheelScheduler,
+    'green': GreenScheduler }
+
+
+def createScheduler(backend='apscheduler', pool=None, phased=True, clock=None):
+
+    '''
+    Instantiate a slicing backend. Each calls the slicing routine with the
+    ids of the haiku to slice: one id per call for 'apscheduler' and 'green',
+    which run a job or a greenlet per haiku, and every due id in one call for
+    'wheel'. Any of them can hand the calls to a SlicingPool, and phase the
+    slices of each haiku by its id. 'apscheduler' and 'wheel' can also run
+    on a VirtualClock.
+    '''
+
+    if backend not in BACKENDS:
+        raise ValueError('Unknown scheduler backend: %s' % backend)
+
+    return BACKENDS[backend](pool, phased, clock)
@@ -2,8 +2,121 @@
 The core slicing routine.
 '''
 
+from eh import db
+from eh.helpers.clock import SYSTEM
+from eh.helpers import decay
 import eh.models as models
+import numpy as np
+import datetime as dt
 
 
-def slice():
-    pass
+def slice(*ids, **kwargs):
+
+    '''
+    Slice the haiku with the passed ids: fold the allocations not yet folded
+    by createAllocation() into their words' values, each decayed by the time
+    since it was made. Words keep their value and the time it is decayed to,
+    and the rest of the decay is applied on read, so only the words with new
+    allocations are written, and each allocation only once. A slicer that
+    overran or stalled catches up in a single run instead of a backlog.
+    Pass clock= to slice on a VirtualClock.
+    '''
+
+    if not ids: return
+
+    clock = kwargs.get('clock', SYSTEM)
+    now = clock.time()
+    Haiku, Word = models.Haiku, models.Word
+
+    lifetimes = dict(db.session.query(Haiku.id, Haiku.decay_mean_lifetime)
+            .filter(Haiku.id.in_(ids)).filter(Haiku.decay_mean_lifetime > 0))
+
+    # Decay and total the new allocations at once.
+    allocations = decay.loadAllocations(lifetimes.keys(), folded=False)
+    words, totals = decay.scoreWords(allocations, lifetimes, now)
+
+    if len(words):
+
+        # Each word's haiku, in the same order as the totals.
+        haiku = allocations.haiku[np.unique(allocations.word,
+            return_index=True)[1]]
+
+        Word.foldValues([(w, t, lifetimes[h]) for w, t, h in
+            zip(words.tolist(), totals.tolist(), haiku.tolist())], now)
+
+        models.Allocation.markFolded(allocations.id.tolist())
+
+    # Record the slice, in the same transaction as the values.
+    Haiku.query.filter(Haiku.id.in_(ids)).update(
+            {'sliced_on': dt.datetime.fromtimestamp(now)},
+            synchronize_session = False)
+
+    db.session.commit()
+
+
+def bulkSlice(*ids, **kwargs):
+
+    '''
+    Slice the haiku with the passed ids in SQL: the same fold as slice(), as
+    two statements per haiku, whatever the number of allocations. One UPDATE
+    marks the pending allocations folded, by this slice, and one adds each
+    word's decayed total of them to its value, so both see the same rows
+    on any database. Nothing is loaded into Python, and all of it is one
+    transaction. Pass clock= to slice on a VirtualClock.
+    '''
+
+    if not ids: return
+
+    clock = kwargs.get('clock', SYSTEM)
+    now = float(clock.time())
+    Haiku, Word, Round = models.Haiku, models.Word, models.Round
+
+    words = Word.__table__
+    allocations = models.Allocation.__table__
+    rounds = Round.__table__
+
+    lifetimes = db.session.query(Haiku.id, Haiku.decay_mean_lifetime) \
+            .filter(Haiku.id.in_(ids)).filter(Haiku.decay_mean_lifetime > 0)
+
+    for id, lifetime in lifetimes:
+
+        # Allocations of the open rounds, not yet in their words' values.
+        current = db.select([rounds.c.id]).where(
+                db.and_(rounds.c.haiku_id == id, rounds.c.ended_on == None))
+
+        pending = db.and_(
+                allocations.c.haiku_id == id,
+                allocations.c.folded == False,
+                allocations.c.round_id.in_(current))
+
+        # Claim them, so rows added meanwhile wait for the next slice.
+        db.session.execute(allocations.update().where(pending)
+                .values(folded = True, folded_on = now))
+
+        claimed = db.and_(
+                allocations.c.haiku_id == id,
+                allocations.c.folded_on == now)
+
+        # amount * exp(-(now - allocated_at) / lifetime), never early.
+        made = db.case([(allocations.c.allocated_at > now, now)],
+                else_ = allocations.c.allocated_at)
+        weight = allocations.c.amount * db.func.exp((made - now) / lifetime)
+
+        total = db.select([db.func.sum(weight)]).where(db.and_(claimed,
+            allocations.c.word_id == words.c.id)).as_scalar()
+
+        # value * exp(-(now - value_at) / lifetime) + total
+        value = db.func.coalesce(words.c.value, 0) * db.func.exp(
+                (db.func.coalesce(words.c.value_at, now) - now) / lifetime)
+
+        db.session.execute(words.update()
+                .where(words.c.id.in_(db.select([allocations.c.word_id])
+                    .where(claimed)))
+                .values(value = value + total, value_at = now))
+
+    # Record the slice, in the same transaction as the values.
+    Haiku.query.filter(Haiku.id.in_(ids)).update(
+            {'sliced_on': dt.datetime.fromtimestamp(now)},
+            synchronize_session = False)
+
+    db.session.commit()
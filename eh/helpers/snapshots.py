@@ -0,0 +1,43 @@
+'''
+Share the slicing processes' metrics with the web workers. Each slicing
+process publishes its metrics to the database every tick, labelled with
+its node name, and /admin/metrics merges the recent ones.
+'''
+
+from eh import db
+from eh.models import Snapshot
+from eh.helpers import metrics
+import datetime as dt
+
+
+# Seconds after which a process that stopped publishing is left out.
+STALE = 60
+
+
+def label(node, registry):
+
+    ''' Expose a registry with every sample labelled by node. '''
+
+    return registry.expose([('node', node)])
+
+
+def publish(node, registry, now=None):
+
+    ''' Replace the published metrics of node. '''
+
+    now = now or dt.datetime.utcnow()
+    Snapshot.publishSnapshot(node, label(node, registry), now)
+    db.session.commit()
+
+
+def collect(texts=(), now=None):
+
+    '''
+    Merge the metrics published in the last STALE seconds, and any other
+    labelled expositions passed, into one exposition.
+    '''
+
+    now = now or dt.datetime.utcnow()
+    since = now - dt.timedelta(seconds = STALE)
+
+    return metrics.merge(Snapshot.getSnapshots(since) + list(texts))
@@ -0,0 +1,24 @@
+'''
+SQL functions that SQLite lacks, registered on each new SQLite connection,
+so that decay can be computed inside UPDATE statements on every backend.
+'''
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import math
+
+
+def exp(x):
+
+    ''' exp(), NULL-safe. '''
+
+    return None if x is None else math.exp(x)
+
+
+@event.listens_for(Engine, 'connect')
+def registerFunctions(connection, record):
+
+    ''' Add the functions to a new DB-API connection, if it is SQLite. '''
+
+    if hasattr(connection, 'create_function'):
+        connection.create_function('exp', 1, exp)
@@ -0,0 +1,137 @@
+'''
+Import-time profiler for the package. Imports the package in a fresh
+interpreter with a timing import hook, and reports the time spent in each
+module, like -X importtime in later Pythons.
+
+    python -m eh.helpers.startup [module] [--self] [--limit N]
+'''
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+
+# Cold-import budget for the package, in seconds.
+BUDGET = float(os.environ.get('EH_IMPORT_BUDGET', 2.0))
+
+# The directory that contains the package.
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+# Run in the child. Wraps __import__ and attributes the time of each call,
+# minus the time of the calls nested in it, to the modules it loaded.
+HOOK = r'''
+import sys, time, json, __builtin__
+
+original = __builtin__.__import__
+records = {}
+stack = []
+
+def timed(name, globals=None, locals=None, fromlist=None, level=-1):
+
+    before = set(sys.modules)
+    stack.append(0.0)
+    start = time.time()
+
+    try: return original(name, globals, locals, fromlist, level)
+
+    finally:
+
+        elapsed = time.time() - start
+        nested = stack.pop()
+        if stack: stack[-1] += elapsed
+
+        loaded = [m for m in set(sys.modules) - before
+                if sys.modules[m] is not None and m not in records]
+
+        if loaded:
+
+            # The deepest module is the one this statement asked for.
+            module = max(loaded, key=lambda m: m.count('.'))
+            records[module] = [elapsed - nested, elapsed]
+
+            for other in loaded:
+                records.setdefault(other, [0.0, 0.0])
+
+__builtin__.__import__ = timed
+
+start = time.time()
+timed(sys.argv[2])
+total = time.time() - start
+
+with open(sys.argv[1], 'w') as f:
+    json.dump({'total': total, 'modules': records}, f)
+'''
+
+
+def profile(module='eh'):
+
+    '''
+    Import module in a fresh interpreter. Returns the total import time and
+    a dict of module name -> [self time, cumulative time], in seconds.
+    '''
+
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+
+    try:
+
+        subprocess.check_call(
+                [sys.executable, '-c', HOOK, path, module],
+                cwd = ROOT)
+
+        with open(path) as f:
+            result = json.load(f)
+
+    finally: os.remove(path)
+
+    return result['total'], result['modules']
+
+
+def packages(modules):
+
+    ''' Sum the self times of the modules by top-level package. '''
+
+    totals = {}
+    for name, (own, cumulative) in modules.iteritems():
+        top = name.split('.')[0]
+        totals[top] = totals.get(top, 0.0) + own
+
+    return totals
+
+
+def report(module='eh', sort='cumulative', limit=25):
+
+    ''' Format the profile of a module import as a text table. '''
+
+    total, modules = profile(module)
+    column = 0 if sort == 'self' else 1
+
+    rows = sorted(modules.iteritems(), key=lambda r: -r[1][column])
+
+    lines = ['%10s %10s  %s' % ('self ms', 'cumul ms', 'module')]
+    for name, (own, cumulative) in rows[:limit]:
+        lines.append('%10.1f %10.1f  %s' % (own*1000, cumulative*1000, name))
+
+    lines.append('')
+    lines.append('%10s  %s' % ('self ms', 'package'))
+    for name, own in sorted(packages(modules).iteritems(),
+            key=lambda r: -r[1])[:limit]:
+        lines.append('%10.1f  %s' % (own*1000, name))
+
+    lines.append('')
+    lines.append('total: %.1f ms (budget %.1f ms)' % (total*1000, BUDGET*1000))
+
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+
+    args = sys.argv[1:]
+    sort = 'self' if '--self' in args else 'cumulative'
+    limit = int(args[args.index('--limit') + 1]) if '--limit' in args else 25
+    target = [a for a in args if not a.startswith('--') and not a.isdigit()]
+
+    print report(target[0] if target else 'eh', sort, limit)
@@ -0,0 +1,77 @@
+'''
+Keep the scheduler in step with the running flags on the haiku. The flags
+are the record of which poems are running, so slicers survive a restart of
+the slicing process, and poems started from a web worker are picked up by
+the process that runs the slicers.
+'''
+
+from eh.models import Haiku
+from eh.helpers import slicer
+import datetime as dt
+
+
+# Most haiku passed to one catch-up call to the slicing routine.
+CATCHUP_BATCH = 500
+
+# Seconds between synchronizations in the slicing process.
+INTERVAL = 5
+
+
+def isOverdue(haiku, now):
+
+    ''' Check whether a haiku has missed at least one slice. '''
+
+    if haiku.sliced_on is None: return True
+    elapsed = (now - haiku.sliced_on).total_seconds()
+    return elapsed >= haiku.slicing_interval
+
+
+def synchronize(sched, func=slicer.slice, leases=None):
+
+    '''
+    Start slicers for the running haiku that do not have one, and stop the
+    slicers of haiku that are no longer running. Haiku that missed slices
+    while they had no slicer are caught up by the scheduler, with at most
+    CATCHUP_BATCH ids per call, through any pool like every other slice,
+    and never beside one of their own. With a LeaseManager, only the
+    haiku in its shards count as running, and every slice checks the lease
+    first. Returns the sorted ids started and stopped.
+    '''
+
+    # Check the lease at each slice, wherever it runs.
+    if leases: func = leases.fenced(func)
+
+    # One query for every running haiku.
+    if leases: running = Haiku.getRunningHaiku(leases.shards, leases.count)
+    else: running = Haiku.getRunningHaiku()
+    current = sched.getHaikuIds()
+
+    started = [h for h in running if h.id not in current]
+    stopped = current - set(h.id for h in running)
+
+    # Note the overdue haiku before the slicers touch them.
+    now = dt.datetime.now()
+    overdue = set(h.id for h in started if isOverdue(h, now))
+
+    sched.createSlicers(started, func, overdue, CATCHUP_BATCH)
+
+    for id in stopped:
+        sched.deleteSlicerById(id)
+
+    return sorted(h.id for h in started), sorted(stopped)
+
+
+def fence(sched, leases):
+
+    '''
+    Stop the slicers of haiku in shards this node no longer holds. Needs no
+    database, so it still works when the heartbeat failed. Returns the
+    sorted ids stopped.
+    '''
+
+    stopped = sorted(id for id in sched.getHaikuIds() if not leases.owns(id))
+
+    for id in stopped:
+        sched.deleteSlicerById(id)
+
+    return stopped
@@ -0,0 +1,330 @@
+'''
+Single-threaded slicing driver. Instead of one APScheduler job per haiku,
+all slicers share one heap of due times, and every wakeup fires the whole
+batch of haiku that are due in a single call to the slicing routine.
+'''
+
+from eh.helpers.metrics import SchedulerMetrics
+from eh.helpers.clock import SYSTEM
+from eh.helpers import phase
+import heapq
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class Slicer(object):
+
+    ''' The schedule for one haiku. '''
+
+
+    def __init__(self, id, interval, func, due):
+
+        ''' Set parameters. '''
+
+        self.id = id
+        self.interval = interval
+        self.func = func
+        self.due = due
+        self.scheduled = due
+        self.runs = 0
+
+
+class WheelScheduler(object):
+
+    '''
+    Drive all slicers from one thread. Slicers that fall due within
+    `resolution` seconds of each other are fired together, as
+    func(*ids) for each slicing routine.
+    '''
+
+
+    def __init__(self, pool=None, phased=True, clock=None, resolution=0.05):
+
+        '''
+        Set the batching resolution. With a SlicingPool, batches are handed to
+        the pool's processes instead of running in the driver thread. If
+        phased, each haiku's slices are offset into its interval by its id.
+        On a VirtualClock, advance() drives the slicers, not a thread.
+        '''
+
+        self.pool = pool
+        self.phased = phased
+        self.clock = clock or SYSTEM
+        self.resolution = resolution
+        self.slicers = {}
+        self.heap = []
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopped = True
+
+        # Lag, duration and misfires of the slicers.
+        self.metrics = SchedulerMetrics(lambda: len(self.slicers),
+                self.countQueued)
+
+
+    @property
+    def running(self):
+        if self.clock.virtual: return not self.stopped
+        return not self.stopped and self.thread is not None \
+                and self.thread.is_alive()
+
+
+    def start(self):
+
+        ''' Start the driver thread. '''
+
+        self.stopped = False
+        if self.clock.virtual: return
+
+        self.thread = threading.Thread(target=self.run, name='WheelScheduler')
+        self.thread.daemon = True
+        self.thread.start()
+
+
+    def shutdown(self, wait=True):
+
+        ''' Stop the driver thread. '''
+
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+        if wait and self.thread is not None:
+            self.thread.join()
+
+        if self.pool: self.pool.close()
+
+
+    def getJobName(self, haiku):
+
+        ''' Construct the job name for a haiku record. '''
+
+        return 'haiku' + str(haiku.id)
+
+
+    def getJobByHaiku(self, haiku):
+
+        ''' Try to retrieve the slicer for a given haiku record. '''
+
+        return self.slicers.get(haiku.id, False)
+
+
+    def checkForSlicer(self, haiku):
+
+        ''' Check to see if there is a running slicer for a given haiku. '''
+
+        return haiku.id in self.slicers
+
+
+    def createSlicer(self, haiku, func, overdue=False):
+
+        '''
+        Start slicing for a poem. If overdue, the first slice is due at the
+        last time on its schedule, which has passed, so it fires in the next
+        batch.
+        '''
+
+        # Run the routine in the pool.
+        if self.pool: func = self.pool.dispatch(func)
+
+        with self.condition:
+
+            if haiku.id in self.slicers: return False
+
+            due = self.firstDue(haiku)
+            if overdue: due -= haiku.slicing_interval
+
+            slicer = Slicer(haiku.id, haiku.slicing_interval, func, due)
+
+            self.slicers[haiku.id] = slicer
+            self.push(slicer)
+
+            return slicer
+
+
+    def createSlicers(self, haiku, func, overdue=(), batch=None):
+
+        '''
+        Start slicing for many poems. The overdue ones, by id, are due at
+        once, so they are caught up together in the next batch, one call
+        per routine. batch is unused: every batch is one call.
+        '''
+
+        for h in haiku:
+            self.createSlicer(h, func, h.id in overdue)
+
+
+    def firstDue(self, haiku):
+
+        ''' Get the time of a new slicer's first slice. '''
+
+        now = self.clock.time()
+
+        if self.phased:
+            return phase.firstDue(haiku.id, haiku.slicing_interval, now)
+        else: return now + haiku.slicing_interval
+
+
+    def deleteSlicer(self, haiku):
+
+        ''' Stop slicing for a poem. '''
+
+        self.deleteSlicerById(haiku.id)
+
+
+    def deleteSlicerById(self, id):
+
+        ''' Stop slicing for a poem, by id. '''
+
+        # Stale heap entries are skipped when they come due.
+        with self.condition:
+            self.slicers.pop(id, None)
+
+        self.metrics.forget(id)
+
+
+    def getHaikuIds(self):
+
+        ''' Get the ids of the haiku that have slicers. '''
+
+        with self.condition:
+            return set(self.slicers)
+
+
+    def countQueued(self):
+
+        ''' Count the slices waiting for a pool worker. '''
+
+        return self.pool.countQueued() if self.pool else 0
+
+
+    def push(self, slicer):
+
+        ''' Queue a slicer at its due time; wake the driver if it is next. '''
+
+        heapq.heappush(self.heap, (slicer.due, slicer.id, slicer))
+
+        if self.heap[0][2] is slicer:
+            self.condition.notify()
+
+
+    def collect(self, now):
+
+        ''' Pop the slicers due by now, and reschedule them. '''
+
+        batch = []
+        horizon = now + self.resolution
+
+        while self.heap and self.heap[0][0] <= horizon:
+
+            due, id, slicer = heapq.heappop(self.heap)
+
+            # Deleted, or replaced by a new slicer for the same haiku.
+            if self.slicers.get(id) is not slicer: continue
+
+            batch.append(slicer)
+            slicer.runs += 1
+            slicer.scheduled = due
+
+            # Skip any fire times already missed, rather than queueing them.
+            slicer.due += slicer.interval
+            if slicer.due <= now:
+                missed = int((now - slicer.due) // slicer.interval) + 1
+                slicer.due += missed * slicer.interval
+                self.metrics.observeMisfire(id, missed)
+
+        # Once the batch is popped, so a next run within the horizon waits.
+        for slicer in batch:
+            heapq.heappush(self.heap, (slicer.due, slicer.id, slicer))
+
+        return batch
+
+
+    def fire(self, batch):
+
+        ''' Hand a batch to the slicing routines, one call per routine. '''
+
+        groups = {}
+        for slicer in batch:
+            groups.setdefault(slicer.func, []).append(slicer)
+
+        for func, slicers in groups.iteritems():
+
+            ids = [s.id for s in slicers]
+            started = self.clock.time()
+
+            # Slices may start up to the resolution early.
+            for slicer in slicers:
+                self.metrics.observeStart(slicer.id,
+                        max(0.0, started - slicer.scheduled))
+
+            self.metrics.active.inc()
+
+            try: func(*ids)
+            except Exception:
+                self.metrics.observeError(ids)
+                logger.exception('Slicing %d haiku failed', len(ids))
+
+            finally:
+                self.metrics.active.dec()
+
+            # With a pool, func only queues the ids; the workers time slices.
+            if not self.pool:
+                self.metrics.observeDuration(self.clock.time() - started, ids)
+
+
+    def run(self):
+
+        ''' Sleep until the next batch is due, fire it, repeat. '''
+
+        while True:
+
+            with self.condition:
+
+                while not self.stopped:
+
+                    now = self.clock.time()
+                    if self.heap and self.heap[0][0] <= now + self.resolution:
+                        break
+
+                    wait = self.heap[0][0] - now if self.heap else None
+                    self.condition.wait(wait)
+
+                if self.stopped: return
+
+                batch = self.collect(self.clock.time())
+
+            # Run outside the lock, so slicers can be added and removed.
+            self.fire(batch)
+
+
+    def advance(self, seconds):
+
+        '''
+        On a virtual clock: fire every batch due in the next seconds, in
+        order, stepping the clock to each. Returns the number of slices.
+        '''
+
+        if not self.clock.virtual:
+            raise RuntimeError('Only a virtual clock can be advanced.')
+
+        end = self.clock.time() + seconds
+        slices = 0
+
+        while True:
+
+            with self.condition:
+
+                if not self.heap or self.heap[0][0] > end: break
+
+                self.clock.set(self.heap[0][0])
+                batch = self.collect(self.clock.time())
+
+            self.fire(batch)
+            slices += len(batch)
+
+        self.clock.set(end)
+        return slices
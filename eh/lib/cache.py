@@ -0,0 +1,84 @@
+'''
+Size-bounded least-recently-used cache.
+'''
+
+from collections import OrderedDict
+import threading
+
+
+class LRUCache(object):
+
+    ''' Thread-safe LRU mapping with hit/miss statistics. '''
+
+
+    def __init__(self, capacity):
+
+        ''' Set the capacity, zero the counters. '''
+
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def get(self, key, default=None):
+
+        ''' Get a value and mark it recently used, or return the default. '''
+
+        with self.lock:
+
+            try: value = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self.entries[key] = value
+            self.hits += 1
+
+            return value
+
+
+    def set(self, key, value):
+
+        ''' Store a value, evicting the least recently used if full. '''
+
+        with self.lock:
+
+            self.entries.pop(key, None)
+            self.entries[key] = value
+
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+
+    def clear(self):
+
+        ''' Empty the cache and zero the counters. '''
+
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+    def stats(self):
+
+        ''' Get the hit/miss counters and current size. '''
+
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.entries),
+                'capacity': self.capacity }
+
+
+    def __contains__(self, key):
+        return key in self.entries
+
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,177 @@
+'''
+Syllable counts for arbitrary words: dictionary lookups, with rule-based
+estimates for out-of-vocabulary words.
+'''
+
+from eh.lib.loader import syllables, prefixes, spellings
+from eh.lib.estimator import estimate
+from eh.lib.cache import LRUCache
+import numpy as np
+import re
+
+
+# Memo of estimates for words that are not in the dictionary.
+estimates = LRUCache(10000)
+
+# Memo of fuzzy matches for misspelled words.
+corrections = LRUCache(10000)
+
+# Punctuation around a word.
+EDGES = re.compile(r"^[^A-Z0-9']+|[^A-Z0-9']+$")
+
+# Possessive suffix, and the stems where it is pronounced as a syllable.
+POSSESSIVE = re.compile(r"'S?$")
+SIBILANT = re.compile(r'(S|X|Z|CH|SH|CE|GE)$')
+
+
+def normalize(word):
+
+    ''' Uppercase a word and strip surrounding punctuation. '''
+
+    return EDGES.sub('', word.strip().upper())
+
+
+def lookup(word):
+
+    ''' Count the syllables in a normalized word. '''
+
+    if not word: return 0
+
+    # Dictionary word?
+    count = syllables.get(word)
+    if count is not None: return count
+
+    # Possessive of a dictionary word?
+    stem = POSSESSIVE.sub('', word)
+    if stem != word and stem in syllables:
+        extra = 1 if word.endswith('S') and SIBILANT.search(stem) else 0
+        return syllables[stem] + extra
+
+    # Memoized estimate?
+    count = estimates.get(word)
+    if count is not None: return count
+
+    count = estimate(word)
+    estimates.set(word, count)
+
+    return count
+
+
+def countSyllables(word):
+
+    ''' Count the syllables in a word. '''
+
+    return lookup(normalize(word))
+
+
+def countWords(words):
+
+    ''' Count the syllables in a list of words. '''
+
+    words = [normalize(w) for w in words]
+
+    # Count each distinct word once.
+    counts = dict((w, lookup(w)) for w in set(words))
+
+    return [counts[w] for w in words]
+
+
+def countPoem(poem):
+
+    '''
+    Count the syllables in a poem, passed as a string with one line per row
+    or as a list of lines (strings or lists of words). Returns the per-word
+    counts for each line and the per-line totals.
+    '''
+
+    if isinstance(poem, basestring):
+        poem = poem.splitlines()
+
+    lines = [l.split() if isinstance(l, basestring) else l for l in poem]
+
+    # Count all the words in one batch, then split the counts back out.
+    flat = countWords([w for line in lines for w in line])
+
+    counts = []
+    for line in lines:
+        counts.append(flat[:len(line)])
+        flat = flat[len(line):]
+
+    return counts, [sum(c) for c in counts]
+
+
+def suggest(remaining, prefix='', offset=0, limit=20):
+
+    '''
+    Get a page of (word, count) pairs for the dictionary words that start
+    with prefix and fit in the remaining syllables.
+    '''
+
+    return syllables.wait().candidates(remaining, normalize(prefix),
+            offset = offset,
+            limit = limit)
+
+
+def complete(prefix, limit=10, maxSyllables=None):
+
+    ''' Autocomplete a partial word submission. '''
+
+    return prefixes.wait().complete(normalize(prefix), limit, maxSyllables)
+
+
+def correct(word, limit=2):
+
+    '''
+    Get the nearest dictionary words to a misspelled word, as (word,
+    distance, count) triples.
+    '''
+
+    word = normalize(word)
+
+    matches = corrections.get((word, limit))
+    if matches is not None: return matches
+
+    matches = spellings.wait().match(word, limit)
+    corrections.set((word, limit), matches)
+
+    return matches
+
+
+def stats():
+
+    ''' Get the estimate cache statistics. '''
+
+    return estimates.stats()
+
+
+def wordIds(words):
+
+    ''' Map words to their ids in the syllable table, -1 if not present. '''
+
+    table = syllables.wait()
+    return np.array([table.find(normalize(w)) for w in words], np.int32)
+
+
+def countIds(ids):
+
+    ''' Count syllables for an array of word ids in a single gather. '''
+
+    ids = np.asarray(ids, np.int32)
+    counts = syllables.wait().countArray()
+
+    # Missing words (-1) count as zero.
+    return np.where(ids >= 0, counts[ids].astype(np.int32), 0)
+
+
+def countArray(words):
+
+    ''' Count the syllables in a list of words, as an array. '''
+
+    ids = wordIds(words)
+    counts = countIds(ids)
+
+    # Fall back to the scalar path for words missing from the table.
+    for i in np.flatnonzero(ids < 0):
+        counts[i] = countSyllables(words[i])
+
+    return counts
@@ -0,0 +1,71 @@
+'''
+Rule-based syllable estimates for words that are not in the dictionary.
+'''
+
+import re
+
+
+# Vowel groups, after removing silent letters.
+VOWELS = re.compile(r'[aeiouy]+')
+
+# Patterns where one vowel group is usually two syllables (ri-ot, li-on).
+# io is one syllable in the -ion suffix (na-tion, mil-lion, o-pin-ion).
+ADD = [re.compile(p) for p in (
+    r'ia',
+    r'riet',
+    r'dien',
+    r'iu',
+    r'io(?!n)|(?<![cgnstx])(?<!ll)io',
+    r'ii',
+    r'oe(?!s?$)',
+    r'[^aeiouy][aeiou]ing',
+    r'^creat(?!u)',
+    r'[aeiouym]bl$',
+    r'(?!eau)[aeiou]{3}',
+    r'^mc',
+    r'ism$',
+    r'([^aeiouy])\1l$',
+    r'[^l]lien',
+    r'^coa[dglx].',
+    r'[^gq]ua[^auieo]',
+    r'dnt$')]
+
+# Patterns where two vowel groups are usually one syllable (spe-cial).
+SUBTRACT = [re.compile(p) for p in (
+    r'cial',
+    r'tia',
+    r'cius',
+    r'cious',
+    r'giu',
+    r'iou',
+    r'sia$',
+    r'.ely$',
+    r'[^td]ed$')]
+
+# Inflectional suffixes that do not add a syllable (bathes, globes).
+SILENT = re.compile(r'(?<=[^aeiouy])(e|es)$')
+
+# Stems before -es where the suffix is pronounced (wishes, boxes).
+SIBILANT = re.compile(r'(s|x|z|ch|sh|ce|ge)es$')
+
+
+def estimate(word):
+
+    ''' Estimate the number of syllables in a word. '''
+
+    # Letters only, lowercase.
+    word = re.sub(r'[^a-z]', '', word.lower())
+
+    if not word: return 0
+    if len(word) <= 3: return 1
+
+    # Drop a silent final e or es.
+    if not SIBILANT.search(word) and not word.endswith('le'):
+        word = SILENT.sub('', word)
+
+    # Count vowel groups, then adjust for the known exceptions.
+    count = len(VOWELS.findall(word))
+    count += sum(1 for p in ADD if p.search(word))
+    count -= sum(1 for p in SUBTRACT if p.search(word))
+
+    return max(count, 1)
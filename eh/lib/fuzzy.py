@@ -0,0 +1,233 @@
+'''
+Fuzzy matching against the syllable dictionary, for misspelled submissions.
+
+This is a symmetric-delete index: every string that can be made by deleting
+up to MAX_DISTANCE characters from a dictionary word is hashed and stored
+with the id of the word and the number of deletions. Two words are within
+edit distance d only if they share such a delete, so a query generates its
+own deletes, looks up their hashes, and checks the few words found with a
+real edit distance. The index is compiled to a file and mapped read-only:
+
+    header      magic, version, max distance, table size, entry count
+    hashes      n uint32 crc32 hashes of the deletes, sorted
+    ids         n uint32 ids of the words in the syllable table
+    depths      n uint8 number of characters deleted
+'''
+
+from eh.lib import syllabary, mapped
+import os
+import mmap
+import struct
+import zlib
+import numpy as np
+from array import array
+
+
+# Default location of the compiled index.
+PATH = os.path.join(os.path.dirname(__file__), 'fuzzy.bin')
+
+# File format.
+MAGIC = 'EHFZ'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+
+# Largest edit distance the index supports.
+MAX_DISTANCE = 2
+
+
+def deletes(word, distance):
+
+    ''' Get the strings made by deleting up to distance characters. '''
+
+    found = { word: 0 }
+    frontier = [word]
+
+    for depth in range(1, distance + 1):
+        following = []
+        for w in frontier:
+            for i in range(len(w)):
+                d = w[:i] + w[i+1:]
+                if d not in found:
+                    found[d] = depth
+                    following.append(d)
+        frontier = following
+
+    return found
+
+
+def hashes(strings):
+
+    ''' Hash strings into a uint32 array. '''
+
+    return np.array([zlib.crc32(s) & 0xffffffff for s in strings], np.uint32)
+
+
+def distance(a, b, limit):
+
+    '''
+    Get the Levenshtein distance between two strings, or limit + 1 if it is
+    larger than limit. Only the diagonal band of width limit is computed.
+    '''
+
+    if len(a) > len(b): a, b = b, a
+    n, m = len(a), len(b)
+    over = limit + 1
+
+    if m - n > limit: return over
+
+    previous = range(m + 1)
+
+    for i in xrange(1, n + 1):
+
+        lo, hi = max(1, i - limit), min(m, i + limit)
+        current = [over] * (m + 1)
+        current[0] = i if i <= limit else over
+        best = current[0] if lo == 1 else over
+        char = a[i-1]
+
+        for j in xrange(lo, hi + 1):
+            v = previous[j-1] + (char != b[j-1])
+            if previous[j] + 1 < v: v = previous[j] + 1
+            if current[j-1] + 1 < v: v = current[j-1] + 1
+            current[j] = v
+            if v < best: best = v
+
+        # No path through this row can get back under the limit.
+        if best > limit: return over
+
+        previous = current
+
+    return min(previous[m], over)
+
+
+def build(path=PATH, table=None):
+
+    ''' Compile the delete index for a syllable table at path. '''
+
+    if table is None:
+        table = syllabary.load()
+
+    # Packed arrays, since there are millions of entries.
+    keys, ids, depths = array('I'), array('I'), array('B')
+
+    for i, word in enumerate(table):
+        for d, depth in deletes(word, MAX_DISTANCE).iteritems():
+            keys.append(zlib.crc32(d) & 0xffffffff)
+            ids.append(i)
+            depths.append(depth)
+
+    # Sort everything by hash.
+    keys = np.frombuffer(keys, np.uint32)
+    order = np.argsort(keys, kind='mergesort')
+
+    temp = '%s.%d.tmp' % (path, os.getpid())
+    with open(temp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, MAX_DISTANCE, len(table),
+            len(keys)))
+        f.write(keys[order].tobytes())
+        f.write(np.frombuffer(ids, np.uint32)[order].tobytes())
+        f.write(np.frombuffer(depths, np.uint8)[order].tobytes())
+
+    os.rename(temp, path)
+
+
+def load(path=PATH, table=None):
+
+    '''
+    Map the index at path over a syllable table, compiling it first if it
+    is missing, stale, or was built for a different table.
+    '''
+
+    if table is None:
+        table = syllabary.load()
+
+    return mapped.load(path,
+            lambda path: build(path, table),
+            lambda path: FuzzyIndex(path, table))
+
+
+class FuzzyIndex(object):
+
+    ''' Nearest dictionary words for misspellings. '''
+
+
+    def __init__(self, path, table):
+
+        ''' Map the file and read the header. '''
+
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = HEADER.unpack_from(self.buffer, 0)
+        magic, version, limit, words, size = header
+
+        if magic != MAGIC or version != VERSION or limit != MAX_DISTANCE:
+            raise ValueError('%s is not a version %d fuzzy index.' %
+                    (path, VERSION))
+
+        if words != len(table):
+            raise ValueError('%s was built for another table.' % path)
+
+        self.table = table
+        self.size = size
+
+        at = HEADER.size
+        self.hashes = np.frombuffer(self.buffer, np.uint32, size, at)
+        self.ids = np.frombuffer(self.buffer, np.uint32, size, at + 4*size)
+        self.depths = np.frombuffer(self.buffer, np.uint8, size, at + 8*size)
+
+
+    def candidates(self, word, limit):
+
+        ''' Get the ids of the words that share a delete within limit. '''
+
+        keys = hashes(deletes(word, limit))
+
+        starts = self.hashes.searchsorted(keys)
+        ends = self.hashes.searchsorted(keys, 'right')
+
+        found = set()
+        for start, end in zip(starts, ends):
+            if start == end: continue
+            ids = self.ids[start:end]
+            found.update(ids[self.depths[start:end] <= limit].tolist())
+
+        return found
+
+
+    def match(self, word, limit=MAX_DISTANCE):
+
+        '''
+        Get the nearest dictionary words within an edit distance of limit, as
+        (word, distance, count) triples. Words at distance 1 are returned in
+        preference to words at distance 2.
+        '''
+
+        if isinstance(word, unicode):
+            word = word.encode('utf-8')
+
+        limit = min(limit, MAX_DISTANCE)
+
+        # Widen the search one edit at a time, stopping at the first hits.
+        for d in range(0, limit + 1):
+
+            matches = []
+            for i in self.candidates(word, d):
+                other = self.table.word(i)
+                if distance(word, other, d) <= d:
+                    matches.append((other, d, self.table.count(i)))
+
+            if matches: return sorted(matches)
+
+        return []
+
+
+    def close(self):
+
+        ''' Unmap the index. '''
+
+        self.buffer.close()
+
+
+if __name__ == '__main__':
+    build()
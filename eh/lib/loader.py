@@ -0,0 +1,157 @@
+'''
+Lazy, background-loaded syllable table.
+'''
+
+from eh.lib import syllabary, trie, fuzzy
+import threading
+import os
+
+
+class LazyTable(object):
+
+    '''
+    Proxy to a syllable table that is loaded on a background thread. Lookups
+    block until loading finishes; if loading was never started, the first
+    lookup starts it.
+
+    Tables loaded before a fork are inherited by the child, which shares the
+    mapped pages with the parent. If the fork interrupts a load, the loader
+    thread does not survive it, so the child starts its own.
+    '''
+
+
+    def __init__(self, load=syllabary.load):
+
+        ''' Set the load function. '''
+
+        self.load = load
+        self.reset()
+
+
+    def reset(self):
+
+        ''' Forget any load in progress. '''
+
+        self.table = None
+        self.error = None
+        self.thread = None
+        self.pid = os.getpid()
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+
+
+    def start(self):
+
+        ''' Start loading the table in the background, if not started. '''
+
+        # Forked while loading?
+        if self.pid != os.getpid() and not self.ready.is_set():
+            self.reset()
+
+        with self.lock:
+
+            if self.thread is None:
+                self.thread = threading.Thread(
+                        target = self.run,
+                        name = 'LazyTable')
+                self.thread.daemon = True
+                self.thread.start()
+
+        return self
+
+
+    def loadInline(self):
+
+        '''
+        Load the table in the calling thread, if no load has started, and
+        return it. No thread is left behind to be lost in a fork.
+        '''
+
+        # Forked while loading?
+        if self.pid != os.getpid() and not self.ready.is_set():
+            self.reset()
+
+        with self.lock:
+
+            if self.thread is None:
+                self.thread = threading.current_thread()
+                self.run()
+
+        return self.wait()
+
+
+    def run(self):
+
+        ''' Load the table, record any error, and release waiting lookups. '''
+
+        try: self.table = self.load()
+        except Exception as e: self.error = e
+        finally: self.ready.set()
+
+
+    def wait(self):
+
+        ''' Block until the table is loaded, return the table. '''
+
+        if not self.ready.is_set():
+            self.start()
+            self.ready.wait()
+
+        if self.error is not None: raise self.error
+
+        return self.table
+
+
+    def isLoaded(self):
+
+        ''' Check whether the table is available without blocking. '''
+
+        return self.ready.is_set() and self.error is None
+
+
+    def get(self, word, default=None):
+        return self.wait().get(word, default)
+
+
+    def __getitem__(self, word):
+        return self.wait()[word]
+
+
+    def __contains__(self, word):
+        return word in self.wait()
+
+
+    def __len__(self):
+        return len(self.wait())
+
+
+    def __iter__(self):
+        return iter(self.wait())
+
+
+    def keys(self):
+        return self.wait().keys()
+
+
+def preload():
+
+    '''
+    Load the tables in the calling thread. wsgi.py calls this, so that a
+    pre-forking server that imports the application in the parent hands
+    the mappings to its workers, instead of each opening or compiling its
+    own.
+    '''
+
+    syllables.loadInline()
+    prefixes.loadInline()
+    spellings.loadInline()
+
+
+# The application's shared table.
+syllables = LazyTable()
+
+# The prefix trie, for autocompletion.
+prefixes = LazyTable(trie.load)
+
+# The symmetric-delete index, for misspellings.
+spellings = LazyTable(lambda: fuzzy.load(table=syllables.wait()))
@@ -0,0 +1,38 @@
+'''
+Loading compiled, memory-mapped files that are shared between processes.
+'''
+
+from contextlib import contextmanager
+import fcntl
+
+
+@contextmanager
+def locked(path):
+
+    ''' Hold an exclusive lock on a lock file for the duration. '''
+
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try: yield
+        finally: fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load(path, build, mapped):
+
+    '''
+    Map a compiled file with mapped(path), first compiling it with
+    build(path) if it is missing or stale. Only one process compiles at a
+    time; the others wait for it and then map the result, so a cold start
+    of many workers compiles once.
+    '''
+
+    try: return mapped(path)
+    except (IOError, ValueError): pass
+
+    with locked(path + '.lock'):
+
+        # Another process may have compiled it while we waited.
+        try: return mapped(path)
+        except (IOError, ValueError): build(path)
+
+    return mapped(path)
@@ -0,0 +1,255 @@
+'''
+Compiled, memory-mapped syllable table.
+
+The CMU dictionary in eh.lib.syllables is compiled into a flat binary file:
+
+    header      magic, version, highest syllable count, word count
+    offsets     (n + 1) little-endian uint32 offsets into the key blob
+    postings    (top + 2) uint32 offsets into the ids, one run per count
+    ids         n uint32 word ids, grouped by syllable count
+    counts      n uint8 syllable counts
+    keys        the sorted headwords, concatenated
+
+A word's id is its position in sorted order. At runtime the file is mapped
+read-only, so loading is near-instant and the pages are shared by every
+process that maps the same file.
+'''
+
+from eh.lib import mapped
+import os
+import mmap
+import struct
+import numpy as np
+
+
+# Default location of the compiled table.
+PATH = os.path.join(os.path.dirname(__file__), 'syllables.bin')
+
+# File format.
+MAGIC = 'EHST'
+VERSION = 2
+HEADER = struct.Struct('<4sHHI')
+OFFSET = struct.Struct('<I')
+
+
+def build(path=PATH, source=None):
+
+    ''' Compile a word -> count dictionary into a binary table at path. '''
+
+    # By default, compile the CMU dictionary.
+    if source is None:
+        from eh.lib.syllables import syllables as source
+
+    words = sorted(source)
+    counts = [source[w] for w in words]
+    top = max(counts) if counts else 0
+
+    # Key offsets.
+    offsets = [0]
+    for word in words:
+        offsets.append(offsets[-1] + len(word))
+
+    # Inverted index: the ids for each count, in word order.
+    runs = [[] for c in range(top + 1)]
+    for i, count in enumerate(counts):
+        runs[count].append(i)
+
+    postings = [0]
+    for run in runs:
+        postings.append(postings[-1] + len(run))
+
+    ids = [i for run in runs for i in run]
+
+    # Write to a temporary file and swap it in, so that a concurrent reader
+    # never maps a partial table.
+    temp = '%s.%d.tmp' % (path, os.getpid())
+    with open(temp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, top, len(words)))
+        f.write(struct.pack('<%dI' % len(offsets), *offsets))
+        f.write(struct.pack('<%dI' % len(postings), *postings))
+        f.write(struct.pack('<%dI' % len(ids), *ids))
+        f.write(struct.pack('<%dB' % len(counts), *counts))
+        f.write(''.join(words))
+
+    os.rename(temp, path)
+
+
+def load(path=PATH):
+
+    ''' Map the table at path, compiling it first if missing or stale. '''
+
+    return mapped.load(path, build, SyllableTable)
+
+
+class SyllableTable(object):
+
+    ''' Read-only word -> syllable count mapping over a compiled table. '''
+
+
+    def __init__(self, path):
+
+        ''' Map the file and read the header. '''
+
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, top, size = HEADER.unpack_from(self.buffer, 0)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a version %d syllable table.' %
+                    (path, VERSION))
+
+        self.size = size
+        self.top = top
+        self.offsetsAt = HEADER.size
+        self.postingsAt = self.offsetsAt + (size + 1) * OFFSET.size
+        self.idsAt = self.postingsAt + (top + 2) * OFFSET.size
+        self.countsAt = self.idsAt + size * OFFSET.size
+        self.keysAt = self.countsAt + size
+
+        # Views onto the index.
+        self.postings = np.frombuffer(self.buffer, np.uint32, top + 2,
+                self.postingsAt)
+        self.ids = np.frombuffer(self.buffer, np.uint32, size, self.idsAt)
+
+
+    def word(self, i):
+
+        ''' Get the i-th word, in sorted order. '''
+
+        at = self.offsetsAt + i * OFFSET.size
+        start, = OFFSET.unpack_from(self.buffer, at)
+        end, = OFFSET.unpack_from(self.buffer, at + OFFSET.size)
+
+        return self.buffer[self.keysAt + start:self.keysAt + end]
+
+
+    def count(self, i):
+
+        ''' Get the syllable count of the i-th word. '''
+
+        return ord(self.buffer[self.countsAt + i])
+
+
+    def countArray(self):
+
+        ''' Get the counts as a uint8 array indexed by word id. '''
+
+        # A view onto the mapped file, not a copy.
+        return np.frombuffer(self.buffer, np.uint8, self.size, self.countsAt)
+
+
+    def bisect(self, word):
+
+        ''' Get the position of the first word that is >= the passed word. '''
+
+        lo, hi = 0, self.size
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.word(mid) < word: lo = mid + 1
+            else: hi = mid
+
+        return lo
+
+
+    def find(self, word):
+
+        ''' Get the position of a word, or -1 if it is not in the table. '''
+
+        if isinstance(word, unicode):
+            word = word.encode('utf-8')
+
+        i = self.bisect(word)
+
+        return i if i < self.size and self.word(i) == word else -1
+
+
+    def span(self, prefix):
+
+        ''' Get the range of ids of the words that start with prefix. '''
+
+        if isinstance(prefix, unicode):
+            prefix = prefix.encode('utf-8')
+
+        return self.bisect(prefix), self.bisect(prefix + '\xff')
+
+
+    def withCount(self, count, span=None):
+
+        ''' Get the ids of the words with a count, optionally in a span. '''
+
+        if not 0 <= count <= self.top:
+            return self.ids[:0]
+
+        run = self.ids[self.postings[count]:self.postings[count+1]]
+
+        if span is not None:
+            # Search with matching dtype, so the run is not cast and copied.
+            lo, hi = run.searchsorted(np.array(span, np.uint32))
+            run = run[lo:hi]
+
+        return run
+
+
+    def candidates(self, maximum, prefix='', minimum=1, offset=0, limit=20):
+
+        '''
+        Get a page of (word, count) pairs, in word order, for the words that
+        start with prefix and have between minimum and maximum syllables.
+        '''
+
+        span = self.span(prefix) if prefix else None
+
+        # Only the first offset + limit ids of each run can be on the page.
+        end = offset + limit
+        runs = [self.withCount(c, span)[:end]
+                for c in range(max(minimum, 0), min(maximum, self.top) + 1)]
+
+        if not runs: return []
+
+        page = np.sort(np.concatenate(runs))[offset:end]
+
+        return [(self.word(int(i)), self.count(int(i))) for i in page]
+
+
+    def get(self, word, default=None):
+
+        ''' Get the syllable count for a word, or the default. '''
+
+        i = self.find(word)
+        return self.count(i) if i != -1 else default
+
+
+    def __getitem__(self, word):
+        i = self.find(word)
+        if i == -1: raise KeyError(word)
+        return self.count(i)
+
+
+    def __contains__(self, word):
+        return self.find(word) != -1
+
+
+    def __len__(self):
+        return self.size
+
+
+    def __iter__(self):
+        for i in xrange(self.size):
+            yield self.word(i)
+
+
+    def keys(self):
+        return list(self)
+
+
+    def close(self):
+
+        ''' Unmap the table. '''
+
+        self.buffer.close()
+
+
+if __name__ == '__main__':
+    build()
@@ -0,0 +1,210 @@
+'''
+Compiled, memory-mapped prefix trie over the syllable dictionary, for
+autocompleting word submissions.
+
+Nodes are stored breadth-first, so the children of a node are contiguous and
+sorted by label:
+
+    header      magic, version, node count
+    first       (n + 1) little-endian uint32 ids of each node's first child
+    labels      n bytes, the character on the edge into each node
+    counts      n uint8 syllable counts, NONE if no word ends at the node
+    floors      n uint8 lowest syllable count in each node's subtree
+
+The children of node i are first[i] up to first[i + 1]. Node 0 is the root.
+'''
+
+from eh.lib import mapped
+import os
+import mmap
+import struct
+import numpy as np
+from collections import deque
+
+
+# Default location of the compiled trie.
+PATH = os.path.join(os.path.dirname(__file__), 'trie.bin')
+
+# File format.
+MAGIC = 'EHTR'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+
+# Count marker for nodes where no word ends.
+NONE = 255
+
+
+def build(path=PATH, source=None):
+
+    ''' Compile a word -> count dictionary into a binary trie at path. '''
+
+    # By default, compile the CMU dictionary.
+    if source is None:
+        from eh.lib.syllables import syllables as source
+
+    # Build the trie as nested dicts, with the count under the None key.
+    root = {}
+    for word, count in source.iteritems():
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[None] = count
+
+    # Flatten breadth-first.
+    first, labels, counts, nodes = [], [], [], []
+    queue = deque([('\0', root)])
+    following = 1
+
+    while queue:
+
+        label, node = queue.popleft()
+        children = sorted(k for k in node if k is not None)
+
+        first.append(following)
+        labels.append(label)
+        counts.append(node.get(None, NONE))
+        nodes.append(node)
+
+        for char in children:
+            queue.append((char, node[char]))
+
+        following += len(children)
+
+    first.append(following)
+
+    # Subtree floors, computed from the leaves up.
+    floors = list(counts)
+    for i in reversed(xrange(len(nodes))):
+        for child in xrange(first[i], first[i+1]):
+            floors[i] = min(floors[i], floors[child])
+
+    # Write to a temporary file and swap it in.
+    temp = '%s.%d.tmp' % (path, os.getpid())
+    with open(temp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(nodes)))
+        f.write(struct.pack('<%dI' % len(first), *first))
+        f.write(''.join(labels))
+        f.write(struct.pack('<%dB' % len(counts), *counts))
+        f.write(struct.pack('<%dB' % len(floors), *floors))
+
+    os.rename(temp, path)
+
+
+def load(path=PATH):
+
+    ''' Map the trie at path, compiling it first if it is missing or stale. '''
+
+    return mapped.load(path, build, Trie)
+
+
+class Trie(object):
+
+    ''' Read-only prefix trie over a compiled file. '''
+
+
+    def __init__(self, path):
+
+        ''' Map the file and read the header. '''
+
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, size = HEADER.unpack_from(self.buffer, 0)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a version %d trie.' % (path, VERSION))
+
+        self.size = size
+        self.labelsAt = HEADER.size + (size + 1) * 4
+        self.countsAt = self.labelsAt + size
+        self.floorsAt = self.countsAt + size
+
+        self.first = np.frombuffer(self.buffer, np.uint32, size + 1,
+                HEADER.size)
+
+
+    def children(self, node):
+
+        ''' Get the id of the first child of a node, and the child labels. '''
+
+        start, end = int(self.first[node]), int(self.first[node+1])
+        return start, self.buffer[self.labelsAt + start:self.labelsAt + end]
+
+
+    def find(self, prefix):
+
+        ''' Get the node for a prefix, or None if no word starts with it. '''
+
+        if isinstance(prefix, unicode):
+            prefix = prefix.encode('utf-8')
+
+        node = 0
+        for char in prefix:
+            start, labels = self.children(node)
+            i = labels.find(char)
+            if i == -1: return None
+            node = start + i
+
+        return node
+
+
+    def count(self, node):
+
+        ''' Get the count of the word ending at a node, or NONE. '''
+
+        return ord(self.buffer[self.countsAt + node])
+
+
+    def floor(self, node):
+
+        ''' Get the lowest count of any word under a node. '''
+
+        return ord(self.buffer[self.floorsAt + node])
+
+
+    def complete(self, prefix, limit=10, maxSyllables=None):
+
+        '''
+        Get up to limit (word, count) pairs, in word order, for the words
+        that start with prefix and have at most maxSyllables syllables.
+        '''
+
+        if maxSyllables is None: maxSyllables = NONE - 1
+
+        node = self.find(prefix)
+        if node is None: return []
+
+        results = []
+        stack = [(node, prefix)]
+
+        # Depth-first, skipping subtrees with no word short enough.
+        while stack and len(results) < limit:
+
+            node, word = stack.pop()
+            if self.floor(node) > maxSyllables: continue
+
+            count = self.count(node)
+            if count <= maxSyllables:
+                results.append((word, count))
+
+            start, labels = self.children(node)
+            for i in reversed(xrange(len(labels))):
+                stack.append((start + i, word + labels[i]))
+
+        return results
+
+
+    def __contains__(self, word):
+        node = self.find(word)
+        return node is not None and self.count(node) != NONE
+
+
+    def close(self):
+
+        ''' Unmap the trie. '''
+
+        self.buffer.close()
+
+
+if __name__ == '__main__':
+    build()
@@ -3,3 +3,6 @@ from haiku import Haiku
 from round import Round
 from word import Word
 from allocation import Allocation
+from lease import Lease
+from node import Node
+from snapshot import Snapshot
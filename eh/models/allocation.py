@@ -4,8 +4,9 @@ An allocation of points to a word in a given haiku and round.
 
 # Get application assets.
 from eh import db
-import datetime as dt
-import math
+from haiku import Haiku
+from word import Word
+import time
 
 
 class Allocation(db.Model):
@@ -17,29 +18,78 @@ class Allocation(db.Model):
 
     # System attributes:
     id = db.Column(db.Integer, primary_key=True)
+    haiku_id = db.Column(db.Integer, db.ForeignKey('haiku.id'))
+    round_id = db.Column(db.Integer, db.ForeignKey('rounds.id'), index=True)
+    word_id = db.Column(db.Integer, db.ForeignKey('words.id'), index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+
+    # Points at the time of allocation, and the time, in seconds since the
+    # epoch, so the slicer can load them straight into arrays:
+    amount = db.Column(db.Float)
+    allocated_at = db.Column(db.Float)
+
+    # Set once the amount is in the word's value. The row is never rewritten
+    # after that:
+    folded = db.Column(db.Boolean, default=False, index=True)
+
+    # The time of the bulkSlice() that folded it, which marks the rows the
+    # slice claimed:
+    folded_on = db.Column(db.Float, index=True)
 
 
     # Row methods:
 
-    def __init__(self):
+    def __init__(self, haikuId, roundId, wordId, userId, amount,
+            allocatedAt=None):
 
         ''' Set parameters. '''
 
-        pass
+        self.haiku_id =         haikuId
+        self.round_id =         roundId
+        self.word_id =          wordId
+        self.user_id =          userId
+        self.amount =           amount
+        self.allocated_at =     time.time() if allocatedAt is None \
+                                    else allocatedAt
+        self.folded =           False
 
 
     # Table methods.
 
     @classmethod
-    def createAllocation(self):
+    def markFolded(self, ids):
+
+        ''' Mark allocations folded into their words, in one executemany. '''
+
+        if not ids: return
+
+        table = Allocation.__table__
+
+        db.session.execute(table.update()
+                .where(table.c.id == db.bindparam('allocation_id'))
+                .values(folded = True),
+                [{'allocation_id': id} for id in ids])
+
+
+    @classmethod
+    def createAllocation(self, haikuId, roundId, wordId, userId, amount,
+            allocatedAt=None):
 
-        ''' Apply an allocation. '''
+        '''
+        Apply an allocation: record it, and fold it into the word's value in
+        the same transaction, so the standings never need a GROUP BY over the
+        allocations.
+        '''
 
-        # ** set.
+        allocation = Allocation(haikuId, roundId, wordId, userId, amount,
+                allocatedAt)
+        allocation.folded = True
+        db.session.add(allocation)
 
-        # db.session.add(round)
-        # db.session.commit()
+        lifetime = db.session.query(Haiku.decay_mean_lifetime) \
+                .filter(Haiku.id == haikuId).scalar()
 
-        # return round
+        Word.foldValues([(wordId, amount, lifetime)], allocation.allocated_at)
+        db.session.commit()
 
-        pass
+        return allocation
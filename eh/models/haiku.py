@@ -29,6 +29,10 @@ class Haiku(db.Model):
     decay_mean_lifetime = db.Column(db.Float)
     seed_capital = db.Column(db.Integer)
 
+    # Slicing state:
+    running = db.Column(db.Boolean, index=True)
+    sliced_on = db.Column(db.DateTime)
+
 
     # Row methods:
 
@@ -53,6 +57,28 @@ class Haiku(db.Model):
         self.blind_submission_value =   submissionValue
         self.decay_mean_lifetime =      int(halfLife) / math.log(2)
         self.seed_capital =             capital
+        self.running =                  False
+        self.sliced_on =                None
+
+
+    def startSlicing(self):
+
+        '''
+        Mark the haiku as running. The slicing process starts a slicer for
+        every running haiku, including after a restart.
+        '''
+
+        self.running = True
+        self.sliced_on = dt.datetime.now()
+        db.session.commit()
+
+
+    def stopSlicing(self):
+
+        ''' Mark the haiku as stopped. '''
+
+        self.running = False
+        db.session.commit()
 
 
     # Table methods.
@@ -95,6 +121,23 @@ class Haiku(db.Model):
         return haiku if haiku != None else False
 
 
+    @classmethod
+    def getRunningHaiku(self, shards=None, count=None):
+
+        '''
+        Get the running haiku, in one query. If shards is passed, get only
+        the haiku whose id % count is in shards.
+        '''
+
+        query = Haiku.query.filter_by(running=True)
+
+        if shards is not None:
+            if not shards: return []
+            query = query.filter((Haiku.id % count).in_(list(shards)))
+
+        return query.all()
+
+
     @classmethod
     def deleteHaiku(self, id):
 
@@ -0,0 +1,114 @@
+'''
+A scheduler node's claim on a shard of the haiku. Haiku are split into
+shards by id, and each shard is sliced by the node that holds its lease.
+'''
+
+# Get application assets.
+from eh import db
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+
+class Lease(db.Model):
+
+    ''' Shard leases. '''
+
+    # Table name:
+    __tablename__ = 'leases'
+
+    # System attributes:
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    node = db.Column(db.String(100), index=True)
+    expires_on = db.Column(db.DateTime)
+
+
+    # Row methods:
+
+    def __init__(self, shard):
+
+        ''' Set parameters. '''
+
+        self.shard = shard
+        self.node = None
+        self.expires_on = None
+
+
+    # Table methods.
+
+    @classmethod
+    def createLeases(self, count):
+
+        ''' Create the rows for shards 0 to count - 1 that are missing. '''
+
+        existing = set(s for (s,) in db.session.query(Lease.shard))
+        missing = [Lease(s) for s in xrange(count) if s not in existing]
+
+        if not missing: return
+
+        # Another node may create them first.
+        try:
+            db.session.add_all(missing)
+            db.session.commit()
+
+        except IntegrityError:
+            db.session.rollback()
+
+
+    @classmethod
+    def claimLease(self, shard, node, now, expires):
+
+        '''
+        Take a shard if it is free, expired, or already held by node. The
+        check and the write are one UPDATE, so two nodes can never both
+        succeed. Returns True if node holds the lease.
+        '''
+
+        table = Lease.__table__
+
+        result = db.session.execute(table.update()
+                .where(table.c.shard == shard)
+                .where(or_(
+                    table.c.node == None,
+                    table.c.node == node,
+                    table.c.expires_on < now))
+                .values(node = node, expires_on = expires))
+
+        return result.rowcount == 1
+
+
+    @classmethod
+    def getHeldShards(self, node, now):
+
+        ''' Get the set of shards whose unexpired leases node holds. '''
+
+        return set(s for (s,) in db.session.query(Lease.shard)
+                .filter(Lease.node == node)
+                .filter(Lease.expires_on >= now))
+
+
+    @classmethod
+    def renewLeases(self, node, now, expires):
+
+        ''' Extend the unexpired leases held by node. '''
+
+        table = Lease.__table__
+
+        db.session.execute(table.update()
+                .where(table.c.node == node)
+                .where(table.c.expires_on >= now)
+                .values(expires_on = expires))
+
+
+    @classmethod
+    def releaseLeases(self, node, shards=None):
+
+        ''' Give up the leases held by node, or just the listed shards. '''
+
+        table = Lease.__table__
+        query = table.update().where(table.c.node == node)
+
+        if shards is not None:
+            if not shards: return
+            query = query.where(table.c.shard.in_(shards))
+
+        db.session.execute(query.values(node = None, expires_on = None))
@@ -0,0 +1,61 @@
+'''
+A scheduler process that is taking part in sharded slicing.
+'''
+
+# Get application assets.
+from eh import db
+
+
+class Node(db.Model):
+
+    ''' Live scheduler nodes. '''
+
+    # Table name:
+    __tablename__ = 'nodes'
+
+    # System attributes:
+    name = db.Column(db.String(100), primary_key=True)
+    expires_on = db.Column(db.DateTime)
+
+
+    # Row methods:
+
+    def __init__(self, name, expires):
+
+        ''' Set parameters. '''
+
+        self.name = name
+        self.expires_on = expires
+
+
+    # Table methods.
+
+    @classmethod
+    def announceNode(self, name, expires):
+
+        ''' Record that a node is alive until expires. '''
+
+        table = Node.__table__
+
+        result = db.session.execute(table.update()
+                .where(table.c.name == name)
+                .values(expires_on = expires))
+
+        if result.rowcount == 0:
+            db.session.add(Node(name, expires))
+
+
+    @classmethod
+    def countLiveNodes(self, now):
+
+        ''' Count the nodes that have not expired. '''
+
+        return Node.query.filter(Node.expires_on >= now).count()
+
+
+    @classmethod
+    def removeNode(self, name):
+
+        ''' Forget a node. '''
+
+        Node.query.filter_by(name=name).delete()
@@ -5,7 +5,6 @@ A single word selection episode in a poem.
 # Get application assets.
 from eh import db
 import datetime as dt
-import math
 
 
 class Round(db.Model):
@@ -17,29 +16,42 @@ class Round(db.Model):
 
     # System attributes:
     id = db.Column(db.Integer, primary_key=True)
+    haiku_id = db.Column(db.Integer, db.ForeignKey('haiku.id'), index=True)
+    started_on = db.Column(db.DateTime)
+
+    # Set when the round closes; the allocations of open rounds are live:
+    ended_on = db.Column(db.DateTime)
 
 
     # Row methods:
 
-    def __init__(self):
+    def __init__(self, haikuId):
 
         ''' Set parameters. '''
 
-        pass
+        self.haiku_id =     haikuId
+        self.started_on =   dt.datetime.now()
+        self.ended_on =     None
+
+
+    def endRound(self):
+
+        ''' Close the round. Its allocations stop decaying. '''
+
+        self.ended_on = dt.datetime.now()
+        db.session.commit()
 
 
     # Table methods.
 
     @classmethod
-    def createRound(self):
-
-        ''' Create a new round. '''
+    def createRound(self, haikuId):
 
-        # ** set.
+        ''' Open a new round. '''
 
-        # db.session.add(round)
-        # db.session.commit()
+        round = Round(haikuId)
 
-        # return round
+        db.session.add(round)
+        db.session.commit()
 
-        pass
+        return round
@@ -0,0 +1,61 @@
+'''
+The metrics of a slicing process, published for the web workers to serve.
+The slicers only run in the slicing processes, so a web worker has no
+metrics of its own.
+'''
+
+# Get application assets.
+from eh import db
+
+
+class Snapshot(db.Model):
+
+    ''' Published metrics, one row per slicing process. '''
+
+    # Table name:
+    __tablename__ = 'snapshots'
+
+    # System attributes:
+    node = db.Column(db.String(100), primary_key=True)
+    taken_on = db.Column(db.DateTime, index=True)
+
+    # The process's metrics, in the Prometheus text format:
+    text = db.Column(db.Text)
+
+
+    # Row methods:
+
+    def __init__(self, node, text, taken):
+
+        ''' Set parameters. '''
+
+        self.node = node
+        self.text = text
+        self.taken_on = taken
+
+
+    # Table methods.
+
+    @classmethod
+    def publishSnapshot(self, node, text, taken):
+
+        ''' Replace a node's published metrics. '''
+
+        table = Snapshot.__table__
+
+        result = db.session.execute(table.update()
+                .where(table.c.node == node)
+                .values(text = text, taken_on = taken))
+
+        if result.rowcount == 0:
+            db.session.add(Snapshot(node, text, taken))
+
+
+    @classmethod
+    def getSnapshots(self, since):
+
+        ''' Get the text of the metrics published since a time, by node. '''
+
+        return [s.text for s in Snapshot.query
+                .filter(Snapshot.taken_on >= since)
+                .order_by(Snapshot.node)]
@@ -4,8 +4,9 @@ A candidate word for a given haiku and selection round.
 
 # Get application assets.
 from eh import db
-import datetime as dt
+from haiku import Haiku
 import math
+import time
 
 
 class Word(db.Model):
@@ -21,6 +22,12 @@ class Word(db.Model):
     round_id = db.Column(db.Integer, db.ForeignKey('rounds.id'))
     word = db.Column(db.String(60))
 
+    # Sum of the folded allocations, decayed to value_at, in seconds since
+    # the epoch. Decay is applied on read, so the row only changes when an
+    # allocation is folded in, which rescales it to the allocation's time:
+    value = db.Column(db.Float, default=0)
+    value_at = db.Column(db.Float)
+
 
     # Row methods:
 
@@ -31,8 +38,96 @@ class Word(db.Model):
         pass
 
 
+    def getValue(self, lifetime, now=None):
+
+        ''' Get the value decayed to now, for a haiku's mean lifetime. '''
+
+        if self.value_at is None or not lifetime: return self.value
+
+        now = time.time() if now is None else now
+        return self.value * math.exp(-max(0, now - self.value_at) / lifetime)
+
+
     # Table methods.
 
+    @classmethod
+    def getValues(self, haikuId, now=None):
+
+        '''
+        Get the value of each word in a haiku, decayed to now, as a dict of
+        word id -> value. One query; the decay is arithmetic on the rows.
+        '''
+
+        lifetime = db.session.query(Haiku.decay_mean_lifetime) \
+                .filter(Haiku.id == haikuId).scalar()
+
+        return dict((word.id, word.getValue(lifetime, now))
+                for word in Word.query.filter_by(haiku_id=haikuId))
+
+
+    @classmethod
+    def foldValues(self, values, now):
+
+        '''
+        Add totals, decayed to now, to the values of words. Each value is
+        rescaled from its value_at to now in the same UPDATE, so concurrent
+        folds into one word never lose each other. values is a list of
+        (word id, total, mean lifetime) tuples; a lifetime of None or 0
+        means no decay.
+        '''
+
+        table = Word.__table__
+        value = db.func.coalesce(table.c.value, 0)
+        total = db.bindparam('total')
+        now = float(now)
+
+        # value * exp(-(now - value_at) / lifetime) + total
+        since = db.func.coalesce(table.c.value_at, db.bindparam('now')) - \
+                db.bindparam('now')
+        decayed = value * db.func.exp(since / db.bindparam('lifetime'))
+
+        decaying = [v for v in values if v[2]]
+        constant = [v for v in values if not v[2]]
+
+        for rows, new in ((decaying, decayed + total),
+                (constant, value + total)):
+
+            if not rows: continue
+
+            db.session.execute(table.update()
+                    .where(table.c.id == db.bindparam('word_id'))
+                    .values(value = new, value_at = db.bindparam('now')),
+                    [{'word_id': w, 'total': t, 'lifetime': l, 'now': now}
+                        for w, t, l in rows])
+
+
+    @classmethod
+    def replaceValues(self, values):
+
+        '''
+        Set the value of each word, and the time it is decayed to, only if
+        they are still the ones observed, so a concurrent fold is never
+        overwritten. values is a list of (word id, (observed value, observed
+        time), value, time) tuples. Get the ids of the words that changed.
+        '''
+
+        table = Word.__table__
+        changed = []
+
+        # One UPDATE each, for its row count; None compares with IS NULL.
+        for w, (oldValue, oldTime), v, t in values:
+
+            result = db.session.execute(table.update()
+                    .where(table.c.id == w)
+                    .where(table.c.value == oldValue)
+                    .where(table.c.value_at == oldTime)
+                    .values(value = v, value_at = t))
+
+            if result.rowcount == 0: changed.append(w)
+
+        return changed
+
+
     @classmethod
     def createWord(self):
 
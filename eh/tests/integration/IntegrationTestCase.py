@@ -2,10 +2,21 @@
 Abstract class for integration tests.
 '''
 
-from eh import app, db, sched
+from eh import app, db, sched, createApp
 import unittest
 import blinker
 from flask import template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# SQL statements issued by any engine, for counting queries.
+statements = []
+
+def recordStatement(conn, cursor, statement, parameters, context, many):
+    statements.append(statement)
+
+event.listen(Engine, 'before_cursor_execute', recordStatement)
 
 
 class IntegrationTestCase(unittest.TestCase):
@@ -18,11 +29,16 @@ class IntegrationTestCase(unittest.TestCase):
         template tracking set up.
         '''
 
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///test.db'
-        app.config['TESTING'] = True
+        createApp({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///test.db',
+            'TESTING': True })
+
         self.app = app.test_client()
         db.create_all()
 
+        # The test process also runs the slicers.
+        if not sched.running: sched.start()
+
         self.templates = []
         template_rendered.connect(self.addTemplate)
 
@@ -68,6 +84,24 @@ class IntegrationTestCase(unittest.TestCase):
         raise AssertionError, "template %s not used" % name
 
 
+    def resetStatements(self):
+
+        '''
+        Start counting SQL statements from zero.
+        '''
+
+        del statements[:]
+
+
+    def countStatements(self):
+
+        '''
+        Count the SQL statements issued since resetStatements().
+        '''
+
+        return len(statements)
+
+
     def assertRedirect(self, response, location):
 
         '''
@@ -4,9 +4,12 @@ Integration tests for the admin controller.
 
 # Get the abstract class and models.
 import IntegrationTestCase as i
-from eh import sched
+from eh import sched, db
 from eh.models import User, Haiku
-from eh.helpers import slicer
+from eh.helpers import slicer, snapshots, lease
+from eh.helpers.scheduler import HaikuScheduler
+from eh.helpers.metrics import SchedulerMetrics
+from eh.views import admin as views
 from eh.lib.messages import errors as e
 from werkzeug.security import check_password_hash
 from flask import session
@@ -18,7 +21,51 @@ class AdminBrowseTest(i.IntegrationTestCase):
     ''' /admin '''
 
 
-    pass
+    def testStatementCount(self):
+
+        '''
+        Rendering /admin should issue a constant number of SQL statements,
+        regardless of the number of haiku or running slicers.
+        '''
+
+        # Create an admin.
+        admin = User.createAdministrator('username', 'password')
+
+        # Create 1000 haiku, each by a different user.
+        users = [User('user' + str(n), 'password', True) for n in range(1000)]
+        db.session.add_all(users)
+        db.session.commit()
+
+        db.session.add_all([
+            Haiku(u.id, 'test' + str(u.id), 1000, 1000, 5, 100, 30, 1000)
+            for u in users])
+        db.session.commit()
+
+        # Run slicers for half of them. Phased slicers can fire during the
+        # request, so they must not add statements of their own.
+        for haiku in Haiku.query.all()[::2]:
+            sched.createSlicer(haiku, lambda *ids: None)
+
+        adminId = admin.id
+        db.session.remove()
+
+        with self.app as c:
+
+            # Push in a user id.
+            with c.session_transaction() as s:
+                s['user_id'] = adminId
+
+            # Render browse.
+            self.resetStatements()
+            rv = c.get('/admin')
+            self.assertTemplateUsed('admin/browse.html')
+
+            # Auth checks plus one query for the haiku.
+            self.assertLessEqual(self.countStatements(), 5)
+
+        # Clean up the slicers.
+        for haiku in Haiku.query.all():
+            sched.deleteSlicer(haiku)
 
 
 
@@ -215,6 +262,49 @@ class AdminStartTest(i.IntegrationTestCase):
             job = sched.getJobByHaiku(haiku)
             self.assertIsNot(job, False)
 
+            # Check the running flag.
+            self.assertTrue(Haiku.query.get(haiku.id).running)
+
+            # Clean up the slicer.
+            sched.deleteSlicer(haiku)
+
+
+    def testWebWorker(self):
+
+        '''
+        Where the scheduler is not running, as in a web worker, starting and
+        stopping should only set the running flag, and leave no jobs.
+        '''
+
+        # Create an admin and haiku.
+        admin = User.createAdministrator('username', 'password')
+        haiku = Haiku.createHaiku(admin.id, 'test', 1000, 1, 5, 100, 30, 1000)
+        adminId, haikuId = admin.id, haiku.id
+
+        # A scheduler that is never started.
+        worker = HaikuScheduler()
+        views.sched = worker
+
+        try:
+
+            with self.app as c:
+
+                # Push in a user id.
+                with c.session_transaction() as s:
+                    s['user_id'] = adminId
+
+                for n in range(5):
+                    c.get('/admin/start/' + str(haikuId))
+                    c.get('/admin/stop/' + str(haikuId))
+
+                c.get('/admin/start/' + str(haikuId))
+
+        finally: views.sched = sched
+
+        self.assertEquals(worker._pending_jobs, [])
+        self.assertEquals(worker.jobs, {})
+        self.assertTrue(Haiku.query.get(haikuId).running)
+
 
 
 class AdminStopTest(i.IntegrationTestCase):
@@ -252,6 +342,70 @@ class AdminStopTest(i.IntegrationTestCase):
             job = sched.getJobByHaiku(haiku)
             self.assertFalse(job)
 
+            # Check the running flag.
+            self.assertFalse(Haiku.query.get(haiku.id).running)
+
+
+
+class AdminMetricsTest(i.IntegrationTestCase):
+
+    ''' /admin/metrics '''
+
+
+    def testMetrics(self):
+
+        '''
+        A GET request should expose the slicer metrics as text.
+        '''
+
+        # Create an admin.
+        admin = User.createAdministrator('username', 'password')
+
+        with self.app as c:
+
+            # Push in a user id.
+            with c.session_transaction() as s:
+                s['user_id'] = admin.id
+
+            # Hit the route, check the format.
+            rv = c.get('/admin/metrics')
+            self.assertEquals(rv.status_code, 200)
+            self.assertTrue(rv.content_type.startswith('text/plain'))
+            self.assertIn('# TYPE eh_slicer_lag_seconds histogram', rv.data)
+            self.assertIn('eh_slicers{node="%s"} ' % lease.nodeName(), rv.data)
+
+
+    def testPublished(self):
+
+        '''
+        Where the scheduler is not running, as in a web worker, the metrics
+        published by the slicing processes should be served.
+        '''
+
+        # Create an admin.
+        admin = User.createAdministrator('username', 'password')
+        adminId = admin.id
+
+        # A slicing process publishes; this one never starts its scheduler.
+        snapshots.publish('slicing-1', SchedulerMetrics(lambda: 3))
+        views.sched = HaikuScheduler()
+
+        try:
+
+            with self.app as c:
+
+                # Push in a user id.
+                with c.session_transaction() as s:
+                    s['user_id'] = adminId
+
+                rv = c.get('/admin/metrics')
+
+        finally: views.sched = sched
+
+        self.assertEquals(rv.status_code, 200)
+        self.assertIn('eh_slicers{node="slicing-1"} 3.0', rv.data)
+        self.assertNotIn('node="%s"' % lease.nodeName(), rv.data)
+
 
 
 class AdminRegisterTest(i.IntegrationTestCase):
@@ -0,0 +1,65 @@
+'''
+Integration tests for the SQL traffic of slicing.
+'''
+
+import IntegrationTestCase as i
+from eh import db
+from eh.models import User, Haiku, Word, Round, Allocation
+from eh.helpers import slicer
+import time
+
+
+class BulkSliceTest(i.IntegrationTestCase):
+
+
+    def populate(self, allocations):
+
+        ''' Create a haiku with 10 words and allocations. Get its id. '''
+
+        user = User.createAdministrator('username' + str(allocations),
+                'password')
+        haiku = Haiku.createHaiku(user.id, 'test' + str(allocations), 1000, 1,
+                5, 100, 30, 1000)
+        round = Round.createRound(haiku.id)
+
+        words = [Word() for n in range(10)]
+        for word in words:
+            word.haiku_id = haiku.id
+            word.round_id = round.id
+
+        db.session.add_all(words)
+        db.session.commit()
+
+        now = time.time()
+        db.session.add_all([Allocation(haiku.id, round.id, words[n % 10].id,
+            user.id, 10.0, now - n) for n in range(allocations)])
+        db.session.commit()
+
+        return haiku.id
+
+
+    def testStatementCount(self):
+
+        '''
+        bulkSlice() should take the same statements for 10 or 1000
+        allocations.
+        '''
+
+        small = self.populate(10)
+        large = self.populate(1000)
+        db.session.remove()
+
+        counts = []
+
+        for id in (small, large):
+            self.resetStatements()
+            slicer.bulkSlice(id)
+            counts.append(self.countStatements())
+
+        self.assertEquals(counts[0], counts[1])
+        self.assertEquals(Allocation.query.filter_by(folded=False).count(), 0)
+
+
+
+if __name__ == '__main__':
+    i.unittest.main()
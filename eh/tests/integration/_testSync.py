@@ -0,0 +1,50 @@
+'''
+Integration tests for restoring slicers after a restart.
+'''
+
+import IntegrationTestCase as i
+from eh import db
+from eh.models import User, Haiku
+from eh.helpers import sync
+from eh.helpers.wheel import WheelScheduler
+import datetime as dt
+
+
+class SynchronizeTest(i.IntegrationTestCase):
+
+
+    def testStatementCount(self):
+
+        '''
+        Restoring the running haiku should take one query, however many are
+        running.
+        '''
+
+        # Create an admin.
+        admin = User.createAdministrator('username', 'password')
+
+        # Create 500 running haiku, sliced recently.
+        haiku = [Haiku(admin.id, 'test' + str(n), 1000, 1000, 5, 100, 30, 1000)
+                for n in range(500)]
+
+        for h in haiku:
+            h.running = True
+            h.sliced_on = dt.datetime.now()
+
+        db.session.add_all(haiku)
+        db.session.commit()
+        db.session.remove()
+
+        # A fresh scheduler, as after a restart.
+        sched = WheelScheduler()
+
+        self.resetStatements()
+        started, stopped = sync.synchronize(sched, lambda *ids: None)
+
+        self.assertEquals(len(started), 500)
+        self.assertEquals(self.countStatements(), 1)
+
+
+
+if __name__ == '__main__':
+    i.unittest.main()
@@ -0,0 +1,104 @@
+'''
+Unit tests for the allocation model.
+'''
+
+from eh import db
+from eh.models import User, Haiku, Word, Round, Allocation
+import UnitTestCase as u
+import time
+
+
+class AllocationModelUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Create a haiku, with a half-life of 30s, a round and a word.
+        '''
+
+        super(AllocationModelUnitTest, self).setUp()
+
+        user = User.createAdministrator('username', 'password')
+        haiku = Haiku.createHaiku(user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+        round = Round.createRound(haiku.id)
+
+        word = Word()
+        word.haiku_id = haiku.id
+        word.round_id = round.id
+        db.session.add(word)
+        db.session.commit()
+
+        self.userId = user.id
+        self.haikuId = haiku.id
+        self.roundId = round.id
+        self.wordId = word.id
+
+
+    def allocate(self, amount, at):
+
+        ''' Apply an allocation to the word. '''
+
+        return Allocation.createAllocation(self.haikuId, self.roundId,
+                self.wordId, self.userId, amount, at)
+
+
+    def testCreateAllocation(self):
+
+        '''
+        createAllocation() should record the allocation and fold it into the
+        word's value.
+        '''
+
+        now = time.time()
+        self.allocate(100.0, now)
+        db.session.remove()
+
+        allocation = Allocation.query.first()
+        self.assertEquals(allocation.amount, 100.0)
+        self.assertEquals(allocation.allocated_at, now)
+        self.assertTrue(allocation.folded)
+
+        word = Word.query.get(self.wordId)
+        self.assertEquals(word.value, 100.0)
+        self.assertEquals(word.value_at, now)
+
+
+    def testRunningValue(self):
+
+        '''
+        Each allocation should decay the running value to its own time first,
+        in either direction.
+        '''
+
+        now = time.time()
+
+        self.allocate(100.0, now - 30)
+        self.allocate(100.0, now)
+        self.allocate(100.0, now - 60)
+        db.session.remove()
+
+        values = Word.getValues(self.haikuId, now + 30)
+        self.assertAlmostEquals(values[self.wordId], 50 + 25 + 12.5)
+
+
+    def testNoDecay(self):
+
+        '''
+        With no mean lifetime, allocations should just add up.
+        '''
+
+        haiku = Haiku.query.get(self.haikuId)
+        haiku.decay_mean_lifetime = 0
+        db.session.commit()
+
+        self.allocate(100.0, 0)
+        self.allocate(100.0, 1000)
+        db.session.remove()
+
+        self.assertEquals(Word.getValues(self.haikuId, 2000)[self.wordId], 200)
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
@@ -0,0 +1,268 @@
+'''
+Unit tests for the virtual clock, and the backends and slicer running on it.
+'''
+
+from eh import db
+from eh.models import User, Haiku, Word, Round, Allocation
+from eh.helpers.clock import VirtualClock, SYSTEM
+from eh.helpers.scheduler import HaikuScheduler, createScheduler
+from eh.helpers.wheel import WheelScheduler
+from eh.helpers import slicer, phase
+from collections import namedtuple
+import UnitTestCase as u
+import functools
+
+
+# The haiku fields the schedulers read.
+Record = namedtuple('Record', 'id slicing_interval')
+
+# A fixed start, so every run is the same.
+START = 1000000000
+
+
+class VirtualClockUnitTest(u.UnitTestCase):
+
+
+    def testAdvance(self):
+
+        '''
+        The clock should only move when advanced, slept on or set forward.
+        '''
+
+        clock = VirtualClock(START)
+        self.assertEquals(clock.time(), START)
+
+        clock.advance(10)
+        clock.sleep(5)
+        self.assertEquals(clock.time(), START + 15)
+
+        # Never back.
+        clock.set(START)
+        self.assertEquals(clock.time(), START + 15)
+
+        clock.set(START + 20)
+        self.assertEquals(clock.now(),
+                SYSTEM.now().fromtimestamp(START + 20))
+
+
+    def testRealOnly(self):
+
+        '''
+        Only a virtual clock should be advanced.
+        '''
+
+        self.assertRaises(RuntimeError, WheelScheduler().advance, 1)
+        self.assertRaises(RuntimeError, HaikuScheduler().advance, 1)
+
+
+class VirtualWheelUnitTest(u.UnitTestCase):
+
+
+    def run10k(self):
+
+        '''
+        Slice 10k haiku every 10 minutes for an hour. Get the slices per
+        haiku, and the batches in order.
+        '''
+
+        clock = VirtualClock(START)
+        sched = createScheduler('wheel', clock=clock)
+
+        counts = {}
+        batches = []
+
+        def count(*ids):
+            batches.append((clock.time(), ids))
+            for id in ids: counts[id] = counts.get(id, 0) + 1
+
+        for id in xrange(1, 10001):
+            sched.createSlicer(Record(id, 600), count)
+
+        sched.start()
+        self.assertEquals(sched.advance(3600), 60000)
+        sched.shutdown()
+
+        self.assertEquals(clock.time(), START + 3600)
+        return counts, batches
+
+
+    def test10k(self):
+
+        '''
+        Every haiku should be sliced once an interval, on time, the same
+        way every run.
+        '''
+
+        counts, batches = self.run10k()
+
+        self.assertEquals(len(counts), 10000)
+        self.assertEquals(set(counts.values()), set([6]))
+
+        # Exactly repeatable.
+        self.assertEquals(self.run10k()[1], batches)
+
+
+    def testMetrics(self):
+
+        '''
+        Lag should be measured on the virtual clock.
+        '''
+
+        clock = VirtualClock(START)
+        sched = WheelScheduler(phased=False, clock=clock)
+        sched.createSlicer(Record(1, 10), lambda *ids: clock.sleep(25))
+
+        # Each slice overruns the next one or two.
+        sched.advance(100)
+
+        self.assertEquals(sched.metrics.runs.get(), 5)
+        self.assertEquals(sched.metrics.misfires.get(), 6)
+        self.assertEquals(sched.metrics.lag.get()['sum'], 70)
+        self.assertEquals(sched.metrics.duration.get()['sum'], 125)
+
+
+    def testOverdue(self):
+
+        '''
+        An overdue slicer should fire in the next batch, then keep its phase.
+        '''
+
+        clock = VirtualClock(START)
+        sched = WheelScheduler(clock=clock)
+
+        runs = []
+        record = lambda *ids: runs.append((ids, clock.time()))
+
+        sched.createSlicer(Record(1, 600), record, overdue=True)
+        sched.createSlicer(Record(2, 600), record)
+
+        sched.start()
+        sched.advance(1200)
+
+        due = [phase.firstDue(id, 600, START) for id in (1, 2)]
+        self.assertEquals(runs[0], ((1,), START))
+        self.assertEquals(sorted(runs[1:]), sorted([((1,), due[0]),
+            ((1,), due[0] + 600), ((2,), due[1]), ((2,), due[1] + 600)]))
+
+
+class VirtualHaikuSchedulerUnitTest(u.UnitTestCase):
+
+
+    def testRuns(self):
+
+        '''
+        Each job should run once an interval, with no lag.
+        '''
+
+        clock = VirtualClock(START)
+        sched = HaikuScheduler(clock=clock)
+
+        runs = []
+        for id in xrange(1, 51):
+            sched.createSlicer(Record(id, 60), runs.append)
+
+        sched.start()
+        sched.advance(3600)
+
+        self.assertEquals(len(runs), 3000)
+        self.assertEquals(sorted(set(runs)), range(1, 51))
+        self.assertEquals(sched.metrics.runs.get(), 3000)
+        self.assertEquals(sched.metrics.lag.get()['sum'], 0)
+
+        sched.shutdown()
+        self.assertFalse(sched.running)
+
+
+    def testMisfire(self):
+
+        '''
+        A run that overruns should coalesce or miss the runs behind it.
+        '''
+
+        clock = VirtualClock(START)
+        sched = HaikuScheduler(phased=False, clock=clock)
+        sched.start()
+
+        sched.createSlicer(Record(1, 10), lambda id: clock.sleep(25))
+        sched.advance(100)
+
+        self.assertEquals(sched.metrics.runs.get(), 5)
+        self.assertEquals(sched.metrics.misfires.get(), 4)
+        self.assertEquals(sched.countQueued(), 0)
+
+        sched.shutdown()
+
+
+    def testOverdue(self):
+
+        '''
+        An overdue job should run at once, whether the scheduler was running
+        or not, then keep its phase.
+        '''
+
+        clock = VirtualClock(START)
+        sched = HaikuScheduler(clock=clock)
+
+        runs = []
+        record = lambda id: runs.append((id, clock.time()))
+
+        # Pending until the start, and added to the running scheduler.
+        sched.createSlicer(Record(1, 600), record, overdue=True)
+        sched.start()
+        sched.createSlicer(Record(2, 600), record, overdue=True)
+        sched.createSlicer(Record(3, 600), record)
+
+        sched.advance(600)
+
+        self.assertEquals(sorted(runs[:2]), [(1, START), (2, START)])
+        self.assertEquals(len(runs), 5)
+
+        for id, time in runs[2:]:
+            self.assertAlmostEquals(time, phase.firstDue(id, 600, START),
+                    places=3)
+
+        sched.shutdown()
+
+
+    def testSlice(self):
+
+        '''
+        The slicing routine should decay by virtual time.
+        '''
+
+        # Create records, half-life 30s, slicing every second.
+        user = User.createAdministrator('username', 'password')
+        haiku = Haiku.createHaiku(user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+
+        word = Word()
+        word.haiku_id = haiku.id
+        db.session.add(word)
+        db.session.commit()
+
+        round = Round.createRound(haiku.id)
+        db.session.add(Allocation(haiku.id, round.id, word.id, user.id,
+            100.0, START))
+        db.session.commit()
+
+        wordId = word.id
+        haikuId = haiku.id
+
+        clock = VirtualClock(START)
+        sched = HaikuScheduler(clock=clock)
+        sched.start()
+
+        # Folded at the first slice, decayed on read.
+        sched.createSlicer(haiku, functools.partial(slicer.slice, clock=clock))
+        sched.advance(60)
+        db.session.remove()
+
+        values = Word.getValues(haikuId, clock.time())
+        self.assertAlmostEquals(values[wordId], 25.0, places=4)
+        self.assertEquals(sched.metrics.runs.get(), 60)
+
+        sched.shutdown()
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
@@ -0,0 +1,249 @@
+'''
+Unit tests for syllable counting and estimation.
+'''
+
+from eh.lib import counting
+from eh.lib.cache import LRUCache
+from eh.lib.estimator import estimate
+import UnitTestCase as u
+
+
+class LRUCacheUnitTest(u.UnitTestCase):
+
+
+    def testGetAndSet(self):
+
+        '''
+        get() should return stored values, and count hits and misses.
+        '''
+
+        cache = LRUCache(2)
+        cache.set('a', 1)
+
+        self.assertEquals(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+
+        stats = cache.stats()
+        self.assertEquals(stats['hits'], 1)
+        self.assertEquals(stats['misses'], 1)
+        self.assertEquals(stats['size'], 1)
+
+
+    def testEviction(self):
+
+        '''
+        The least recently used entry should be evicted when full.
+        '''
+
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        # Touch a, so that b is the oldest.
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEquals(len(cache), 2)
+        self.assertEquals(cache.stats()['evictions'], 1)
+
+
+
+class EstimatorUnitTest(u.UnitTestCase):
+
+
+    def testEstimate(self):
+
+        '''
+        estimate() should handle vowel groups, silent e, and suffixes.
+        '''
+
+        self.assertEquals(estimate('haiku'), 2)
+        self.assertEquals(estimate('globe'), 1)
+        self.assertEquals(estimate('bathes'), 1)
+        self.assertEquals(estimate('table'), 2)
+        self.assertEquals(estimate('wishes'), 2)
+        self.assertEquals(estimate('jumped'), 1)
+        self.assertEquals(estimate('tweeted'), 2)
+        self.assertEquals(estimate('special'), 2)
+        self.assertEquals(estimate('riot'), 2)
+
+
+    def testEstimateVowelPairs(self):
+
+        '''
+        estimate() should split vowel pairs outside the -ion suffix, and keep
+        eau together.
+        '''
+
+        self.assertEquals(estimate('lion'), 2)
+        self.assertEquals(estimate('poem'), 2)
+        self.assertEquals(estimate('being'), 2)
+        self.assertEquals(estimate('create'), 2)
+        self.assertEquals(estimate('beautiful'), 3)
+
+        # One syllable in the suffix.
+        self.assertEquals(estimate('nation'), 2)
+        self.assertEquals(estimate('million'), 2)
+        self.assertEquals(estimate('opinion'), 3)
+
+
+    def testShortAndEmptyWords(self):
+
+        '''
+        Short words should have one syllable, empty words none.
+        '''
+
+        self.assertEquals(estimate('brr'), 1)
+        self.assertEquals(estimate(''), 0)
+        self.assertEquals(estimate('--'), 0)
+
+
+
+class CountSyllablesUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Clear the estimate cache.
+        '''
+
+        super(CountSyllablesUnitTest, self).setUp()
+        counting.estimates.clear()
+
+
+    def testDictionaryWord(self):
+
+        '''
+        Dictionary words should use the dictionary count.
+        '''
+
+        self.assertEquals(counting.countSyllables('common'), 2)
+        self.assertEquals(counting.countSyllables('"Globe,"'), 1)
+
+        # Dictionary words never touch the estimate cache.
+        self.assertEquals(counting.stats()['misses'], 0)
+
+
+    def testUnknownWord(self):
+
+        '''
+        Unknown words should be estimated once, then served from the cache.
+        '''
+
+        self.assertEquals(counting.countSyllables('blorptastic'), 3)
+        self.assertEquals(counting.countSyllables('Blorptastic!'), 3)
+
+        stats = counting.stats()
+        self.assertEquals(stats['misses'], 1)
+        self.assertEquals(stats['hits'], 1)
+        self.assertEquals(stats['size'], 1)
+
+
+    def testEmptyWord(self):
+
+        '''
+        Punctuation and whitespace have no syllables.
+        '''
+
+        self.assertEquals(counting.countSyllables(' ... '), 0)
+
+
+    def testPossessive(self):
+
+        '''
+        Possessives of dictionary words should use the stem count.
+        '''
+
+        self.assertEquals(counting.countSyllables("haiku's"), 2)
+        self.assertEquals(counting.countSyllables("haikus'"), 2)
+
+        # A possessive after a sibilant adds a syllable.
+        self.assertEquals(counting.countSyllables("syllabus's"), 4)
+
+
+
+class BatchCountingUnitTest(u.UnitTestCase):
+
+
+    def testCountWords(self):
+
+        '''
+        countWords() should count each word in order.
+        '''
+
+        counts = counting.countWords(['The', 'common', 'air,', 'the', 'air'])
+        self.assertEquals(counts, [1, 2, 1, 1, 1])
+
+
+    def testCountPoem(self):
+
+        '''
+        countPoem() should return per-word counts and per-line totals.
+        '''
+
+        poem = 'an old silent pond\na frog jumps into the pond\nsplash! silence again'
+        counts, totals = counting.countPoem(poem)
+
+        self.assertEquals(counts[0], [1, 1, 2, 1])
+        self.assertEquals(totals, [5, 7, 5])
+
+        # Lines can also be passed as lists of words.
+        counts, totals = counting.countPoem([['common', 'air'], ['globe']])
+        self.assertEquals(counts, [[2, 1], [1]])
+        self.assertEquals(totals, [3, 1])
+
+
+    def testCountIds(self):
+
+        '''
+        countIds() should gather counts by word id, zero for missing words.
+        '''
+
+        ids = counting.wordIds(['common', 'air', 'blorptastic'])
+        self.assertEquals(ids[2], -1)
+        self.assertEquals(list(counting.countIds(ids)), [2, 1, 0])
+
+
+    def testSuggest(self):
+
+        '''
+        suggest() should return dictionary words that fit the syllables left.
+        '''
+
+        words = counting.suggest(2, 'wh', limit=5)
+
+        self.assertEquals(len(words), 5)
+        for word, count in words:
+            self.assertTrue(word.startswith('WH'))
+            self.assertLessEqual(count, 2)
+
+
+    def testComplete(self):
+
+        '''
+        complete() should autocomplete against the dictionary.
+        '''
+
+        self.assertEquals(counting.complete('haik', maxSyllables=2), [
+            ('HAIK', 1),
+            ('HAIKU', 2),
+            ('HAIKUS', 2)])
+
+
+    def testCountArray(self):
+
+        '''
+        countArray() should estimate the words missing from the table.
+        '''
+
+        counts = counting.countArray(['common', 'blorptastic'])
+        self.assertEquals(list(counts), [2, 3])
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
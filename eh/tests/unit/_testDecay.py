@@ -0,0 +1,109 @@
+'''
+Unit tests for the vectorized decay of allocations.
+'''
+
+from eh import db
+from eh.models import User, Haiku, Word, Round, Allocation
+from eh.helpers import decay
+import UnitTestCase as u
+import numpy as np
+import math
+
+
+class DecayUnitTest(u.UnitTestCase):
+
+
+    def testDecay(self):
+
+        '''
+        decay() should halve an amount every half-life, and never grow one
+        made after now.
+        '''
+
+        values = decay.decay(np.array([100.0, 100.0, 100.0]),
+                np.array([0.0, 30.0, 40.0]), 30.0, 30 / math.log(2))
+
+        self.assertEquals(values.tolist(), [50.0, 100.0, 100.0])
+
+
+    def testAggregate(self):
+
+        '''
+        aggregate() should sum weights by key, for keys of any size.
+        '''
+
+        keys, sums = decay.aggregate(np.array([7, 10**9, 7]),
+                np.array([1.0, 2.0, 3.0]))
+
+        self.assertEquals(keys.tolist(), [7, 10**9])
+        self.assertEquals(sums.tolist(), [4.0, 2.0])
+
+
+    def testScoreWords(self):
+
+        '''
+        scoreWords() should decay each allocation by its haiku's lifetime,
+        then total by word.
+        '''
+
+        allocations = decay.Allocations(
+                id = np.array([1, 2, 3]),
+                haiku = np.array([1, 1, 2]),
+                word = np.array([10, 10, 20]),
+                user = np.array([1, 2, 1]),
+                amount = np.array([100.0, 100.0, 100.0]),
+                time = np.array([0.0, 10.0, 0.0]))
+
+        words, scores = decay.scoreWords(allocations, {1: 10, 2: 20}, 10)
+
+        self.assertEquals(words.tolist(), [10, 20])
+        self.assertAlmostEquals(scores[0], 100 * math.exp(-1) + 100)
+        self.assertAlmostEquals(scores[1], 100 * math.exp(-0.5))
+
+        # Nothing live.
+        words, scores = decay.scoreWords(decay.loadAllocations([]), {}, 10)
+        self.assertEquals(len(words), 0)
+
+
+    def testLoadAllocations(self):
+
+        '''
+        loadAllocations() should load the open rounds of the passed haiku.
+        '''
+
+        # Create records.
+        user = User.createAdministrator('username', 'password')
+        haiku = Haiku.createHaiku(user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+        other = Haiku.createHaiku(user.id, 'other', 1000, 1, 5, 100, 30, 1000)
+
+        ended = Round.createRound(haiku.id)
+        current = Round.createRound(haiku.id)
+        otherRound = Round.createRound(other.id)
+
+        folded = Allocation(haiku.id, current.id, 4, user.id, 50.0, 500.0)
+        folded.folded = True
+
+        db.session.add_all([folded,
+            Allocation(haiku.id, current.id, 1, user.id, 10.0, 100.0),
+            Allocation(haiku.id, current.id, 2, user.id, 20.0, 200.0),
+            Allocation(haiku.id, ended.id, 1, user.id, 30.0, 300.0),
+            Allocation(other.id, otherRound.id, 3, user.id, 40.0, 400.0)])
+        db.session.commit()
+        ended.endRound()
+
+        allocations = decay.loadAllocations([haiku.id], folded=False)
+
+        self.assertEquals(sorted(allocations.word.tolist()), [1, 2])
+        self.assertEquals(sorted(allocations.amount.tolist()), [10.0, 20.0])
+        self.assertEquals(sorted(allocations.time.tolist()), [100.0, 200.0])
+        self.assertEquals(allocations.haiku.tolist(), [haiku.id] * 2)
+        self.assertEquals(allocations.user.dtype, np.int64)
+
+        # With the folded ones.
+        allocations = decay.loadAllocations([haiku.id])
+        self.assertEquals(sorted(allocations.word.tolist()), [1, 2, 4])
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
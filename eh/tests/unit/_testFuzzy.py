@@ -0,0 +1,155 @@
+'''
+Unit tests for fuzzy matching.
+'''
+
+from eh.lib import syllabary, fuzzy, counting
+import UnitTestCase as u
+import tempfile
+import shutil
+import os
+
+
+class FuzzyIndexUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Compile a small table and index into a temporary directory.
+        '''
+
+        super(FuzzyIndexUnitTest, self).setUp()
+
+        source = {
+            'HAIKU': 2,
+            'HAIKUS': 2,
+            'COMMON': 2,
+            'GLOBE': 1,
+            'GLOB': 1,
+            'SILENCE': 2,
+            'WHETHER': 2 }
+
+        self.dir = tempfile.mkdtemp()
+        tablePath = os.path.join(self.dir, 'table.bin')
+        indexPath = os.path.join(self.dir, 'fuzzy.bin')
+
+        syllabary.build(tablePath, source)
+        self.table = syllabary.load(tablePath)
+        self.index = fuzzy.load(indexPath, self.table)
+
+
+    def tearDown(self):
+
+        '''
+        Unmap the files, remove the directory.
+        '''
+
+        super(FuzzyIndexUnitTest, self).tearDown()
+        self.index.close()
+        self.table.close()
+        shutil.rmtree(self.dir)
+
+
+    def testDistance(self):
+
+        '''
+        distance() should compute Levenshtein distance, capped at limit + 1.
+        '''
+
+        self.assertEquals(fuzzy.distance('HAIKU', 'HAIKU', 2), 0)
+        self.assertEquals(fuzzy.distance('HAIKU', 'HAIKOO', 2), 2)
+        self.assertEquals(fuzzy.distance('COMON', 'COMMON', 2), 1)
+        self.assertEquals(fuzzy.distance('WHAETHER', 'WHETHER', 2), 1)
+        self.assertEquals(fuzzy.distance('GLOBE', 'SILENCE', 2), 3)
+        self.assertEquals(fuzzy.distance('A', 'HAIKUS', 1), 2)
+
+
+    def testExactMatch(self):
+
+        '''
+        Dictionary words should match themselves at distance 0.
+        '''
+
+        self.assertEquals(self.index.match('HAIKU'), [('HAIKU', 0, 2)])
+
+
+    def testNearestMatches(self):
+
+        '''
+        match() should return only the nearest words.
+        '''
+
+        self.assertEquals(self.index.match('SILENSE'), [('SILENCE', 1, 2)])
+        self.assertEquals(self.index.match('WHAETHER'), [('WHETHER', 1, 2)])
+
+        # Two words at distance 1.
+        self.assertEquals(self.index.match('GLOBS'), [
+            ('GLOB', 1, 1),
+            ('GLOBE', 1, 1)])
+
+        # Distance 2.
+        self.assertEquals(self.index.match('HAIKOO'), [
+            ('HAIKU', 2, 2),
+            ('HAIKUS', 2, 2)])
+
+
+    def testLimit(self):
+
+        '''
+        match() should not return words further away than limit.
+        '''
+
+        self.assertEquals(self.index.match('HAIKOO', 1), [])
+        self.assertEquals(self.index.match('ZEBRA'), [])
+
+
+    def testStaleIndex(self):
+
+        '''
+        load() should rebuild an index built for another table.
+        '''
+
+        self.index.close()
+
+        source = { 'HAIKU': 2 }
+        tablePath = os.path.join(self.dir, 'other.bin')
+        syllabary.build(tablePath, source)
+        table = syllabary.load(tablePath)
+
+        self.index = fuzzy.load(os.path.join(self.dir, 'fuzzy.bin'), table)
+        self.assertEquals(self.index.match('HAIKUS'), [('HAIKU', 1, 2)])
+        table.close()
+
+
+
+class CorrectUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Clear the correction cache.
+        '''
+
+        super(CorrectUnitTest, self).setUp()
+        counting.corrections.clear()
+
+
+    def testCorrect(self):
+
+        '''
+        correct() should normalize the word and cache the matches.
+        '''
+
+        self.assertEquals(counting.correct('commmon,'), [('COMMON', 1, 2)])
+
+        counting.correct('Commmon')
+
+        stats = counting.corrections.stats()
+        self.assertEquals(stats['misses'], 1)
+        self.assertEquals(stats['hits'], 1)
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
@@ -0,0 +1,187 @@
+'''
+Unit tests for the greenlet slicing backend.
+'''
+
+from eh.models import User, Haiku
+from eh.helpers import green
+from eh.helpers.green import GreenScheduler
+import UnitTestCase as u
+import threading
+import time
+
+
+@u.unittest.skipIf(green.gevent is None, 'gevent is not installed')
+class GreenSchedulerUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Create haiku and instantiate the scheduler.
+        '''
+
+        super(GreenSchedulerUnitTest, self).setUp()
+
+        # Create admin and haiku.
+        self.user = User.createAdministrator('username', 'password')
+        self.haiku = Haiku.createHaiku(self.user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+        self.haiku2 = Haiku.createHaiku(self.user.id, 'test2', 1000, 1, 5, 100, 30, 1000)
+
+        # Record the calls to the slicer.
+        self.calls = []
+        self.slicer = lambda *ids: self.calls.append(ids)
+
+        self.sched = GreenScheduler()
+
+
+    def tearDown(self):
+
+        '''
+        Shut down the scheduler.
+        '''
+
+        self.sched.shutdown()
+        super(GreenSchedulerUnitTest, self).tearDown()
+
+
+    def testCreateSlicer(self):
+
+        '''
+        createSlicer() should add a slicer for the haiku, once.
+        '''
+
+        slicer = self.sched.createSlicer(self.haiku, self.slicer)
+
+        self.assertTrue(self.sched.checkForSlicer(self.haiku))
+        self.assertIs(self.sched.getJobByHaiku(self.haiku), slicer)
+        self.assertFalse(self.sched.checkForSlicer(self.haiku2))
+        self.assertFalse(self.sched.createSlicer(self.haiku, self.slicer))
+        self.assertEquals(self.sched.getHaikuIds(), set([self.haiku.id]))
+
+
+    def testSlicing(self):
+
+        '''
+        Each slicer should call the routine with its haiku id, every interval.
+        '''
+
+        self.haiku.slicing_interval = 0.1
+        self.haiku2.slicing_interval = 0.1
+
+        # Slicers created before the start run once it starts.
+        self.sched.createSlicer(self.haiku, self.slicer)
+        self.sched.start()
+        self.sched.createSlicer(self.haiku2, self.slicer)
+
+        time.sleep(0.35)
+
+        self.assertTrue(self.calls.count((self.haiku.id,)) >= 2)
+        self.assertTrue(self.calls.count((self.haiku2.id,)) >= 2)
+
+
+    def testOverdue(self):
+
+        '''
+        An overdue slicer should slice straight away, not an interval later.
+        '''
+
+        # Otherwise, the first slice could be up to an hour away.
+        self.haiku.slicing_interval = 3600
+
+        self.sched.start()
+        self.sched.createSlicer(self.haiku, self.slicer, overdue=True)
+
+        time.sleep(0.2)
+        self.assertEquals(self.calls, [(self.haiku.id,)])
+
+
+    def testCatchUp(self):
+
+        '''
+        createSlicers() should catch the overdue haiku up in batches, and
+        start their own slicers an interval later.
+        '''
+
+        haiku3 = Haiku.createHaiku(self.user.id, 'test3', 1000, 1, 5, 100, 30, 1000)
+        haiku = [self.haiku, self.haiku2, haiku3]
+        for h in haiku: h.slicing_interval = 0.5
+
+        self.sched.start()
+        self.sched.createSlicers(haiku, self.slicer,
+                set(h.id for h in haiku), 2)
+
+        time.sleep(0.2)
+        self.assertEquals(sorted(self.calls),
+                [(self.haiku.id, self.haiku2.id), (haiku3.id,)])
+        self.assertEquals([s.runs for s in self.sched.slicers.values()],
+                [0, 0, 0])
+
+
+    def testDeleteSlicer(self):
+
+        '''
+        No slice should start after deleteSlicer() returns.
+        '''
+
+        self.haiku.slicing_interval = 0.05
+        self.sched.start()
+
+        slicer = self.sched.createSlicer(self.haiku, self.slicer)
+        time.sleep(0.2)
+
+        self.sched.deleteSlicer(self.haiku)
+        self.assertTrue(slicer.stopped.is_set())
+        self.assertFalse(self.sched.checkForSlicer(self.haiku))
+
+        count = len(self.calls)
+        time.sleep(0.15)
+        self.assertEquals(len(self.calls), count)
+
+
+    def testDeleteSlicerBlockedInSlice(self):
+
+        '''
+        Stopping a haiku during a slow slice should wait for the slice to
+        finish, so it cannot commit after deleteSlicer() returns.
+        '''
+
+        started = threading.Event()
+        release = threading.Event()
+        finished = []
+
+        def slow(id):
+            started.set()
+            release.wait(5)
+            finished.append(id)
+
+        self.haiku.slicing_interval = 0.01
+
+        self.sched.start()
+        slicer = self.sched.createSlicer(self.haiku, slow)
+        self.assertTrue(started.wait(5))
+
+        threading.Timer(0.2, release.set).start()
+        self.sched.deleteSlicer(self.haiku)
+
+        self.assertEquals(finished, [self.haiku.id])
+        self.assertTrue(slicer.stopped.is_set())
+
+
+    def testShutdown(self):
+
+        '''
+        shutdown() should stop the hub thread and every slicer.
+        '''
+
+        self.sched.start()
+        slicer = self.sched.createSlicer(self.haiku, self.slicer)
+        self.assertTrue(self.sched.running)
+
+        self.sched.shutdown()
+        self.assertFalse(self.sched.running)
+        self.assertTrue(slicer.greenlet.dead)
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
@@ -34,6 +34,8 @@ class UserModelUnitTest(u.UnitTestCase):
         self.assertEqual(haiku.blind_submission_value, 100)
         self.assertEqual(haiku.decay_mean_lifetime, 30 / math.log(2))
         self.assertEqual(haiku.seed_capital, 1000)
+        self.assertFalse(haiku.running)
+        self.assertIsNone(haiku.sliced_on)
         self.assertLess(timeDelta, 0.1)
 
 
@@ -105,6 +107,71 @@ class UserModelUnitTest(u.UnitTestCase):
         self.assertEquals(retrievedHaiku.id, haiku2.id)
 
 
+    def testStartAndStopSlicing(self):
+
+        '''
+        startSlicing() and stopSlicing() should save the running flag.
+        '''
+
+        # Create records.
+        user = User.createAdministrator('username', 'password')
+        haiku = Haiku.createHaiku(user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+
+        id = haiku.id
+
+        # Start.
+        haiku.startSlicing()
+        db.session.remove()
+        retrievedHaiku = Haiku.query.get(id)
+        self.assertTrue(retrievedHaiku.running)
+        self.assertIsNotNone(retrievedHaiku.sliced_on)
+
+        # Stop.
+        retrievedHaiku.stopSlicing()
+        db.session.remove()
+        self.assertFalse(Haiku.query.get(id).running)
+
+
+    def testGetRunningHaiku(self):
+
+        '''
+        getRunningHaiku() should get only the running haiku.
+        '''
+
+        # Create records.
+        user = User.createAdministrator('username', 'password')
+        haiku1 = Haiku.createHaiku(user.id, 'test1', 1000, 1, 5, 100, 30, 1000)
+        haiku2 = Haiku.createHaiku(user.id, 'test2', 1000, 1, 5, 100, 30, 1000)
+
+        # None running.
+        self.assertEquals(Haiku.getRunningHaiku(), [])
+
+        # Start one.
+        haiku2.startSlicing()
+        self.assertEquals([h.id for h in Haiku.getRunningHaiku()], [haiku2.id])
+
+
+    def testGetRunningHaikuInShards(self):
+
+        '''
+        getRunningHaiku() should filter by shard when shards are passed.
+        '''
+
+        # Create records.
+        user = User.createAdministrator('username', 'password')
+        haiku = [Haiku.createHaiku(user.id, 'test' + str(n), 1000, 1, 5, 100, 30, 1000)
+                for n in range(6)]
+
+        for h in haiku:
+            h.startSlicing()
+
+        ids = [h.id for h in Haiku.getRunningHaiku(set([0, 2]), 3)]
+        self.assertEquals(ids, [h.id for h in haiku if h.id % 3 in (0, 2)])
+
+        # No shards, no haiku.
+        self.assertEquals(Haiku.getRunningHaiku(set(), 3), [])
+
+
 
 if __name__ == '__main__':
     u.unittest.main()
@@ -4,8 +4,13 @@ Unit tests for the user model.
 
 from eh import app, db
 from eh.models import User, Haiku
-from eh.helpers.scheduler import HaikuScheduler
+from eh.helpers.scheduler import HaikuScheduler, createScheduler
+from eh.helpers.wheel import WheelScheduler
+from eh.helpers import green
+from eh.helpers.green import GreenScheduler
 import UnitTestCase as u
+import datetime as dt
+import time
 
 
 class HaikuSchedulerUnitTest(u.UnitTestCase):
@@ -28,6 +33,16 @@ class HaikuSchedulerUnitTest(u.UnitTestCase):
         self.sched.start()
 
 
+    def tearDown(self):
+
+        '''
+        Shut down the scheduler.
+        '''
+
+        self.sched.shutdown()
+        super(HaikuSchedulerUnitTest, self).tearDown()
+
+
     def testGetJobName(self):
 
         '''
@@ -38,7 +53,7 @@ class HaikuSchedulerUnitTest(u.UnitTestCase):
         name = self.sched.getJobName(self.haiku)
 
         # Check name construction.
-        self.assertEquals(name, 'username' + str(self.haiku.id))
+        self.assertEquals(name, 'haiku' + str(self.haiku.id))
 
 
     def testGetJobByHaikuWhenJobDoesNotExist(self):
@@ -58,7 +73,7 @@ class HaikuSchedulerUnitTest(u.UnitTestCase):
         '''
 
         # Dummy slicing routine.
-        def testSlicer():
+        def testSlicer(*ids):
             pass
 
         # Add a slicer.
@@ -89,7 +104,7 @@ class HaikuSchedulerUnitTest(u.UnitTestCase):
         '''
 
         # Dummy slicing routine.
-        def testSlicer():
+        def testSlicer(*ids):
             pass
 
         # Add a slicer.
@@ -110,7 +125,7 @@ class HaikuSchedulerUnitTest(u.UnitTestCase):
         '''
 
         # Dummy slicing routine.
-        def testSlicer():
+        def testSlicer(*ids):
             pass
 
         # Add a slicer.
@@ -119,6 +134,14 @@ class HaikuSchedulerUnitTest(u.UnitTestCase):
         # Confirm that the job is stored in the scheduler.
         self.assertIn(slicer, self.sched.get_jobs())
 
+        # The job should pass the haiku id to the slicer.
+        self.assertEquals(slicer.args, [self.haiku.id])
+
+        # Late runs should be coalesced, never run side by side.
+        self.assertTrue(slicer.coalesce)
+        self.assertEquals(slicer.max_instances, 1)
+        self.assertEquals(slicer.misfire_grace_time, self.haiku.slicing_interval)
+
 
     def testCreateSlicerNoDuplicates(self):
 
@@ -128,7 +151,7 @@ class HaikuSchedulerUnitTest(u.UnitTestCase):
         '''
 
         # Dummy slicing routine.
-        def testSlicer():
+        def testSlicer(*ids):
             pass
 
         # Add a slicer.
@@ -156,7 +179,7 @@ class HaikuSchedulerUnitTest(u.UnitTestCase):
         haiku2 = Haiku.createHaiku(self.user.id, 'test2', 1000, 1, 5, 100, 30, 1000)
 
         # Dummy slicing routine.
-        def testSlicer():
+        def testSlicer(*ids):
             pass
 
         # Add two slicers.
@@ -186,6 +209,130 @@ class HaikuSchedulerUnitTest(u.UnitTestCase):
         self.assertFalse(self.sched.checkForSlicer(haiku2))
 
 
+    def testDeleteSlicerById(self):
+
+        '''
+        deleteSlicerById() should delete the slicer for a haiku id.
+        '''
+
+        # Dummy slicing routine.
+        def testSlicer(*ids):
+            pass
+
+        self.sched.createSlicer(self.haiku, testSlicer)
+        self.sched.deleteSlicerById(self.haiku.id)
+        self.assertFalse(self.sched.checkForSlicer(self.haiku))
+
+        # Missing ids are ignored.
+        self.sched.deleteSlicerById(self.haiku.id)
+
+
+    def testGetHaikuIds(self):
+
+        '''
+        getHaikuIds() should get the ids of the haiku with slicers.
+        '''
+
+        # Create a second haiku.
+        haiku2 = Haiku.createHaiku(self.user.id, 'test2', 1000, 1, 5, 100, 30, 1000)
+
+        # Dummy slicing routine.
+        def testSlicer(*ids):
+            pass
+
+        self.assertEquals(self.sched.getHaikuIds(), set())
+
+        self.sched.createSlicer(self.haiku, testSlicer)
+        self.sched.createSlicer(haiku2, testSlicer)
+        self.assertEquals(self.sched.getHaikuIds(), set([self.haiku.id, haiku2.id]))
+
+
+    def testJobIndexOnUnschedule(self):
+
+        '''
+        Unscheduling a job directly should remove it from the index.
+        '''
+
+        # Dummy slicing routine.
+        def testSlicer(*ids):
+            pass
+
+        job = self.sched.createSlicer(self.haiku, testSlicer)
+        self.assertIs(self.sched.getJobByHaiku(self.haiku), job)
+
+        self.sched.unschedule_job(job)
+        self.assertFalse(self.sched.getJobByHaiku(self.haiku))
+        self.assertEquals(self.sched.jobs, {})
+
+
+    def testJobIndexOnCompletion(self):
+
+        '''
+        A job that finishes should be removed from the index.
+        '''
+
+        # Dummy slicing routine.
+        def testSlicer(*ids):
+            pass
+
+        # Add a job that runs once.
+        self.sched.add_date_job(
+            func = testSlicer,
+            name = self.sched.getJobName(self.haiku),
+            date = dt.datetime.now() + dt.timedelta(seconds = 0.2),
+            jobstore = HaikuScheduler.JOBSTORE)
+
+        self.assertTrue(self.sched.checkForSlicer(self.haiku))
+
+        # Wait for it to run.
+        time.sleep(0.5)
+        self.assertFalse(self.sched.checkForSlicer(self.haiku))
+
+
+    def testJobIndexIgnoresOtherJobstores(self):
+
+        '''
+        Jobs in other jobstores should not be indexed.
+        '''
+
+        # Dummy routine.
+        def testJob():
+            pass
+
+        self.sched.add_interval_job(
+            func = testJob,
+            name = self.sched.getJobName(self.haiku),
+            seconds = 1)
+
+        self.assertFalse(self.sched.checkForSlicer(self.haiku))
+
+
+
+class CreateSchedulerUnitTest(u.UnitTestCase):
+
+
+    def testBackends(self):
+
+        '''
+        createScheduler() should instantiate the backend by name.
+        '''
+
+        self.assertIsInstance(createScheduler('apscheduler'), HaikuScheduler)
+        self.assertIsInstance(createScheduler('wheel'), WheelScheduler)
+
+        if green.gevent:
+            self.assertIsInstance(createScheduler('green'), GreenScheduler)
+
+
+    def testUnknownBackend(self):
+
+        '''
+        createScheduler() should reject unknown backends.
+        '''
+
+        self.assertRaises(ValueError, createScheduler, 'cron')
+
+
 
 if __name__ == '__main__':
     u.unittest.main()
@@ -0,0 +1,227 @@
+'''
+Unit tests for sharded slicing with database leases.
+'''
+
+from eh import db
+from eh.models import Lease, Node
+from eh.helpers.lease import LeaseManager
+import UnitTestCase as u
+import multiprocessing
+import datetime as dt
+import time
+
+
+def work(name, rounds, duration, results):
+
+    ''' Heartbeat as a scheduler node, then report the shards held. '''
+
+    db.session.remove()
+    db.engine.dispose()
+
+    leases = LeaseManager(name, 8, duration)
+    for i in range(rounds):
+        leases.heartbeat()
+        time.sleep(0.05)
+
+    results.put((name, sorted(leases.shards)))
+
+
+class LeaseManagerUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Set a fixed time.
+        '''
+
+        super(LeaseManagerUnitTest, self).setUp()
+        self.now = dt.datetime(2012, 1, 1)
+
+
+    def later(self, seconds):
+
+        ''' Get the time some seconds after the start. '''
+
+        return self.now + dt.timedelta(seconds = seconds)
+
+
+    def testClaimAll(self):
+
+        '''
+        A single node should claim every shard.
+        '''
+
+        leases = LeaseManager('a', 8, 30)
+        self.assertEquals(leases.heartbeat(self.now), set(range(8)))
+
+        self.assertTrue(leases.owns(3))
+        self.assertTrue(leases.owns(11))
+        self.assertEquals(Lease.query.count(), 8)
+
+
+    def testSplit(self):
+
+        '''
+        Nodes should split the shards evenly, without overlap.
+        '''
+
+        a = LeaseManager('a', 8, 30)
+        b = LeaseManager('b', 8, 30)
+
+        a.heartbeat(self.now)
+
+        # Nothing is free for b yet, but a gives back the extras.
+        self.assertEquals(b.heartbeat(self.later(1)), set())
+        self.assertEquals(len(a.heartbeat(self.later(2))), 4)
+        self.assertEquals(len(b.heartbeat(self.later(3))), 4)
+
+        self.assertEquals(a.shards & b.shards, set())
+        self.assertEquals(a.shards | b.shards, set(range(8)))
+
+
+    def testTakeover(self):
+
+        '''
+        A node that stops heartbeating should lose its shards to the others
+        once its leases expire.
+        '''
+
+        a = LeaseManager('a', 8, 30)
+        b = LeaseManager('b', 8, 30)
+
+        a.heartbeat(self.now)
+        b.heartbeat(self.later(1))
+        a.heartbeat(self.later(2))
+        b.heartbeat(self.later(3))
+
+        # a dies. Before the leases expire, b keeps its half.
+        self.assertEquals(len(b.heartbeat(self.later(20))), 4)
+
+        # After, b takes them all.
+        self.assertEquals(b.heartbeat(self.later(40)), set(range(8)))
+
+
+    def testRelease(self):
+
+        '''
+        release() should free the shards straight away.
+        '''
+
+        a = LeaseManager('a', 8, 30)
+        b = LeaseManager('b', 8, 30)
+
+        a.heartbeat(self.now)
+        a.release()
+
+        self.assertEquals(a.shards, set())
+        self.assertEquals(Node.query.count(), 0)
+        self.assertEquals(b.heartbeat(self.later(1)), set(range(8)))
+
+
+    def testClaimLease(self):
+
+        '''
+        claimLease() should fail while another node holds the lease.
+        '''
+
+        Lease.createLeases(1)
+        expires = self.later(30)
+
+        self.assertTrue(Lease.claimLease(0, 'a', self.now, expires))
+        self.assertFalse(Lease.claimLease(0, 'b', self.now, expires))
+
+        # The holder can claim it again, and anyone can once it expires.
+        self.assertTrue(Lease.claimLease(0, 'a', self.now, expires))
+        self.assertTrue(Lease.claimLease(0, 'b', self.later(31), self.later(60)))
+
+
+    def testFailedHeartbeat(self):
+
+        '''
+        A node whose heartbeat fails should hold no shards until one
+        succeeds.
+        '''
+
+        leases = LeaseManager('a', 8, 30)
+        leases.heartbeat(self.now)
+
+        def fail(*args):
+            raise RuntimeError('Database gone.')
+
+        renew = Lease.renewLeases
+        Lease.renewLeases = classmethod(fail)
+
+        try: self.assertRaises(RuntimeError, leases.heartbeat, self.later(5))
+        finally: Lease.renewLeases = renew
+
+        self.assertEquals(leases.shards, set())
+        self.assertFalse(leases.owns(3))
+
+        # Its leases are still good, so it gets them back.
+        self.assertEquals(leases.heartbeat(self.later(10)), set(range(8)))
+
+
+    def testFenced(self):
+
+        '''
+        A fenced routine should only get the ids in shards whose lease the
+        node holds in the database.
+        '''
+
+        calls = []
+        leases = LeaseManager('a', 8, 30)
+        fenced = leases.fenced(lambda *ids: calls.append(ids))
+
+        # Nothing held yet.
+        fenced(1, 2)
+        self.assertEquals(calls, [])
+
+        leases.heartbeat()
+        fenced(1, 2)
+        self.assertEquals(calls, [(1, 2)])
+
+        # Shard 1 expires, and b takes it.
+        future = dt.datetime.utcnow() + dt.timedelta(seconds = 60)
+        Lease.claimLease(1, 'b', future, future + dt.timedelta(seconds = 30))
+        db.session.commit()
+
+        fenced(1, 2)
+        self.assertEquals(calls, [(1, 2), (2,)])
+
+        # Equal for the same routine, so batches still group.
+        self.assertEquals(fenced, leases.fenced(fenced.func))
+
+
+    def testProcesses(self):
+
+        '''
+        Scheduler processes sharing the database should split the shards,
+        and take over the shards of processes that die.
+        '''
+
+        results = multiprocessing.Queue()
+
+        def run(names, rounds, duration):
+            workers = [multiprocessing.Process(target=work,
+                args=(name, rounds, duration, results)) for name in names]
+            for w in workers: w.start()
+            for w in workers: w.join()
+            return dict(results.get(timeout=5) for name in names)
+
+        # Three nodes.
+        held = run(['a', 'b', 'c'], 20, 1)
+        shards = sum(held.values(), [])
+        self.assertEquals(sorted(shards), range(8))
+        self.assertTrue(all(len(s) in (2, 3) for s in held.values()))
+
+        # They exit without releasing; two new nodes take over once the
+        # leases expire.
+        held = run(['d', 'e'], 40, 1)
+        self.assertEquals(sorted(held['d'] + held['e']), range(8))
+        self.assertEquals(len(held['d']), 4)
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
@@ -0,0 +1,168 @@
+'''
+Unit tests for the lazy syllable table loader.
+'''
+
+from eh.lib.loader import LazyTable
+import UnitTestCase as u
+import threading
+import os
+
+
+class LazyTableUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Build a load function that blocks until released.
+        '''
+
+        super(LazyTableUnitTest, self).setUp()
+
+        self.release = threading.Event()
+        self.calls = []
+
+        def load():
+            self.calls.append(True)
+            self.release.wait()
+            return { 'HAIKU': 2 }
+
+        self.table = LazyTable(load)
+
+
+    def testLoadsOnFirstLookup(self):
+
+        '''
+        If loading was never started, the first lookup should start it.
+        '''
+
+        self.release.set()
+
+        self.assertFalse(self.table.isLoaded())
+        self.assertEquals(self.table['HAIKU'], 2)
+        self.assertTrue(self.table.isLoaded())
+
+
+    def testLookupBlocksUntilLoaded(self):
+
+        '''
+        Lookups that arrive before loading finishes should wait for it.
+        '''
+
+        self.table.start()
+        self.assertFalse(self.table.isLoaded())
+
+        # Look up on another thread.
+        results = []
+        lookup = threading.Thread(
+                target = lambda: results.append(self.table.get('HAIKU')))
+        lookup.start()
+
+        # Still waiting.
+        lookup.join(0.1)
+        self.assertEquals(results, [])
+
+        # Release the loader.
+        self.release.set()
+        lookup.join()
+        self.assertEquals(results, [2])
+
+
+    def testLoadsOnce(self):
+
+        '''
+        start() should be idempotent, and the table should be loaded once.
+        '''
+
+        self.release.set()
+
+        self.table.start()
+        self.table.start()
+        self.table.wait()
+        self.assertIn('HAIKU', self.table)
+
+        self.assertEquals(len(self.calls), 1)
+
+
+    def testLoadInline(self):
+
+        '''
+        loadInline() should load in the calling thread, once.
+        '''
+
+        self.release.set()
+        threads = threading.active_count()
+
+        self.assertEquals(self.table.loadInline()['HAIKU'], 2)
+        self.assertEquals(threading.active_count(), threads)
+
+        self.table.loadInline()
+        self.table.start()
+        self.assertEquals(len(self.calls), 1)
+
+
+    def testLoadError(self):
+
+        '''
+        Lookups should raise the error raised by the load function.
+        '''
+
+        def load():
+            raise IOError('No table.')
+
+        table = LazyTable(load)
+        self.assertRaises(IOError, lambda: table['HAIKU'])
+        self.assertFalse(table.isLoaded())
+
+
+    def testForkDuringLoad(self):
+
+        '''
+        A child forked while the table is loading should load its own.
+        '''
+
+        self.table.start()
+
+        pid = os.fork()
+
+        # In the child, the loader thread is gone. Release the load function
+        # and look up; exit 0 on success.
+        if pid == 0:
+            status = 1
+            try:
+                self.release.set()
+                if self.table['HAIKU'] == 2: status = 0
+            finally: os._exit(status)
+
+        _, status = os.waitpid(pid, 0)
+        self.assertEquals(status, 0)
+
+        self.release.set()
+        self.assertEquals(self.table['HAIKU'], 2)
+
+
+    def testForkAfterLoad(self):
+
+        '''
+        A child forked after the table loaded should inherit it.
+        '''
+
+        self.release.set()
+        self.table.wait()
+
+        pid = os.fork()
+
+        if pid == 0:
+            status = 1
+            try:
+                if self.table['HAIKU'] == 2 and len(self.calls) == 1:
+                    status = 0
+            finally: os._exit(status)
+
+        _, status = os.waitpid(pid, 0)
+        self.assertEquals(status, 0)
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
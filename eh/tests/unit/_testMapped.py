@@ -0,0 +1,121 @@
+'''
+Unit tests for loading compiled files.
+'''
+
+from eh.lib import mapped
+import UnitTestCase as u
+import tempfile
+import shutil
+import time
+import os
+
+
+class MappedUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Make a temporary directory.
+        '''
+
+        super(MappedUnitTest, self).setUp()
+
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.bin')
+        self.log = os.path.join(self.dir, 'builds.log')
+
+
+    def tearDown(self):
+
+        '''
+        Remove the directory.
+        '''
+
+        super(MappedUnitTest, self).tearDown()
+        shutil.rmtree(self.dir)
+
+
+    def build(self, path):
+
+        '''
+        Slowly write the file, and log the build.
+        '''
+
+        with open(self.log, 'a') as f:
+            f.write('x')
+
+        time.sleep(0.2)
+
+        with open(path, 'w') as f:
+            f.write('compiled')
+
+
+    def open(self, path):
+
+        '''
+        Read the file, as a stand-in for mapping it.
+        '''
+
+        with open(path) as f:
+            contents = f.read()
+
+        if contents != 'compiled': raise ValueError
+        return contents
+
+
+    def testCompilesMissingFile(self):
+
+        '''
+        load() should compile a missing file, then open it.
+        '''
+
+        self.assertEquals(mapped.load(self.path, self.build, self.open),
+                'compiled')
+
+
+    def testCompilesStaleFile(self):
+
+        '''
+        load() should recompile a file that fails to open.
+        '''
+
+        with open(self.path, 'w') as f:
+            f.write('stale')
+
+        self.assertEquals(mapped.load(self.path, self.build, self.open),
+                'compiled')
+
+
+    def testCompilesOnceAcrossProcesses(self):
+
+        '''
+        Processes that load at the same time should compile the file once.
+        '''
+
+        children = []
+
+        for i in range(4):
+
+            pid = os.fork()
+
+            if pid == 0:
+                status = 1
+                try:
+                    mapped.load(self.path, self.build, self.open)
+                    status = 0
+                finally: os._exit(status)
+
+            children.append(pid)
+
+        for pid in children:
+            _, status = os.waitpid(pid, 0)
+            self.assertEquals(status, 0)
+
+        with open(self.log) as f:
+            self.assertEquals(f.read(), 'x')
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
@@ -0,0 +1,281 @@
+'''
+Unit tests for the metrics registry and the scheduler instrumentation.
+'''
+
+from eh.models import User, Haiku
+from eh.helpers import metrics, green
+from eh.helpers.scheduler import HaikuScheduler, createScheduler
+from eh.helpers.wheel import WheelScheduler
+import UnitTestCase as u
+import datetime as dt
+import time
+
+
+class RegistryUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Create a registry.
+        '''
+
+        super(RegistryUnitTest, self).setUp()
+        self.registry = metrics.Registry()
+
+
+    def testCounter(self):
+
+        '''
+        Counters should count per label set.
+        '''
+
+        counter = self.registry.counter('runs_total', 'Runs.')
+        counter.inc()
+        counter.inc(2, haiku=1)
+
+        self.assertEquals(counter.get(), 1)
+        self.assertEquals(counter.get(haiku=1), 2)
+        self.assertEquals(counter.get(haiku=2), 0)
+
+        # Registering again gets the same counter.
+        self.assertIs(self.registry.counter('runs_total', 'Runs.'), counter)
+
+
+    def testGauge(self):
+
+        '''
+        Gauges should go up and down, or read a function.
+        '''
+
+        gauge = self.registry.gauge('active', 'Active.')
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        self.assertEquals(gauge.get(), 1)
+
+        gauge = self.registry.gauge('slicers', 'Slicers.', lambda: 7)
+        self.assertEquals(gauge.get(), 7)
+
+
+    def testHistogram(self):
+
+        '''
+        Histograms should count observations in cumulative buckets.
+        '''
+
+        histogram = self.registry.histogram('lag', 'Lag.', [1, 2])
+        for value in (0.5, 1.5, 1.5, 3):
+            histogram.observe(value)
+
+        self.assertEquals(histogram.get(), {
+            'buckets': [(1, 1), (2, 3), (float('inf'), 4)],
+            'sum': 6.5,
+            'count': 4 })
+
+
+    def testExpose(self):
+
+        '''
+        expose() should use the text exposition format.
+        '''
+
+        self.registry.counter('runs_total', 'Runs.').inc(haiku=1)
+        self.registry.histogram('lag', 'Lag.', [1]).observe(0.5)
+
+        self.assertEquals(self.registry.expose(), '\n'.join([
+            '# HELP runs_total Runs.',
+            '# TYPE runs_total counter',
+            'runs_total{haiku="1"} 1.0',
+            '# HELP lag Lag.',
+            '# TYPE lag histogram',
+            'lag_bucket{le="1.0"} 1.0',
+            'lag_bucket{le="+Inf"} 1.0',
+            'lag_sum 0.5',
+            'lag_count 1.0']) + '\n')
+
+
+    def testExposeLabels(self):
+
+        '''
+        Labels passed to expose() should be added to every sample.
+        '''
+
+        self.registry.counter('runs_total', 'Runs.').inc(haiku=1)
+        self.registry.histogram('lag', 'Lag.', [1]).observe(0.5)
+
+        text = self.registry.expose([('node', 'a')])
+        self.assertIn('runs_total{haiku="1",node="a"} 1.0', text)
+        self.assertIn('lag_bucket{le="1.0",node="a"} 1.0', text)
+        self.assertIn('lag_count{node="a"} 1.0', text)
+
+
+    def testMerge(self):
+
+        '''
+        merge() should keep one HELP and TYPE per metric, followed by the
+        samples of every exposition.
+        '''
+
+        self.registry.counter('runs_total', 'Runs.').inc()
+        self.registry.gauge('active', 'Active.').set(2)
+
+        self.assertEquals(metrics.merge([
+            self.registry.expose([('node', 'a')]),
+            self.registry.expose([('node', 'b')])]), '\n'.join([
+            '# HELP runs_total Runs.',
+            '# TYPE runs_total counter',
+            'runs_total{node="a"} 1.0',
+            'runs_total{node="b"} 1.0',
+            '# HELP active Active.',
+            '# TYPE active gauge',
+            'active{node="a"} 2.0',
+            'active{node="b"} 2.0']) + '\n')
+
+        self.assertEquals(metrics.merge([]), '')
+
+
+    def testEscape(self):
+
+        '''
+        Label values should be escaped.
+        '''
+
+        self.assertEquals(metrics.formatLabels((('a', 'x"y\\'),)),
+                r'{a="x\"y\\"}')
+
+
+
+class SchedulerMetricsUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Create a haiku.
+        '''
+
+        super(SchedulerMetricsUnitTest, self).setUp()
+
+        self.user = User.createAdministrator('username', 'password')
+        self.haiku = Haiku.createHaiku(self.user.id, 'test', 1000, 10, 5, 100, 30, 1000)
+        self.id = self.haiku.id
+
+
+    def testHaikuScheduler(self):
+
+        '''
+        HaikuScheduler should record the lag, duration and misfires of its
+        slicing jobs.
+        '''
+
+        # Not due for an interval, so only the runs below happen.
+        sched = HaikuScheduler(phased=False)
+        sched.start()
+
+        job = sched.createSlicer(self.haiku, lambda id: time.sleep(0.05))
+        m = sched.metrics
+
+        # A run half a second late.
+        sched._run_job(job, [dt.datetime.now() - dt.timedelta(seconds = 0.5)])
+
+        stats = m.getHaiku(self.id)
+        self.assertEquals(stats.runs, 1)
+        self.assertTrue(0.5 <= stats.lag < 0.6)
+        self.assertEquals(stats.calls, 1)
+        self.assertTrue(0.05 <= stats.duration < 0.1)
+
+        self.assertEquals(m.runs.get(), 1)
+        self.assertEquals(m.slicers.get(), 1)
+        self.assertEquals(m.active.get(), 0)
+
+        # A run later than the grace time.
+        sched._run_job(job, [dt.datetime.now() - dt.timedelta(seconds = 60)])
+        self.assertEquals(m.getHaiku(self.id).misfires, 1)
+        self.assertEquals(m.runs.get(), 1)
+
+        # Stopping the haiku drops its totals, but not the aggregates.
+        sched.deleteSlicer(self.haiku)
+        self.assertIsNone(m.getHaiku(self.id))
+        self.assertEquals(m.runs.get(), 1)
+        self.assertEquals(m.slicers.get(), 0)
+
+        sched.shutdown()
+
+
+    def testWheelScheduler(self):
+
+        '''
+        WheelScheduler should record lag, misfires and errors.
+        '''
+
+        def failing(*ids):
+            raise RuntimeError
+
+        sched = WheelScheduler(phased=False)
+        slicer = sched.createSlicer(self.haiku, failing)
+        m = sched.metrics
+
+        # Three intervals late.
+        batch = sched.collect(slicer.due + 30.5)
+
+        wheel = __import__('eh.helpers.wheel', fromlist=['logger'])
+        wheel.logger.disabled = True
+        try: sched.fire(batch)
+        finally: wheel.logger.disabled = False
+
+        stats = m.getHaiku(self.id)
+        self.assertEquals(stats.misfires, 3)
+        self.assertEquals(stats.errors, 1)
+        self.assertEquals(stats.runs, 1)
+        self.assertEquals(m.duration.get()['count'], 1)
+
+
+    def testQueueDepth(self):
+
+        '''
+        The queue depth should read a pool set after the scheduler is made,
+        as runScheduler() does.
+        '''
+
+        class Pool(object):
+            def countQueued(self): return 42
+
+        backends = ['apscheduler', 'wheel']
+        if green.gevent: backends.append('green')
+
+        for backend in backends:
+
+            sched = createScheduler(backend)
+            self.assertEquals(sched.metrics.queued.get(), 0)
+
+            sched.pool = Pool()
+            self.assertEquals(sched.metrics.queued.get(), 42)
+
+
+    def testAggregateExposition(self):
+
+        '''
+        The exposition should only hold the aggregates, however many haiku
+        are sliced; mostLagging() should get the latest ones.
+        '''
+
+        m = metrics.SchedulerMetrics(lambda: 100)
+
+        for id in range(100):
+            m.observeStart(id, id / 10.0)
+            m.observeDuration(0.01, [id])
+            m.observeMisfire(id)
+
+        self.assertNotIn('haiku=', m.expose())
+        self.assertEquals(m.lag.get()['count'], 100)
+        self.assertEquals(m.misfires.get(), 100)
+
+        lagging = m.mostLagging(3)
+        self.assertEquals([id for id, stats in lagging], [99, 98, 97])
+        self.assertEquals(lagging[0][1].lastLag, 9.9)
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
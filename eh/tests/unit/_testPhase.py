@@ -0,0 +1,106 @@
+'''
+Unit tests for slicer phase offsets.
+'''
+
+from eh.models import User, Haiku
+from eh.helpers import phase
+from eh.helpers.scheduler import HaikuScheduler
+from eh.helpers.wheel import WheelScheduler
+import UnitTestCase as u
+import time
+
+
+class PhaseUnitTest(u.UnitTestCase):
+
+
+    def testPhase(self):
+
+        '''
+        phase() should be within the interval, and fixed for an id.
+        '''
+
+        for id in range(1, 100):
+            offset = phase.phase(id, 10)
+            self.assertTrue(0 <= offset < 10)
+            self.assertEquals(offset, phase.phase(id, 10))
+
+
+    def testSpread(self):
+
+        '''
+        Consecutive ids should spread evenly across the interval.
+        '''
+
+        buckets = [0] * 10
+        for id in range(1, 5001):
+            buckets[int(phase.phase(id, 10))] += 1
+
+        self.assertTrue(all(450 < b < 550 for b in buckets))
+
+
+    def testFirstDue(self):
+
+        '''
+        firstDue() should get the next time after now on the phase.
+        '''
+
+        now = 1000000.25
+        due = phase.firstDue(7, 10, now)
+
+        self.assertTrue(now < due <= now + 10)
+        self.assertAlmostEquals(due % 10, phase.phase(7, 10), 4)
+
+        # The same whenever it is asked, within the interval.
+        self.assertAlmostEquals(phase.firstDue(7, 10, now + 0.5), due)
+
+
+
+class PhasedSchedulerUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Create a haiku.
+        '''
+
+        super(PhasedSchedulerUnitTest, self).setUp()
+
+        self.user = User.createAdministrator('username', 'password')
+        self.haiku = Haiku.createHaiku(self.user.id, 'test', 1000, 10, 5, 100, 30, 1000)
+        self.offset = phase.phase(self.haiku.id, 10)
+
+
+    def testHaikuScheduler(self):
+
+        '''
+        HaikuScheduler jobs should start on the haiku's phase.
+        '''
+
+        sched = HaikuScheduler()
+        job = sched.createSlicer(self.haiku, lambda id: None)
+
+        start = time.mktime(job.trigger.start_date.timetuple()) + \
+                job.trigger.start_date.microsecond / 1e6
+
+        self.assertAlmostEquals(start % 10, self.offset, 3)
+
+
+    def testWheelScheduler(self):
+
+        '''
+        WheelScheduler slicers should start on the haiku's phase, unless
+        phasing is off.
+        '''
+
+        slicer = WheelScheduler().createSlicer(self.haiku, lambda *ids: None)
+        self.assertAlmostEquals(slicer.due % 10, self.offset, 4)
+
+        before = time.time()
+        slicer = WheelScheduler(phased=False).createSlicer(self.haiku, lambda *ids: None)
+        self.assertAlmostEquals(slicer.due, before + 10, 1)
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
@@ -0,0 +1,288 @@
+'''
+Unit tests for the slicing process pool.
+'''
+
+from eh import db
+from eh.models import User, Haiku
+from eh.helpers import pool
+from eh.helpers.pool import SlicingPool
+from eh.helpers.metrics import SchedulerMetrics
+from eh.helpers.scheduler import HaikuScheduler
+from eh.helpers.wheel import WheelScheduler
+from sqlalchemy import event
+import UnitTestCase as u
+import multiprocessing
+import signal
+import time
+import os
+
+
+# Results from the workers, inherited across the fork.
+results = multiprocessing.Queue()
+
+
+def record(*ids):
+
+    ''' Report the worker's pid and the ids it was passed. '''
+
+    results.put((os.getpid(), sorted(ids)))
+
+
+def fail(*ids):
+
+    ''' Fail every time. '''
+
+    raise RuntimeError
+
+
+def noop(*ids):
+    pass
+
+
+class SlicingPoolUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Start a pool with two workers.
+        '''
+
+        super(SlicingPoolUnitTest, self).setUp()
+        self.pool = SlicingPool(2).start()
+
+
+    def tearDown(self):
+
+        '''
+        Stop the pool.
+        '''
+
+        self.pool.close()
+        super(SlicingPoolUnitTest, self).tearDown()
+
+
+    def collect(self, n):
+
+        ''' Get n results from the workers. '''
+
+        return sorted(results.get(timeout=5) for i in range(n))
+
+
+    def testPartition(self):
+
+        '''
+        partition() should group ids by id modulo size.
+        '''
+
+        self.assertEquals(pool.partition([1, 2, 3, 4, 5], 2), [[2, 4], [1, 3, 5]])
+        self.assertEquals(pool.partition([3], 3), [[3], [], []])
+
+
+    def testSubmit(self):
+
+        '''
+        submit() should send each partition to its own worker process.
+        '''
+
+        self.pool.submit(record, 1, 2, 3, 4, 5)
+        self.pool.submit(record, 6, 7)
+
+        received = self.collect(4)
+        pids = set(pid for pid, ids in received)
+
+        # Two workers, neither of them this process.
+        self.assertEquals(len(pids), 2)
+        self.assertNotIn(os.getpid(), pids)
+
+        # A haiku always goes to the same worker.
+        byPid = {}
+        for pid, ids in received:
+            byPid.setdefault(pid, set()).update(n % 2 for n in ids)
+        self.assertEquals(sorted(map(sorted, byPid.values())), [[0], [1]])
+
+        self.assertEquals(sorted(sum([ids for pid, ids in received], [])),
+                [1, 2, 3, 4, 5, 6, 7])
+
+
+    def testFailureKeepsWorker(self):
+
+        '''
+        An error in the routine should not stop the worker.
+        '''
+
+        # Restart the workers with the logged traceback silenced.
+        pool.logger.disabled = True
+        self.pool.close()
+        self.pool = SlicingPool(2).start()
+
+        try:
+            self.pool.submit(fail, 1)
+            self.pool.submit(record, 1)
+            self.assertEquals(results.get(timeout=5)[1], [1])
+
+        finally: pool.logger.disabled = False
+
+
+    def testRevive(self):
+
+        '''
+        revive() should replace a dead worker, and its partition should be
+        sliced by the new one.
+        '''
+
+        self.assertEquals(self.pool.revive(), 0)
+
+        # Kill the worker for the even ids.
+        dead = self.pool.workers[0]
+        os.kill(dead.pid, signal.SIGKILL)
+        dead.join()
+
+        pool.logger.disabled = True
+        try: self.assertEquals(self.pool.revive(), 1)
+        finally: pool.logger.disabled = False
+
+        self.assertTrue(self.pool.workers[0].is_alive())
+
+        self.pool.submit(record, 2, 3)
+        received = self.collect(2)
+
+        self.assertIn((self.pool.workers[0].pid, [2]), received)
+        self.assertNotIn(dead.pid, [pid for pid, ids in received])
+
+
+    def testRecord(self):
+
+        '''
+        With metrics, the workers should time each call to the routine, and
+        record() should add the calls and their errors.
+        '''
+
+        # Restart the workers with the metrics, and the traceback silenced.
+        metrics = SchedulerMetrics(lambda: 0)
+        self.assertEquals(self.pool.record(), 0)
+        self.pool.close()
+        self.pool = SlicingPool(2, metrics).start()
+
+        pool.logger.disabled = True
+        try:
+            self.pool.submit(record, 1, 2, 3)
+            self.pool.submit(fail, 4)
+            self.collect(2)
+
+            # Wait for the reports behind the results.
+            deadline = time.time() + 5
+            while metrics.duration.get()['count'] < 3 and \
+                    time.time() < deadline:
+                self.pool.record()
+                time.sleep(0.01)
+
+        finally: pool.logger.disabled = False
+
+        self.assertEquals(metrics.duration.get()['count'], 3)
+        self.assertEquals(metrics.getHaiku(2).calls, 1)
+        self.assertEquals(metrics.getHaiku(4).calls, 1)
+        self.assertEquals(metrics.errors.get(), 1)
+        self.assertEquals(metrics.getHaiku(4).errors, 1)
+
+
+    def testInheritedConnections(self):
+
+        '''
+        A worker should slice on connections of its own, and leave the ones
+        it inherited to the parent, without rolling back or closing them.
+        '''
+
+        # Only for the workers forked here; listeners can't be removed.
+        watching = [True]
+
+        def checkin(connection, record):
+            if watching and os.getpid() != parent:
+                results.put((os.getpid(), 'checkin'))
+
+        parent = os.getpid()
+        event.listen(db.engine.pool, 'checkin', checkin)
+
+        # Hold a connection in this thread's session while forking.
+        db.session.execute('SELECT 1')
+        self.pool.close()
+
+        try:
+            self.pool = SlicingPool(2).start()
+            self.pool.submit(record, 1, 2)
+            received = self.collect(2)
+
+        finally: del watching[:]
+
+        self.assertEquals(sorted(ids for pid, ids in received), [[1], [2]])
+        self.assertTrue(results.empty())
+
+
+    def testDispatch(self):
+
+        '''
+        Calling a dispatcher should submit to the pool. Dispatchers for the
+        same routine should be equal.
+        '''
+
+        self.assertEquals(self.pool.dispatch(record), self.pool.dispatch(record))
+        self.assertNotEquals(self.pool.dispatch(record), self.pool.dispatch(fail))
+
+        self.pool.dispatch(record)(2)
+        self.assertEquals(results.get(timeout=5)[1], [2])
+
+
+
+class SchedulerPoolUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Create a haiku.
+        '''
+
+        super(SchedulerPoolUnitTest, self).setUp()
+
+        self.user = User.createAdministrator('username', 'password')
+        self.haiku = Haiku.createHaiku(self.user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+
+
+    def testHaikuScheduler(self):
+
+        '''
+        HaikuScheduler jobs should dispatch to the pool, and shutdown()
+        should stop the pool.
+        '''
+
+        sched = HaikuScheduler(SlicingPool(1).start())
+        sched.start()
+
+        job = sched.createSlicer(self.haiku, noop)
+        self.assertEquals(job.func, sched.pool.dispatch(noop))
+        self.assertEquals(job.args, [self.haiku.id])
+
+        sched.shutdown()
+        self.assertEquals(sched.pool.workers, [])
+
+
+    def testWheelScheduler(self):
+
+        '''
+        WheelScheduler batches should dispatch to the pool.
+        '''
+
+        sched = WheelScheduler(SlicingPool(1).start())
+
+        slicer = sched.createSlicer(self.haiku, record)
+        self.assertEquals(slicer.func, sched.pool.dispatch(record))
+
+        sched.fire(sched.collect(time.time() + 1))
+        self.assertEquals(results.get(timeout=5)[1], [self.haiku.id])
+
+        sched.shutdown()
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
@@ -0,0 +1,167 @@
+'''
+Unit tests for the reconciliation of running word values.
+'''
+
+from eh import db
+from eh.models import User, Haiku, Word, Round, Allocation
+from eh.helpers import reconcile, slicer
+import UnitTestCase as u
+import time
+
+
+class ReconcileUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Create a haiku, with a half-life of 30s, a round and two words.
+        '''
+
+        super(ReconcileUnitTest, self).setUp()
+
+        user = User.createAdministrator('username', 'password')
+        haiku = Haiku.createHaiku(user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+        round = Round.createRound(haiku.id)
+
+        words = [Word(), Word()]
+        for word in words:
+            word.haiku_id = haiku.id
+            word.round_id = round.id
+
+        db.session.add_all(words)
+        db.session.commit()
+
+        self.userId = user.id
+        self.haikuId = haiku.id
+        self.roundId = round.id
+        self.wordIds = [w.id for w in words]
+
+
+    def allocate(self, wordId, amount, at):
+
+        ''' Apply an allocation. '''
+
+        Allocation.createAllocation(self.haikuId, self.roundId, wordId,
+                self.userId, amount, at)
+
+
+    def drift(self, wordId, value, at):
+
+        ''' Overwrite a word's running value, as drift would. '''
+
+        word = Word.query.get(wordId)
+        word.value = value
+        word.value_at = at
+        db.session.commit()
+
+
+    def testConsistent(self):
+
+        '''
+        Values kept by createAllocation() and the slicer should match the
+        allocations.
+        '''
+
+        now = time.time()
+        self.allocate(self.wordIds[0], 100.0, now - 30)
+        self.allocate(self.wordIds[0], 50.0, now - 10)
+        self.allocate(self.wordIds[1], 10.0, now)
+
+        # Raw, then folded by a slice.
+        db.session.add(Allocation(self.haikuId, self.roundId, self.wordIds[1],
+            self.userId, 20.0, now))
+        db.session.commit()
+        slicer.slice(self.haikuId)
+
+        self.assertEquals(reconcile.reconcile([self.haikuId], now + 60), [])
+
+
+    def testUnfolded(self):
+
+        '''
+        Allocations waiting for a slice should not count as drift.
+        '''
+
+        db.session.add(Allocation(self.haikuId, self.roundId, self.wordIds[0],
+            self.userId, 20.0, time.time()))
+        db.session.commit()
+
+        self.assertEquals(reconcile.reconcile([self.haikuId]), [])
+
+
+    def testRepair(self):
+
+        '''
+        Drifted values should be reported, and reset with repair.
+        '''
+
+        now = time.time()
+        self.allocate(self.wordIds[0], 100.0, now)
+
+        # Lose the running value of one word, and invent the other's.
+        self.drift(self.wordIds[0], 0.0, now)
+        self.drift(self.wordIds[1], 5.0, now)
+
+        mismatches = reconcile.reconcile([self.haikuId], now, repair=False)
+        self.assertEquals(sorted(mismatches), [
+            (self.wordIds[0], 0.0, 100.0),
+            (self.wordIds[1], 5.0, 0.0)])
+
+        # Still drifted, until repaired.
+        self.assertEquals(len(reconcile.reconcile([self.haikuId], now)), 2)
+        self.assertEquals(reconcile.reconcile([self.haikuId], now), [])
+
+
+    def testFoldedAfterNow(self):
+
+        '''
+        A value folded after the time of the check should be left alone,
+        rather than reported and reset.
+        '''
+
+        now = time.time()
+        self.allocate(self.wordIds[0], 50.0, now - 30)
+        self.allocate(self.wordIds[0], 20.0, now + 5)
+
+        value = Word.getValues(self.haikuId, now + 5)[self.wordIds[0]]
+        self.assertEquals(reconcile.reconcile([self.haikuId], now), [])
+
+        db.session.remove()
+        self.assertAlmostEquals(
+                Word.getValues(self.haikuId, now + 5)[self.wordIds[0]], value)
+
+        # Checked at the time it is read, by default.
+        self.allocate(self.wordIds[1], 10.0, time.time())
+        self.assertEquals(reconcile.reconcile([self.haikuId]), [])
+
+
+    def testRepairInterleaved(self):
+
+        '''
+        An allocation folded in between the check and the repair should not
+        be overwritten, but checked again and kept.
+        '''
+
+        now = time.time()
+        self.allocate(self.wordIds[0], 100.0, now)
+
+        self.drift(self.wordIds[0], 0.0, now)
+
+        # Check, allocate, then repair.
+        mismatches = reconcile.reconcileBatch([self.haikuId], now)
+        self.assertEquals([m[:3] for m in mismatches],
+                [(self.wordIds[0], 0.0, 100.0)])
+
+        self.allocate(self.wordIds[0], 50.0, now)
+        self.assertEquals(reconcile.repairBatch(mismatches, now), 0)
+        db.session.remove()
+
+        values = Word.getValues(self.haikuId, now)
+        self.assertAlmostEquals(values[self.wordIds[0]], 150.0)
+        self.assertEquals(reconcile.reconcile([self.haikuId], now), [])
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
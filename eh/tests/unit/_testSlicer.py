@@ -0,0 +1,285 @@
+'''
+Unit tests for the slicing routine.
+'''
+
+from eh import db
+from eh.models import User, Haiku, Word, Round, Allocation
+from eh.helpers import slicer
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import UnitTestCase as u
+import datetime as dt
+import time
+
+
+# Raw statements to run straight before the next UPDATE of words.
+interleaved = []
+
+def interleave(conn, cursor, statement, parameters, context, many):
+    if interleaved and statement.startswith('UPDATE words'):
+        cursor.execute(*interleaved.pop())
+
+event.listen(Engine, 'before_cursor_execute', interleave)
+
+
+class SlicerUnitTest(u.UnitTestCase):
+
+
+    def testRecordsSlice(self):
+
+        '''
+        slice() should set sliced_on for the passed haiku only.
+        '''
+
+        # Create records.
+        user = User.createAdministrator('username', 'password')
+        haiku1 = Haiku.createHaiku(user.id, 'test1', 1000, 1, 5, 100, 30, 1000)
+        haiku2 = Haiku.createHaiku(user.id, 'test2', 1000, 1, 5, 100, 30, 1000)
+        haiku3 = Haiku.createHaiku(user.id, 'test3', 1000, 1, 5, 100, 30, 1000)
+
+        ids = [haiku1.id, haiku2.id, haiku3.id]
+
+        slicer.slice(ids[0], ids[2])
+        db.session.remove()
+
+        self.assertIsNotNone(Haiku.query.get(ids[0]).sliced_on)
+        self.assertIsNone(Haiku.query.get(ids[1]).sliced_on)
+        self.assertIsNotNone(Haiku.query.get(ids[2]).sliced_on)
+
+
+    def addWord(self, haiku, value):
+
+        ''' Add a word with a value to a haiku. '''
+
+        word = Word()
+        word.haiku_id = haiku.id
+        word.value = value
+        db.session.add(word)
+        db.session.commit()
+
+        return word.id
+
+
+    def allocate(self, haiku, roundId, wordId, amount, ago):
+
+        ''' Allocate points to a word some seconds ago. '''
+
+        db.session.add(Allocation(haiku.id, roundId, wordId, haiku.created_by,
+            amount, time.time() - ago))
+        db.session.commit()
+
+
+    def testCatchUp(self):
+
+        '''
+        After a stall, one slice should apply all the missed decay.
+        '''
+
+        # Create records, mean lifetime 30 / ln 2.
+        user = User.createAdministrator('username', 'password')
+        haiku = Haiku.createHaiku(user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+        other = Haiku.createHaiku(user.id, 'other', 1000, 1, 5, 100, 30, 1000)
+
+        wordId = self.addWord(haiku, 0.0)
+        otherId = self.addWord(other, 100.0)
+        haikuId = haiku.id
+
+        # Allocated a half-life ago, and never sliced since.
+        self.allocate(haiku, Round.createRound(haiku.id).id, wordId, 100.0, 30)
+        self.allocate(other, Round.createRound(other.id).id, otherId, 100.0, 30)
+
+        slicer.slice(haikuId)
+        db.session.remove()
+
+        self.assertAlmostEquals(Word.query.get(wordId).value, 50.0, delta=0.1)
+        self.assertEquals(Word.query.get(otherId).value, 100.0)
+
+        # Slicing straight away decays ~nothing more.
+        slicer.slice(haikuId)
+        db.session.remove()
+
+        self.assertAlmostEquals(Word.query.get(wordId).value, 50.0, delta=0.1)
+
+
+    def testSum(self):
+
+        '''
+        A word's value should be the sum of its decayed allocations in open
+        rounds.
+        '''
+
+        # Create records, mean lifetime 30 / ln 2.
+        user = User.createAdministrator('username', 'password')
+        haiku = Haiku.createHaiku(user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+        wordId = self.addWord(haiku, 0.0)
+        haikuId = haiku.id
+
+        ended = Round.createRound(haiku.id)
+        current = Round.createRound(haiku.id)
+
+        self.allocate(haiku, current.id, wordId, 100.0, 0)
+        self.allocate(haiku, current.id, wordId, 100.0, 30)
+        self.allocate(haiku, ended.id, wordId, 100.0, 0)
+        ended.endRound()
+
+        slicer.slice(haikuId)
+        db.session.remove()
+
+        self.assertAlmostEquals(Word.query.get(wordId).value, 150.0, delta=0.1)
+
+
+    def testLazy(self):
+
+        '''
+        Slicing should fold each allocation in once, and leave the rest of
+        the decay to reads.
+        '''
+
+        # Create records, mean lifetime 30 / ln 2.
+        user = User.createAdministrator('username', 'password')
+        haiku = Haiku.createHaiku(user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+        roundId = Round.createRound(haiku.id).id
+        wordId = self.addWord(haiku, 0.0)
+        haikuId = haiku.id
+
+        self.allocate(haiku, roundId, wordId, 100.0, 0)
+        slicer.slice(haikuId)
+        db.session.remove()
+
+        # Folded, and not written again by a slice with nothing new.
+        word = Word.query.get(wordId)
+        valueAt = word.value_at
+        self.assertAlmostEquals(word.value, 100.0, delta=0.1)
+        self.assertTrue(Allocation.query.first().folded)
+
+        slicer.slice(haikuId)
+        db.session.remove()
+
+        self.assertEquals(Word.query.get(wordId).value_at, valueAt)
+
+        # Decayed on read.
+        values = Word.getValues(haikuId, valueAt + 30)
+        self.assertAlmostEquals(values[wordId], 50.0, delta=0.1)
+
+        # A new allocation adds to the decayed value.
+        haiku = Haiku.query.get(haikuId)
+        self.allocate(haiku, roundId, wordId, 100.0, 0)
+        slicer.slice(haikuId)
+        db.session.remove()
+
+        values = Word.getValues(haikuId, valueAt + 30)
+        self.assertAlmostEquals(values[wordId], 100.0, delta=0.2)
+
+
+    def testNeverSliced(self):
+
+        '''
+        A haiku with no previous slice should be marked, not decayed.
+        '''
+
+        # Create records.
+        user = User.createAdministrator('username', 'password')
+        haiku = Haiku.createHaiku(user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+        wordId = self.addWord(haiku, 100.0)
+        haikuId = haiku.id
+
+        slicer.slice(haikuId)
+        db.session.remove()
+
+        self.assertEquals(Word.query.get(wordId).value, 100.0)
+        self.assertIsNotNone(Haiku.query.get(haikuId).sliced_on)
+
+
+    def testBulkSlice(self):
+
+        '''
+        bulkSlice() should fold the same values as slice(), once each, and
+        leave out ended rounds and other haiku.
+        '''
+
+        # Create records, mean lifetime 30 / ln 2.
+        user = User.createAdministrator('username', 'password')
+        haiku = Haiku.createHaiku(user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+        other = Haiku.createHaiku(user.id, 'other', 1000, 1, 5, 100, 30, 1000)
+
+        endedId = Round.createRound(haiku.id).id
+        currentId = Round.createRound(haiku.id).id
+        otherRoundId = Round.createRound(other.id).id
+
+        wordIds = [self.addWord(haiku, 0.0), self.addWord(haiku, 0.0)]
+        otherId = self.addWord(other, 0.0)
+        haikuId = haiku.id
+
+        self.allocate(haiku, currentId, wordIds[0], 100.0, 0)
+        self.allocate(haiku, currentId, wordIds[0], 100.0, 30)
+        self.allocate(haiku, currentId, wordIds[1], 100.0, 60)
+        self.allocate(haiku, currentId, wordIds[1], 100.0, -60)
+        self.allocate(haiku, endedId, wordIds[1], 100.0, 0)
+        self.allocate(other, otherRoundId, otherId, 100.0, 0)
+        Round.query.get(endedId).endRound()
+
+        slicer.bulkSlice(haikuId)
+        db.session.remove()
+
+        self.assertAlmostEquals(Word.query.get(wordIds[0]).value, 150.0,
+                delta=0.1)
+        self.assertAlmostEquals(Word.query.get(wordIds[1]).value, 125.0,
+                delta=0.1)
+        self.assertEquals(Word.query.get(otherId).value, 0.0)
+        self.assertEquals(Allocation.query.filter_by(folded=True).count(), 4)
+        self.assertIsNotNone(Haiku.query.get(haikuId).sliced_on)
+
+        # Nothing new, nothing written.
+        valueAt = Word.query.get(wordIds[0]).value_at
+        slicer.bulkSlice(haikuId)
+        db.session.remove()
+
+        self.assertEquals(Word.query.get(wordIds[0]).value_at, valueAt)
+
+        # A new allocation adds to the decayed value, as with slice().
+        haiku = Haiku.query.get(haikuId)
+        self.allocate(haiku, currentId, wordIds[0], 100.0, 0)
+        slicer.bulkSlice(haikuId)
+        db.session.remove()
+
+        values = Word.getValues(haikuId, valueAt + 30)
+        self.assertAlmostEquals(values[wordIds[0]], 125.0, delta=0.2)
+
+    def testBulkSliceInterleaved(self):
+
+        '''
+        An allocation that arrives between bulkSlice()'s two statements, as
+        one committed by another transaction could, should be left pending
+        for the next slice, not marked folded without being added.
+        '''
+
+        user = User.createAdministrator('username', 'password')
+        haiku = Haiku.createHaiku(user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+        roundId = Round.createRound(haiku.id).id
+        wordId = self.addWord(haiku, 0.0)
+        haikuId = haiku.id
+
+        self.allocate(haiku, roundId, wordId, 100.0, 0)
+
+        # Add another, straight before the words are updated.
+        interleaved.append(('INSERT INTO allocations (haiku_id, round_id, '
+            'word_id, user_id, amount, allocated_at, folded) VALUES '
+            '(?, ?, ?, ?, 50.0, ?, 0)',
+            (haikuId, roundId, wordId, user.id, time.time())))
+
+        slicer.bulkSlice(haikuId)
+        db.session.remove()
+
+        self.assertAlmostEquals(Word.query.get(wordId).value, 100.0, delta=0.1)
+        self.assertEquals(Allocation.query.filter_by(folded=False).count(), 1)
+
+        slicer.bulkSlice(haikuId)
+        db.session.remove()
+
+        self.assertAlmostEquals(Word.query.get(wordId).value, 150.0, delta=0.1)
+        self.assertEquals(Allocation.query.filter_by(folded=False).count(), 0)
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
@@ -0,0 +1,67 @@
+'''
+Unit tests for the metrics published by the slicing processes.
+'''
+
+from eh.models import Snapshot
+from eh.helpers import metrics, snapshots
+import UnitTestCase as u
+import datetime as dt
+
+
+class SnapshotsUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Create a registry with a counter.
+        '''
+
+        super(SnapshotsUnitTest, self).setUp()
+
+        self.registry = metrics.Registry()
+        self.runs = self.registry.counter('runs_total', 'Runs.')
+        self.now = dt.datetime.utcnow()
+
+
+    def testPublish(self):
+
+        '''
+        publish() should replace a node's metrics, labelled by node.
+        '''
+
+        snapshots.publish('a', self.registry, self.now)
+        self.runs.inc()
+        snapshots.publish('a', self.registry, self.now)
+
+        self.assertEquals(Snapshot.query.count(), 1)
+        self.assertEquals(Snapshot.query.get('a').text, '\n'.join([
+            '# HELP runs_total Runs.',
+            '# TYPE runs_total counter',
+            'runs_total{node="a"} 1.0']) + '\n')
+
+
+    def testCollect(self):
+
+        '''
+        collect() should merge the recent snapshots and the texts passed,
+        and leave out the nodes that stopped publishing.
+        '''
+
+        self.runs.inc()
+        stale = self.now - dt.timedelta(seconds = snapshots.STALE + 1)
+
+        snapshots.publish('a', self.registry, self.now)
+        snapshots.publish('b', self.registry, stale)
+        local = snapshots.label('c', self.registry)
+
+        self.assertEquals(snapshots.collect([local], self.now), '\n'.join([
+            '# HELP runs_total Runs.',
+            '# TYPE runs_total counter',
+            'runs_total{node="a"} 1.0',
+            'runs_total{node="c"} 1.0']) + '\n')
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
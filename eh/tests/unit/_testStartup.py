@@ -0,0 +1,87 @@
+'''
+Startup time regression tests.
+'''
+
+from eh.helpers import startup
+import UnitTestCase as u
+import subprocess
+import sys
+
+
+class StartupUnitTest(u.UnitTestCase):
+
+
+    def testImportBudget(self):
+
+        '''
+        A cold import of the package should fit in the budget.
+        '''
+
+        total, modules = startup.profile('eh')
+
+        self.assertIn('eh', modules)
+        self.assertLess(total, startup.BUDGET,
+                'Importing eh took %.2fs, budget is %.2fs.\n\n%s' %
+                (total, startup.BUDGET, startup.report('eh', 'self', 15)))
+
+
+    def testImportStartsNoThreads(self):
+
+        '''
+        Importing the package should not start the scheduler or any thread.
+        '''
+
+        output = subprocess.check_output([sys.executable, '-c',
+            'import threading, eh; '
+            'print threading.active_count(), bool(eh.sched.running)'],
+            cwd = startup.ROOT)
+
+        self.assertEquals(output.split(), ['1', 'False'])
+
+
+    def testCreateAppStartsNoThreads(self):
+
+        '''
+        Configuring a web worker should not start any thread either.
+        '''
+
+        output = subprocess.check_output([sys.executable, '-c',
+            'import threading, eh; eh.createApp(); '
+            'print threading.active_count()'],
+            cwd = startup.ROOT)
+
+        self.assertEquals(output.split(), ['1'])
+
+
+    def testProfileAttribution(self):
+
+        '''
+        Modules should be timed, with self time within cumulative time.
+        '''
+
+        total, modules = startup.profile('eh.lib.cache')
+
+        self.assertIn('eh.lib.cache', modules)
+        for name, (own, cumulative) in modules.items():
+            self.assertLessEqual(own, cumulative + 1e-6)
+            self.assertLessEqual(cumulative, total + 1e-6)
+
+
+    def testPackages(self):
+
+        '''
+        packages() should sum self times by top-level package.
+        '''
+
+        totals = startup.packages({
+            'eh': [0.1, 0.5],
+            'eh.lib': [0.2, 0.3],
+            'flask': [0.4, 0.4] })
+
+        self.assertAlmostEqual(totals['eh'], 0.3)
+        self.assertAlmostEqual(totals['flask'], 0.4)
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
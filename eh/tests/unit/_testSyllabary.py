@@ -0,0 +1,177 @@
+'''
+Unit tests for the compiled syllable table.
+'''
+
+from eh.lib import syllabary
+import UnitTestCase as u
+import tempfile
+import shutil
+import os
+
+
+class SyllabaryUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Compile a small table into a temporary directory.
+        '''
+
+        super(SyllabaryUnitTest, self).setUp()
+
+        self.source = {
+            'HAIKU': 2,
+            'AIR': 1,
+            'COMMON': 2,
+            'GLOBE': 1,
+            "GLOBE'S": 1,
+            'BATHES': 1,
+            'THE': 1 }
+
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.bin')
+        syllabary.build(self.path, self.source)
+        self.table = syllabary.load(self.path)
+
+
+    def tearDown(self):
+
+        '''
+        Unmap the table, remove the directory.
+        '''
+
+        super(SyllabaryUnitTest, self).tearDown()
+        self.table.close()
+        shutil.rmtree(self.dir)
+
+
+    def testLookup(self):
+
+        '''
+        [], get(), and in should match the source dictionary.
+        '''
+
+        for word, count in self.source.items():
+            self.assertEquals(self.table[word], count)
+            self.assertEquals(self.table.get(word), count)
+            self.assertIn(word, self.table)
+
+        # Unicode keys should work.
+        self.assertEquals(self.table[u'HAIKU'], 2)
+
+
+    def testMissingWord(self):
+
+        '''
+        Missing words should raise KeyError, or return the get() default.
+        '''
+
+        self.assertRaises(KeyError, lambda: self.table['ZEBRA'])
+        self.assertIsNone(self.table.get('ZEBRA'))
+        self.assertEquals(self.table.get('ZEBRA', 0), 0)
+        self.assertNotIn('ZEBRA', self.table)
+        self.assertNotIn('', self.table)
+
+
+    def testIteration(self):
+
+        '''
+        The table should iterate over the words in sorted order.
+        '''
+
+        self.assertEquals(len(self.table), len(self.source))
+        self.assertEquals(self.table.keys(), sorted(self.source))
+
+
+    def testWithCount(self):
+
+        '''
+        withCount() should return the ids of the words with a given count.
+        '''
+
+        words = [self.table.word(i) for i in self.table.withCount(2)]
+        self.assertEquals(words, ['COMMON', 'HAIKU'])
+
+        # Counts outside the table have no words.
+        self.assertEquals(len(self.table.withCount(0)), 0)
+        self.assertEquals(len(self.table.withCount(99)), 0)
+
+
+    def testCandidates(self):
+
+        '''
+        candidates() should filter by count and prefix, in word order.
+        '''
+
+        self.assertEquals(self.table.candidates(1, 'GLO'), [
+            ('GLOBE', 1),
+            ("GLOBE'S", 1)])
+
+        self.assertEquals(self.table.candidates(2, 'H'), [('HAIKU', 2)])
+        self.assertEquals(self.table.candidates(1, 'H'), [])
+
+        # Minimum count.
+        self.assertEquals(self.table.candidates(2, minimum=2), [
+            ('COMMON', 2),
+            ('HAIKU', 2)])
+
+
+    def testCandidatesPaging(self):
+
+        '''
+        candidates() should page through the matches.
+        '''
+
+        words = [w for w, c in self.table.candidates(2, limit=100)]
+        self.assertEquals(words, sorted(self.source))
+
+        pages = [self.table.candidates(2, offset=o, limit=3) for o in (0, 3, 6)]
+        self.assertEquals([w for p in pages for w, c in p], words)
+
+
+    def testLoadRebuildsStaleTable(self):
+
+        '''
+        load() should recompile a table written in another format.
+        '''
+
+        path = os.path.join(self.dir, 'stale.bin')
+        with open(path, 'wb') as f:
+            f.write(syllabary.HEADER.pack(syllabary.MAGIC, 0, 0, 0))
+
+        table = syllabary.load(path)
+        self.assertEquals(table['HAIKU'], 2)
+        table.close()
+
+
+    def testLoadCompilesMissingTable(self):
+
+        '''
+        load() should compile the table when the file does not exist.
+        '''
+
+        path = os.path.join(self.dir, 'missing.bin')
+        table = syllabary.load(path)
+
+        self.assertTrue(os.path.exists(path))
+        self.assertEquals(table['HAIKU'], 2)
+        table.close()
+
+
+    def testBadFile(self):
+
+        '''
+        Mapping a file that is not a table should raise ValueError.
+        '''
+
+        path = os.path.join(self.dir, 'bad.bin')
+        with open(path, 'wb') as f:
+            f.write('x' * 64)
+
+        self.assertRaises(ValueError, syllabary.SyllableTable, path)
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
@@ -0,0 +1,217 @@
+'''
+Unit tests for synchronizing the scheduler with the running haiku.
+'''
+
+from eh import db
+from eh.models import User, Haiku
+from eh.helpers import sync
+from eh.helpers.wheel import WheelScheduler
+from eh.helpers.scheduler import HaikuScheduler
+from eh.helpers.lease import LeaseManager
+from eh.helpers.clock import VirtualClock
+import UnitTestCase as u
+import datetime as dt
+
+
+class SynchronizeUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Create haiku and a scheduler, as after a restart.
+        '''
+
+        super(SynchronizeUnitTest, self).setUp()
+
+        # Create admin and haiku.
+        self.user = User.createAdministrator('username', 'password')
+        self.haiku = [
+            Haiku.createHaiku(self.user.id, 'test' + str(n), 1000, 10, 5, 100, 30, 1000)
+            for n in range(5)]
+
+        # Record the calls to the slicer.
+        self.calls = []
+        self.slicer = lambda *ids: self.calls.append(sorted(ids))
+
+        # The driver is not started, so nothing reaches the slicer.
+        self.sched = WheelScheduler()
+
+
+    def testRestoresRunningHaiku(self):
+
+        '''
+        synchronize() should start slicers for the running haiku.
+        '''
+
+        for haiku in self.haiku[:3]:
+            haiku.startSlicing()
+
+        started, stopped = sync.synchronize(self.sched, self.slicer)
+
+        ids = [h.id for h in self.haiku[:3]]
+        self.assertEquals(started, ids)
+        self.assertEquals(stopped, [])
+        self.assertEquals(self.sched.getHaikuIds(), set(ids))
+
+        # Nothing to do the second time.
+        self.assertEquals(sync.synchronize(self.sched, self.slicer), ([], []))
+
+
+    def testStopsHaiku(self):
+
+        '''
+        synchronize() should stop the slicers of haiku that are not running.
+        '''
+
+        for haiku in self.haiku:
+            haiku.startSlicing()
+
+        sync.synchronize(self.sched, self.slicer)
+
+        self.haiku[1].stopSlicing()
+        Haiku.deleteHaiku(self.haiku[2].id)
+
+        started, stopped = sync.synchronize(self.sched, self.slicer)
+
+        self.assertEquals(started, [])
+        self.assertEquals(stopped, [self.haiku[1].id, self.haiku[2].id])
+        self.assertFalse(self.sched.checkForSlicer(self.haiku[1]))
+
+
+    def testLeases(self):
+
+        '''
+        With leases, synchronize() should only slice the haiku in the shards
+        held, and stop the slicers of shards lost.
+        '''
+
+        for haiku in self.haiku:
+            haiku.startSlicing()
+
+        leases = LeaseManager('a', 2, 30)
+        leases.shards = set([0])
+
+        started, stopped = sync.synchronize(self.sched, self.slicer, leases)
+        self.assertEquals(started, [h.id for h in self.haiku if h.id % 2 == 0])
+
+        # Shard 0 moves to another node.
+        leases.shards = set([1])
+
+        started, stopped = sync.synchronize(self.sched, self.slicer, leases)
+        self.assertEquals(started, [h.id for h in self.haiku if h.id % 2 == 1])
+        self.assertEquals(stopped, [h.id for h in self.haiku if h.id % 2 == 0])
+
+
+    def testFence(self):
+
+        '''
+        fence() should stop the slicers of the shards the node no longer
+        holds, without the database.
+        '''
+
+        for haiku in self.haiku:
+            haiku.startSlicing()
+
+        leases = LeaseManager('a', 2, 30)
+        leases.shards = set([0, 1])
+        sync.synchronize(self.sched, self.slicer, leases)
+
+        # The slices check the lease.
+        slicer = self.sched.getJobByHaiku(self.haiku[0])
+        self.assertEquals(slicer.func, leases.fenced(self.slicer))
+
+        # The heartbeat lost shard 1.
+        leases.shards = set([0])
+        stopped = sync.fence(self.sched, leases)
+
+        self.assertEquals(stopped, [h.id for h in self.haiku if h.id % 2 == 1])
+        self.assertEquals(self.sched.getHaikuIds(),
+                set(h.id for h in self.haiku if h.id % 2 == 0))
+
+
+    def testCatchUp(self):
+
+        '''
+        Haiku that missed slices should be caught up by the scheduler, not
+        in the calling thread.
+        '''
+
+        for haiku in self.haiku:
+            haiku.startSlicing()
+
+        # Four haiku missed slices while the process was down.
+        for haiku in self.haiku[1:]:
+            haiku.sliced_on = dt.datetime.now() - dt.timedelta(seconds = 60)
+        db.session.commit()
+
+        sched = WheelScheduler(clock = VirtualClock())
+        sync.synchronize(sched, self.slicer)
+        self.assertEquals(self.calls, [])
+
+        # Due at once, in one batch.
+        sched.start()
+        sched.advance(0)
+
+        self.assertEquals(self.calls, [[h.id for h in self.haiku[1:]]])
+
+
+    def testCatchUpBatches(self):
+
+        '''
+        With a scheduler that runs a job per haiku, the overdue haiku should
+        be caught up in batches of CATCHUP_BATCH, not one by one, and their
+        own jobs should not run until an interval later.
+        '''
+
+        for haiku in self.haiku:
+            haiku.startSlicing()
+
+        for haiku in self.haiku[1:]:
+            haiku.sliced_on = dt.datetime.now() - dt.timedelta(seconds = 60)
+        db.session.commit()
+
+        overdue = [h.id for h in self.haiku[1:]]
+        calls = lambda: [c for c in self.calls if self.haiku[0].id not in c]
+
+        sched = HaikuScheduler(clock = VirtualClock())
+        batch, sync.CATCHUP_BATCH = sync.CATCHUP_BATCH, 3
+
+        try: sync.synchronize(sched, self.slicer)
+        finally: sync.CATCHUP_BATCH = batch
+
+        sched.start()
+        sched.advance(0)
+        self.assertEquals(calls(), [overdue[:3], overdue[3:]])
+
+        # Then each on its own schedule, from an interval on.
+        sched.advance(9.9)
+        self.assertEquals(len(calls()), 2)
+
+        sched.advance(10)
+        self.assertEquals(sorted(calls()[2:]), [[id] for id in overdue])
+
+
+    def testIsOverdue(self):
+
+        '''
+        isOverdue() should compare the time since the last slice with the
+        slicing interval.
+        '''
+
+        now = dt.datetime.now()
+        haiku = self.haiku[0]
+
+        haiku.sliced_on = None
+        self.assertTrue(sync.isOverdue(haiku, now))
+
+        haiku.sliced_on = now - dt.timedelta(seconds = 5)
+        self.assertFalse(sync.isOverdue(haiku, now))
+
+        haiku.sliced_on = now - dt.timedelta(seconds = 10)
+        self.assertTrue(sync.isOverdue(haiku, now))
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
@@ -0,0 +1,110 @@
+'''
+Unit tests for the compiled prefix trie.
+'''
+
+from eh.lib import trie
+import UnitTestCase as u
+import tempfile
+import shutil
+import os
+
+
+class TrieUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Compile a small trie into a temporary directory.
+        '''
+
+        super(TrieUnitTest, self).setUp()
+
+        self.source = {
+            'HAIKU': 2,
+            'HAIKUS': 2,
+            'HAIL': 1,
+            'HAILSTORM': 2,
+            'HALLELUJAH': 4,
+            'AIR': 1,
+            'AIRY': 2 }
+
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.bin')
+        trie.build(self.path, self.source)
+        self.trie = trie.load(self.path)
+
+
+    def tearDown(self):
+
+        '''
+        Unmap the trie, remove the directory.
+        '''
+
+        super(TrieUnitTest, self).tearDown()
+        self.trie.close()
+        shutil.rmtree(self.dir)
+
+
+    def testContains(self):
+
+        '''
+        in should match whole words, not prefixes.
+        '''
+
+        for word in self.source:
+            self.assertIn(word, self.trie)
+
+        self.assertNotIn('HAI', self.trie)
+        self.assertNotIn('HAIKUSS', self.trie)
+        self.assertNotIn('', self.trie)
+
+
+    def testComplete(self):
+
+        '''
+        complete() should return the words under a prefix, in word order.
+        '''
+
+        self.assertEquals(self.trie.complete('HAI'), [
+            ('HAIKU', 2),
+            ('HAIKUS', 2),
+            ('HAIL', 1),
+            ('HAILSTORM', 2)])
+
+        # The prefix itself, if it is a word.
+        self.assertEquals(self.trie.complete('AIR'), [
+            ('AIR', 1),
+            ('AIRY', 2)])
+
+        # Unknown prefix.
+        self.assertEquals(self.trie.complete('ZE'), [])
+
+
+    def testCompleteLimit(self):
+
+        '''
+        complete() should stop after limit words.
+        '''
+
+        self.assertEquals(self.trie.complete('H', limit=2), [
+            ('HAIKU', 2),
+            ('HAIKUS', 2)])
+
+
+    def testCompleteMaxSyllables(self):
+
+        '''
+        complete() should skip words with too many syllables.
+        '''
+
+        self.assertEquals(self.trie.complete('H', maxSyllables=1), [
+            ('HAIL', 1)])
+
+        self.assertEquals(len(self.trie.complete('', maxSyllables=2)), 6)
+        self.assertEquals(self.trie.complete('HAL', maxSyllables=3), [])
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
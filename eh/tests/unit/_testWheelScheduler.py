@@ -0,0 +1,198 @@
+'''
+Unit tests for the batching slicing driver.
+'''
+
+from eh.models import User, Haiku
+from eh.helpers import wheel
+from eh.helpers.wheel import WheelScheduler
+import UnitTestCase as u
+import time
+
+
+class WheelSchedulerUnitTest(u.UnitTestCase):
+
+
+    def setUp(self):
+
+        '''
+        Create haiku and instantiate the scheduler.
+        '''
+
+        super(WheelSchedulerUnitTest, self).setUp()
+
+        # Create admin and haiku.
+        self.user = User.createAdministrator('username', 'password')
+        self.haiku = Haiku.createHaiku(self.user.id, 'test', 1000, 1, 5, 100, 30, 1000)
+        self.haiku2 = Haiku.createHaiku(self.user.id, 'test2', 1000, 1, 5, 100, 30, 1000)
+
+        # Record the batches passed to the slicer.
+        self.batches = []
+        self.slicer = lambda *ids: self.batches.append(sorted(ids))
+
+        # In step, so haiku with the same interval share every wakeup.
+        self.sched = WheelScheduler(phased=False)
+
+
+    def tearDown(self):
+
+        '''
+        Shut down the scheduler.
+        '''
+
+        self.sched.shutdown()
+        super(WheelSchedulerUnitTest, self).tearDown()
+
+
+    def testCreateSlicer(self):
+
+        '''
+        createSlicer() should add a slicer for the haiku.
+        '''
+
+        slicer = self.sched.createSlicer(self.haiku, self.slicer)
+
+        self.assertTrue(self.sched.checkForSlicer(self.haiku))
+        self.assertIs(self.sched.getJobByHaiku(self.haiku), slicer)
+        self.assertFalse(self.sched.checkForSlicer(self.haiku2))
+
+
+    def testCreateSlicerNoDuplicates(self):
+
+        '''
+        createSlicer() should not replace an existing slicer.
+        '''
+
+        slicer = self.sched.createSlicer(self.haiku, self.slicer)
+
+        self.assertFalse(self.sched.createSlicer(self.haiku, self.slicer))
+        self.assertIs(self.sched.getJobByHaiku(self.haiku), slicer)
+
+
+    def testDeleteSlicer(self):
+
+        '''
+        deleteSlicer() should stop the slicer, and the stale heap entry should
+        be skipped when it comes due.
+        '''
+
+        self.sched.createSlicer(self.haiku, self.slicer)
+        self.sched.createSlicer(self.haiku2, self.slicer)
+
+        self.sched.deleteSlicer(self.haiku2)
+        self.assertFalse(self.sched.checkForSlicer(self.haiku2))
+
+        batch = self.sched.collect(time.time() + 1)
+        self.assertEquals([s.id for s in batch], [self.haiku.id])
+
+
+    def testGetHaikuIds(self):
+
+        '''
+        getHaikuIds() should get the ids of the haiku with slicers.
+        '''
+
+        self.sched.createSlicer(self.haiku, self.slicer)
+        self.sched.createSlicer(self.haiku2, self.slicer)
+        self.sched.deleteSlicerById(self.haiku.id)
+
+        self.assertEquals(self.sched.getHaikuIds(), set([self.haiku2.id]))
+
+
+    def testBatch(self):
+
+        '''
+        Slicers that come due together should be fired in one call.
+        '''
+
+        self.sched.createSlicer(self.haiku, self.slicer)
+        self.sched.createSlicer(self.haiku2, self.slicer)
+
+        # Nothing is due yet.
+        self.assertEquals(self.sched.collect(time.time()), [])
+
+        self.sched.fire(self.sched.collect(time.time() + 1))
+        self.assertEquals(self.batches, [[self.haiku.id, self.haiku2.id]])
+
+
+    def testMissedFiresCoalesced(self):
+
+        '''
+        A slicer that falls behind should fire once and skip the missed times.
+        '''
+
+        slicer = self.sched.createSlicer(self.haiku, self.slicer)
+        now = time.time() + 3.5
+
+        batch = self.sched.collect(now)
+        self.assertEquals(batch, [slicer])
+        self.assertEquals(slicer.runs, 1)
+        self.assertTrue(now < slicer.due <= now + 1)
+
+        # Rescheduled at the next time after now.
+        self.assertEquals(self.sched.collect(now), [])
+
+
+    def testOncePerCollect(self):
+
+        '''
+        A slicer whose next run is also within the resolution should only be
+        collected once.
+        '''
+
+        slicer = self.sched.createSlicer(self.haiku, self.slicer)
+        self.sched.resolution = 1.5
+
+        due = slicer.due
+        self.assertEquals(self.sched.collect(due), [slicer])
+        self.assertEquals(slicer.runs, 1)
+        self.assertEquals(slicer.due, due + 1)
+
+
+    def testFailingSlicer(self):
+
+        '''
+        An error in one slicing routine should not stop the others.
+        '''
+
+        def failing(*ids):
+            raise RuntimeError
+
+        self.sched.createSlicer(self.haiku, failing)
+        self.sched.createSlicer(self.haiku2, self.slicer)
+
+        # Keep the logged traceback out of the test output.
+        wheel.logger.disabled = True
+        try: self.sched.fire(self.sched.collect(time.time() + 1))
+        finally: wheel.logger.disabled = False
+
+        self.assertEquals(self.batches, [[self.haiku2.id]])
+
+
+    def testDriver(self):
+
+        '''
+        The driver thread should fire the slicers as they come due.
+        '''
+
+        self.haiku.slicing_interval = 0.1
+        self.haiku2.slicing_interval = 0.1
+
+        self.sched.start()
+        self.assertTrue(self.sched.running)
+
+        self.sched.createSlicer(self.haiku, self.slicer)
+        self.sched.createSlicer(self.haiku2, self.slicer)
+
+        time.sleep(0.35)
+        self.sched.shutdown()
+        self.assertFalse(self.sched.running)
+
+        # Both haiku in each wakeup.
+        self.assertTrue(len(self.batches) >= 2)
+        for batch in self.batches:
+            self.assertEquals(batch, [self.haiku.id, self.haiku2.id])
+
+
+
+if __name__ == '__main__':
+    u.unittest.main()
@@ -3,9 +3,10 @@ Administrative views. Create, start, stop, and delete poems.
 '''
 
 # Get application assets.
-from flask import session, redirect, url_for, request, render_template
+from flask import session, redirect, url_for, request, render_template, \
+        Response
 from eh import app, db, sched
-from eh.helpers import auth, validation, slicer
+from eh.helpers import auth, validation, slicer, snapshots, lease
 import eh.models as models
 
 
@@ -21,8 +22,7 @@ def browse(admin):
 
     return render_template(
             'admin/browse.html',
-            haiku = haiku,
-            sched = sched)
+            haiku = haiku)
 
 
 @app.route('/admin/new', methods=['GET', 'POST'])
@@ -86,9 +86,12 @@ def start(admin, id):
 
     ''' Start a haiku. '''
 
-    # Get the record, start the slicer.
+    # Get the record, mark it running. The slicing process picks it up in
+    # synchronize(); only a process that runs the scheduler starts the
+    # slicer here, or the job would wait forever in an unstarted one.
     haiku = models.Haiku.query.get(id)
-    sched.createSlicer(haiku, slicer.slice)
+    haiku.startSlicing()
+    if sched.running: sched.createSlicer(haiku, slicer.slice)
 
     return redirect(url_for('browse'))
 
@@ -100,13 +103,33 @@ def stop(admin, id):
 
     ''' Stop a haiku. '''
 
-    # Get the record, stop the slicer.
+    # Get the record, mark it stopped, and stop the slicer if it runs here.
     haiku = models.Haiku.query.get(id)
-    sched.deleteSlicer(haiku)
+    haiku.stopSlicing()
+    if sched.running: sched.deleteSlicer(haiku)
 
     return redirect(url_for('browse'))
 
 
+@app.route('/admin/metrics')
+@auth.isInstalled
+@auth.isAdmin
+def metrics(admin):
+
+    '''
+    Scheduler metrics, in the Prometheus text format, as published by the
+    slicing processes. A process that runs the scheduler itself, as under
+    runserver.py, adds its own.
+    '''
+
+    local = []
+    if sched.running:
+        local.append(snapshots.label(lease.nodeName(), sched.metrics))
+
+    return Response(snapshots.collect(local),
+            content_type = 'text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.route('/admin/delete/<id>')
 @auth.isInstalled
 @auth.isAdmin
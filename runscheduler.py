@@ -0,0 +1,59 @@
+from eh import app, db, runScheduler
+from eh.helpers.sync import synchronize, fence, INTERVAL
+from eh.helpers.lease import LeaseManager, nodeName
+from eh.helpers import reconcile, snapshots
+import logging
+import time
+
+logging.basicConfig()
+logger = logging.getLogger('runscheduler')
+
+# Run the slicers. Web workers are served separately, from wsgi.py.
+sched = runScheduler()
+db.create_all()
+
+# Share the haiku with the other slicing processes.
+leases = LeaseManager() if app.config['SHARDED_SLICING'] else None
+node = leases.node if leases else nodeName()
+reconciled = time.time()
+
+try:
+
+    # Restore the running haiku, then pick up the haiku started and stopped
+    # by the web workers, and the shards gained and lost.
+    while True:
+
+        try:
+
+            if leases: leases.heartbeat()
+            synchronize(sched, leases=leases)
+
+            # Check the running word values of this process's haiku.
+            if time.time() - reconciled >= reconcile.INTERVAL:
+                reconcile.reconcile(sched.getHaikuIds())
+                reconciled = time.time()
+
+            # Hand the metrics to the web workers, with the pool's timings.
+            if sched.pool: sched.pool.record()
+            snapshots.publish(node, sched.metrics)
+
+        # A database error only costs this tick.
+        except Exception:
+            logger.exception('Slicing process tick failed')
+            db.session.rollback()
+
+        finally:
+
+            # Stop slicing the shards lost, even if the heartbeat failed.
+            if leases: fence(sched, leases)
+
+            # Replace any slicing worker that died.
+            if sched.pool: sched.pool.revive()
+
+            db.session.remove()
+
+        time.sleep(INTERVAL)
+
+except KeyboardInterrupt:
+    sched.shutdown()
+    if leases: leases.release()
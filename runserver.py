@@ -1,3 +1,12 @@
-from eh import app, db
+from eh import app, db, runScheduler
+from eh.helpers.sync import synchronize
+
+# The development server runs the slicers in the same process.
+sched = runScheduler()
 db.create_all()
+
+# Restore the running haiku.
+synchronize(sched)
+db.session.remove()
+
 app.run(debug=True)
@@ -0,0 +1,8 @@
+from eh import createApp
+from eh.lib.loader import preload
+
+# Load the tables before the server forks, so every worker shares them.
+preload()
+
+# Web workers serve requests only; the slicers run in runscheduler.py.
+application = createApp()